@@ -2,18 +2,31 @@
 //
 // For each *.csv file, checks that:
 //   1. No empty monochromatic structure of the type encoded in the filename exists.
-//   2. Adding 10 random points individually still yields at least one empty structure.
+//   2. Adding 10 (--trials) random points individually still yields at least one empty structure.
 //   3. Every strengthened filter also yields at least one empty structure.
 //
+// These checks are independent, so with --jobs they run on a pool of threads
+// (each check on jobs / checks threads of its own, if there are more threads
+// than checks), while their results are still printed in order.  As soon as a
+// check fails, all later ones are cancelled.
+//
 // Returns 0 on full success, non-zero on the first failure.
+//
+// Usage: garment-check [--jobs <n>] [--trials <n>] [--seed <n>] [--reference] <directory>
 
 #include "lib.hpp"
 #include "util.hpp"
 
+#include <algorithm>
+#include <atomic>
 #include <filesystem>
 #include <iostream>
+#include <mutex>
+#include <optional>
 #include <sstream>
+#include <stdexcept>
 #include <string>
+#include <thread>
 #include <vector>
 
 // ── strengthen_filter ─────────────────────────────────────────────────────────
@@ -48,30 +61,106 @@ strengthen_filter(const std::set<std::string>& only)
     return result;
 }
 
+// ── Checks ────────────────────────────────────────────────────────────────────
+
+struct Check {
+    std::string           label;     // printed before the result of the check
+    std::set<std::string> only;
+    PartitionedPointSet   parts;
+    bool                  expected;  // whether an empty structure must exist
+    int                   code;      // exit code if the check fails
+    std::string           failure;
+};
+
+static std::string fmt(double v) {
+    std::ostringstream ss;
+    ss << v;
+    return ss.str();
+}
+
+// Run all checks on a pool of threads, handing them out in order.
+// Returns the index of the first failed check, if any; checks after a failed
+// one are cancelled, while earlier ones are still finished.
+static std::optional<size_t> run_checks(const std::vector<Check>& checks, unsigned jobs, Engine engine) {
+    if (jobs == 0) jobs = std::max(std::thread::hardware_concurrency(), 1u);
+    unsigned workers = std::min<size_t>(jobs, checks.size());
+    unsigned inner   = std::max(jobs / std::max(workers, 1u), 1u);
+
+    std::atomic<size_t> next{0};
+    std::vector<std::atomic<bool>> cancel(checks.size());
+    std::optional<size_t> failed;
+    std::mutex mutex;
+
+    auto work = [&] {
+        for (size_t i; (i = next++) < checks.size(); ) {
+            if (cancel[i]) continue;
+            const Check& check = checks[i];
+            bool found = has_empty_monochromatic_structure(check.parts, check.only, inner, engine, &cancel[i]);
+            std::lock_guard<std::mutex> lock(mutex);
+            if (cancel[i] || found == check.expected || (failed && *failed < i)) continue;
+            failed = i;
+            for (size_t j = i + 1; j < checks.size(); j++) cancel[j] = true;
+        }
+    };
+    std::vector<std::thread> threads;
+    for (unsigned t = 1; t < workers; t++) threads.emplace_back(work);
+    work();
+    for (auto& t : threads) t.join();
+    return failed;
+}
+
 // ── Main ──────────────────────────────────────────────────────────────────────
 
 int main(int argc, char* argv[]) {
-    if (argc < 2) {
-        std::cerr << "Usage: garment-check <directory>\n";
+    namespace fs = std::filesystem;
+    fs::path dir;
+    unsigned jobs = 1;
+    int trials = 10;
+    Engine engine = Engine::predicates;
+    try {
+        for (int i = 1; i < argc; i++) {
+            std::string arg = argv[i];
+            if (arg == "--jobs" || arg == "-j") {
+                if (++i >= argc) throw std::runtime_error("--jobs requires a value");
+                jobs = std::stoul(argv[i]);
+            } else if (arg == "--trials" || arg == "-t") {
+                if (++i >= argc) throw std::runtime_error("--trials requires a value");
+                trials = std::stoi(argv[i]);
+            } else if (arg == "--seed") {
+                if (++i >= argc) throw std::runtime_error("--seed requires a value");
+                seed_random(std::stoul(argv[i]));
+            } else if (arg == "--reference") {
+                engine = Engine::reference;
+            } else if (arg[0] != '-' && dir.empty()) {
+                dir = arg;
+            } else {
+                throw std::runtime_error("unexpected argument: " + arg);
+            }
+        }
+        if (dir.empty()) throw std::runtime_error("missing directory");
+    } catch (const std::exception& e) {
+        std::cerr << "error: " << e.what() << "\n"
+                  << "Usage: garment-check [--jobs <n>] [--trials <n>] [--seed <n>] [--reference] <directory>\n";
         return 1;
     }
 
-    namespace fs = std::filesystem;
-    fs::path dir = argv[1];
-
     struct Summary { fs::path path; size_t n; std::string stats; std::set<std::string> only; };
     std::vector<Summary> checked;
 
-    for (const auto& entry : fs::recursive_directory_iterator(dir)) {
-        if (!entry.is_regular_file() || entry.path().extension() != ".csv") continue;
+    std::vector<fs::path> files;
+    for (const auto& entry : fs::recursive_directory_iterator(dir))
+        if (entry.is_regular_file() && entry.path().extension() == ".csv")
+            files.push_back(entry.path());
+    std::sort(files.begin(), files.end());
 
-        auto raw   = load_csv(entry.path());
+    for (const auto& path : files) {
+        auto raw   = load_csv(path);
         auto parts = partition(raw);
 
         // Extract filter: keep only tokens that are valid structure names.
         std::set<std::string> only;
         {
-            std::istringstream ss(entry.path().stem().string());
+            std::istringstream ss(path.stem().string());
             std::string tok;
             while (std::getline(ss, tok, '_'))
                 if (ALL_SHAPES.count(tok)) only.insert(tok);
@@ -84,41 +173,41 @@ int main(int argc, char* argv[]) {
         }
         for (const auto& s : only) only_str += (only_str.empty() ? "" : ", ") + s;
 
-        std::cout << "File " << entry.path().filename().string()
+        std::cout << "File " << path.filename().string()
                   << " (" << raw.size() << " points: " << stats
                   << ") for [" << only_str << "]\n";
 
-        if (has_empty_monochromatic_structure(parts, only)) {
-            std::cout << "FAIL: file already contains an empty structure.\n";
-            return 1;
-        }
-
-        for (int trial = 0; trial < 10; trial++) {
+        // All checks are independent: the first must find no empty structure,
+        // each random point and strengthened filter must find one.
+        std::vector<Check> checks{{"", only, parts, false, 1,
+                                   "FAIL: file already contains an empty structure.\n"}};
+        for (int trial = 0; trial < trials; trial++) {
             auto rp = random_point(raw, parts);
-            raw.push_back(rp);
-            parts[rp.color].emplace_back(rp.x, rp.y);
-            std::cout << "  +random (" << rp.x << "," << rp.y << "," << rp.color
-                      << ") — " << raw.size() << " pts\n";
-            if (!has_empty_monochromatic_structure(parts, only)) {
-                std::cout << "FAIL: adding point removes all empty structures.\n";
-                return 2;
-            }
-            raw.pop_back();
-            parts[rp.color].pop_back();
+            Check check{"  +random (" + fmt(rp.x) + "," + fmt(rp.y) + "," + rp.color + ") — "
+                        + std::to_string(raw.size() + 1) + " pts\n",
+                        only, parts, true, 2, "FAIL: adding point removes all empty structures.\n"};
+            check.parts[rp.color].emplace_back(rp.x, rp.y);
+            checks.push_back(std::move(check));
         }
-
         for (const auto& s_only : strengthen_filter(only)) {
             std::string sl;
             for (const auto& s : s_only) sl += (sl.empty() ? "" : ", ") + s;
-            std::cout << "  strengthen → [" << sl << "]\n";
-            if (!has_empty_monochromatic_structure(parts, s_only)) {
-                std::cout << "FAIL: strengthened filter yields no empty structure.\n";
-                return 3;
+            checks.push_back({"  strengthen → [" + sl + "]\n", s_only, parts, true, 3,
+                              "FAIL: strengthened filter yields no empty structure.\n"});
+        }
+
+        // The results are reported in order, up to the first failed check.
+        auto failed = run_checks(checks, jobs, engine);
+        for (size_t i = 0; i < checks.size(); i++) {
+            std::cout << checks[i].label;
+            if (failed && *failed == i) {
+                std::cout << checks[i].failure;
+                return checks[i].code;
             }
         }
         std::cout << "  OK\n\n";
 
-        checked.push_back({entry.path(), raw.size(), stats, only});
+        checked.push_back({path, raw.size(), stats, only});
     }
 
     std::cout << "Checked " << checked.size() << " files:\n";
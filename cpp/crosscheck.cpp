@@ -0,0 +1,118 @@
+// garment-crosscheck — compare the predicate engine against the reference engine
+//
+// For each *.csv file in the directory, both engines search all structures
+// (and, with --add <n>, also after adding each of n random points one at a time).
+// The reported structures must agree in color, type, points, region and order.
+//
+// Returns 0 if both engines agree on all files, 1 otherwise.
+//
+// Usage: garment-crosscheck [--jobs <n>] [--add <n>] <directory>
+
+#include "lib.hpp"
+#include "util.hpp"
+
+#include <algorithm>
+#include <chrono>
+#include <filesystem>
+#include <iostream>
+#include <stdexcept>
+#include <string>
+#include <vector>
+
+static bool same_polygon(const Poly& a, const Poly& b) {
+    return std::equal(a.vertices_begin(), a.vertices_end(), b.vertices_begin(), b.vertices_end());
+}
+
+static bool same_structure(const Structure& a, const Structure& b) {
+    if (a.color != b.color || a.type != b.type || a.points != b.points
+        || a.shape.size() != b.shape.size())
+        return false;
+    for (size_t i = 0; i < a.shape.size(); i++) {
+        const auto& pa = a.shape[i];
+        const auto& pb = b.shape[i];
+        if (!same_polygon(pa.outer_boundary(), pb.outer_boundary())
+            || pa.number_of_holes() != pb.number_of_holes())
+            return false;
+    }
+    return true;
+}
+
+static std::vector<Structure> search(const PartitionedPointSet& parts, unsigned jobs,
+                                     Engine engine, double& seconds) {
+    std::vector<Structure> found;
+    auto start = std::chrono::steady_clock::now();
+    find_empty_monochromatic_structures(parts, {},
+        [&](const Structure& s) { found.push_back(s); return true; }, jobs, engine);
+    seconds += std::chrono::duration<double>(std::chrono::steady_clock::now() - start).count();
+    return found;
+}
+
+// Compare both engines on parts, printing the first difference.
+static bool compare(const PartitionedPointSet& parts, unsigned jobs,
+                    double& predicates, double& reference) {
+    auto fast = search(parts, jobs, Engine::predicates, predicates);
+    auto ref  = search(parts, jobs, Engine::reference, reference);
+    for (size_t i = 0; i < std::max(fast.size(), ref.size()); i++) {
+        if (i < fast.size() && i < ref.size() && same_structure(fast[i], ref[i])) continue;
+        std::cout << "  MISMATCH at structure " << i << ": predicates "
+                  << (i < fast.size() ? fast[i].color + " " + fast[i].type : "none")
+                  << ", reference "
+                  << (i < ref.size() ? ref[i].color + " " + ref[i].type : "none") << "\n";
+        return false;
+    }
+    return true;
+}
+
+int main(int argc, char* argv[]) {
+    namespace fs = std::filesystem;
+    fs::path dir;
+    unsigned jobs = 1;
+    int add = 0;
+    try {
+        for (int i = 1; i < argc; i++) {
+            std::string arg = argv[i];
+            if (arg == "--jobs" || arg == "-j") {
+                if (++i >= argc) throw std::runtime_error("--jobs requires a value");
+                jobs = std::stoul(argv[i]);
+            } else if (arg == "--add" || arg == "-a") {
+                if (++i >= argc) throw std::runtime_error("--add requires a value");
+                add = std::stoi(argv[i]);
+            } else if (arg[0] != '-' && dir.empty()) {
+                dir = arg;
+            } else {
+                throw std::runtime_error("unexpected argument: " + arg);
+            }
+        }
+        if (dir.empty()) throw std::runtime_error("missing directory");
+    } catch (const std::exception& e) {
+        std::cerr << "error: " << e.what() << "\n"
+                  << "Usage: garment-crosscheck [--jobs <n>] [--add <n>] <directory>\n";
+        return 1;
+    }
+
+    int files = 0, failed = 0;
+    for (const auto& entry : fs::recursive_directory_iterator(dir)) {
+        if (!entry.is_regular_file() || entry.path().extension() != ".csv") continue;
+
+        auto raw   = load_csv(entry.path());
+        auto parts = partition(raw);
+        double predicates = 0, reference = 0;
+        bool ok = compare(parts, jobs, predicates, reference);
+        for (int trial = 0; ok && trial < add; trial++) {
+            auto rp = random_point(raw, parts);
+            parts[rp.color].emplace_back(rp.x, rp.y);
+            ok = compare(parts, jobs, predicates, reference);
+            if (!ok)
+                std::cout << "  after adding (" << rp.x << "," << rp.y << "," << rp.color << ")\n";
+            parts[rp.color].pop_back();
+        }
+
+        files++;
+        if (!ok) failed++;
+        std::cout << (ok ? "OK   " : "FAIL ") << entry.path().filename().string()
+                  << "  predicates " << predicates << "s, reference " << reference << "s\n";
+    }
+
+    std::cout << "Compared " << files << " files, " << failed << " mismatches.\n";
+    return failed ? 1 : 0;
+}
@@ -1,6 +1,6 @@
 // garment — find empty monochromatic structures in a bichromatic point set
 //
-// Usage: garment [--only <shape>]... [--add] <file.csv>
+// Usage: garment [--only <shape>]... [--add] [--jobs <n>] [--reference] <file.csv>
 //
 // For each empty monochromatic structure found, prints one JSON object per line:
 //   {"color":..., "type":..., "points":[[x,y],...], "shape":[[[x,y],...], ...]}
@@ -77,13 +77,17 @@ struct Args {
     std::string            file;
     std::set<std::string>  only;
     bool                   add = false;
+    unsigned               jobs = 1;
+    Engine                 engine = Engine::predicates;
 };
 
 static void usage(const char* prog) {
     std::cerr << "Usage: " << prog
-              << " [--only <shape>]... [--add] <file.csv>\n"
-              << "  --only  one of: cravat necklace bowtie skirt pant\n"
-              << "  --add   add one random point before searching\n";
+              << " [--only <shape>]... [--add] [--jobs <n>] [--reference] <file.csv>\n"
+              << "  --only       one of: cravat necklace bowtie skirt pant\n"
+              << "  --add        add one random point before searching\n"
+              << "  --jobs       number of threads searching in parallel, 0 for all cores\n"
+              << "  --reference  build every region instead of deciding them with predicates\n";
 }
 
 static Args parse_args(int argc, char* argv[]) {
@@ -98,6 +102,11 @@ static Args parse_args(int argc, char* argv[]) {
             a.only.insert(shape);
         } else if (arg == "--add" || arg == "-a") {
             a.add = true;
+        } else if (arg == "--jobs" || arg == "-j") {
+            if (++i >= argc) throw std::runtime_error("--jobs requires a value");
+            a.jobs = std::stoul(argv[i]);
+        } else if (arg == "--reference") {
+            a.engine = Engine::reference;
         } else if (arg[0] != '-') {
             if (!a.file.empty()) throw std::runtime_error("unexpected argument: " + arg);
             a.file = arg;
@@ -145,7 +154,7 @@ int main(int argc, char* argv[]) {
             ++found;
             std::cout << json_structure(s) << "\n";
             return true;  // continue searching
-        });
+        }, args.jobs, args.engine);
 
     std::cerr << "Found " << found << " empty monochromatic structures.\n";
     return 0;
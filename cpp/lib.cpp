@@ -1,7 +1,14 @@
 #include "lib.hpp"
+#include "predicates.hpp"
 
 #include <algorithm>
+#include <atomic>
+#include <condition_variable>
 #include <iterator>
+#include <mutex>
+#include <optional>
+#include <thread>
+#include <tuple>
 
 // ── Shape name sets ───────────────────────────────────────────────────────────
 
@@ -65,8 +72,9 @@ bool region_contains(const Region& region, const Point_2& pt) {
     return false;
 }
 
-bool contains_any(const Region& region, const std::vector<Point_2>& pts) {
-    return std::any_of(pts.begin(), pts.end(),
+template<typename Iter>
+bool contains_any(const Region& region, Iter first, Iter last) {
+    return std::any_of(first, last,
         [&](const Point_2& p) { return region_contains(region, p); });
 }
 
@@ -144,39 +152,198 @@ all_structures_from_quad(const std::vector<Point_2>& pts,
     return out;
 }
 
-void find_empty_monochromatic_structures(
-    const PartitionedPointSet& parts,
-    const std::set<std::string>& only,
-    std::function<bool(const Structure&)> on_found)
+namespace {
+
+// A shard holds all 4-tuples of one color whose first (smallest) index is a.
+struct Shard { std::string color; int a; };
+
+std::vector<Shard> all_shards(const PartitionedPointSet& parts) {
+    std::vector<Shard> shards;
+    for (const auto& [color, same] : parts)
+        for (int a = 0; a + 3 < (int)same.size(); a++)
+            shards.push_back({color, a});
+    return shards;
+}
+
+// The points of all other colors, sorted by x so that x_slab can find the
+// candidates for each 4-tuple.
+std::vector<Point_2> other_colored_points(const PartitionedPointSet& parts, const std::string& color) {
+    std::vector<Point_2> other;
+    for (const auto& [c, ps] : parts)
+        if (c != color) other.insert(other.end(), ps.begin(), ps.end());
+    std::sort(other.begin(), other.end(), [](const Point_2& p, const Point_2& q) { return p.x() < q.x(); });
+    return other;
+}
+
+// The range of the points of other (sorted by x) whose x lies strictly between
+// the smallest and largest x of the quad; all other points are outside of or on
+// the boundary of its convex hull, so they can't lie in any of its regions.
+template<typename P>
+std::pair<size_t, size_t> x_slab(const std::vector<P>& other, std::initializer_list<P> quad) {
+    auto by_x = [](const P& p, const P& q) { return p.x() < q.x(); };
+    auto [min, max] = std::minmax_element(quad.begin(), quad.end(), by_x);
+    auto first = std::upper_bound(other.begin(), other.end(), *min, by_x);
+    auto last  = std::lower_bound(first, other.end(), *max, by_x);
+    return {first - other.begin(), last - other.begin()};
+}
+
+// Visit the empty structures of one shard in serial order until on_found
+// returns false or stop is set; returns false iff the search was stopped.
+bool search_shard(const std::vector<Point_2>& same, const std::vector<Point_2>& other,
+                  const std::string& color, int a, const std::set<std::string>& only,
+                  const std::function<bool(Structure&)>& on_found,
+                  const std::atomic<bool>* stop = nullptr,
+                  Engine engine = Engine::predicates,
+                  const std::atomic<bool>* cancel = nullptr)
 {
-    for (const auto& [color, same] : parts) {
-        std::vector<Point_2> other;
-        for (const auto& [c, ps] : parts)
-            if (c != color) other.insert(other.end(), ps.begin(), ps.end());
-
-        int n = same.size();
-        bool keep_going = true;
-        for (int a = 0; a < n && keep_going; a++)
-        for (int b = a+1; b < n && keep_going; b++)
-        for (int c = b+1; c < n && keep_going; c++)
-        for (int d = c+1; d < n && keep_going; d++) {
+    int n = same.size();
+    std::vector<EPoint> esame, eother;
+    if (engine == Engine::predicates) {
+        esame  = predicate_points(same);
+        eother = predicate_points(other);
+    }
+    for (int b = a+1; b < n; b++)
+    for (int c = b+1; c < n; c++) {
+        if (stop && stop->load(std::memory_order_relaxed)) return false;
+        if (cancel && cancel->load(std::memory_order_relaxed)) return false;
+        for (int d = c+1; d < n; d++) {
+            // with the predicate engine, only the regions of 4-tuples with an empty structure are built
+            std::optional<unsigned> empty;
+            size_t first, last;
+            if (engine == Engine::predicates) {
+                std::tie(first, last) = x_slab(eother, {esame[a], esame[b], esame[c], esame[d]});
+                empty = empty_structures({esame[a], esame[b], esame[c], esame[d]},
+                                         eother.data() + first, eother.data() + last, only);
+                if (empty == 0u) continue;
+            } else {
+                std::tie(first, last) = x_slab(other, {same[a], same[b], same[c], same[d]});
+            }
             std::vector<Point_2> quad = {same[a], same[b], same[c], same[d]};
+            unsigned i = 0;
             for (auto& [name, region] : all_structures_from_quad(quad, only)) {
-                if (!contains_any(region, other)) {
+                if (empty ? (*empty >> i++ & 1)
+                          : !contains_any(region, other.begin() + first, other.begin() + last)) {
                     Structure s{color, name, quad, std::move(region)};
-                    if (!on_found(s)) { keep_going = false; break; }
+                    if (!on_found(s)) return false;
                 }
             }
         }
     }
+    return true;
+}
+
+// Run worker(shard index) for all shards on the given number of threads,
+// handing out the shards in order until stop is set.
+void run_shards(size_t shards, unsigned jobs, const std::atomic<bool>& stop,
+                const std::function<void(size_t)>& worker)
+{
+    std::atomic<size_t> next{0};
+    std::vector<std::thread> threads;
+    for (unsigned t = 0; t < jobs; t++)
+        threads.emplace_back([&] {
+            while (!stop) {
+                size_t i = next++;
+                if (i >= shards) break;
+                worker(i);
+            }
+        });
+    for (auto& t : threads) t.join();
+}
+
+unsigned resolve_jobs(unsigned jobs) {
+    if (jobs == 0) jobs = std::thread::hardware_concurrency();
+    return std::max(jobs, 1u);
+}
+
+} // anonymous namespace
+
+void find_empty_monochromatic_structures(
+    const PartitionedPointSet& parts,
+    const std::set<std::string>& only,
+    std::function<bool(const Structure&)> on_found,
+    unsigned jobs,
+    Engine engine)
+{
+    jobs = resolve_jobs(jobs);
+    if (jobs == 1) {
+        for (const auto& [color, same] : parts) {
+            auto other = other_colored_points(parts, color);
+            for (int a = 0; a + 3 < (int)same.size(); a++)
+                if (!search_shard(same, other, color, a, only,
+                                  [&](Structure& s) { return on_found(s); }, nullptr, engine))
+                    return;
+        }
+        return;
+    }
+
+    // Workers collect the structures of each shard, while the calling thread
+    // reports the finished shards in order.
+    // The points are shared among the threads, which relies on CGAL's
+    // thread-safe reference counting of lazy exact numbers.
+    auto shards = all_shards(parts);
+    std::map<std::string, std::vector<Point_2>> others;
+    for (const auto& [color, same] : parts) others[color] = other_colored_points(parts, color);
+
+    std::vector<std::optional<std::vector<Structure>>> results(shards.size());
+    std::mutex mutex;
+    std::condition_variable done;
+    std::atomic<bool> stop{false};
+
+    std::thread pool([&] {
+        run_shards(shards.size(), jobs, stop, [&](size_t i) {
+            const Shard& shard = shards[i];
+            std::vector<Structure> found;
+            search_shard(parts.at(shard.color), others.at(shard.color), shard.color, shard.a, only,
+                [&](Structure& s) { found.push_back(std::move(s)); return true; }, &stop, engine);
+            std::lock_guard<std::mutex> lock(mutex);
+            results[i] = std::move(found);
+            done.notify_all();
+        });
+    });
+
+    for (size_t i = 0; i < shards.size() && !stop; i++) {
+        std::vector<Structure> found;
+        {
+            std::unique_lock<std::mutex> lock(mutex);
+            done.wait(lock, [&] { return results[i].has_value(); });
+            found = std::move(*results[i]);
+        }
+        for (const auto& s : found)
+            if (!on_found(s)) { stop = true; break; }
+    }
+    stop = true;
+    pool.join();
 }
 
 bool has_empty_monochromatic_structure(
     const PartitionedPointSet& parts,
-    const std::set<std::string>& only)
+    const std::set<std::string>& only,
+    unsigned jobs,
+    Engine engine,
+    const std::atomic<bool>* cancel)
 {
-    bool found = false;
-    find_empty_monochromatic_structures(parts, only,
-        [&](const Structure&) { found = true; return false; });
+    jobs = resolve_jobs(jobs);
+    if (jobs == 1) {
+        bool found = false;
+        for (const auto& [color, same] : parts) {
+            auto other = other_colored_points(parts, color);
+            for (int a = 0; a + 3 < (int)same.size(); a++)
+                if (!search_shard(same, other, color, a, only,
+                                  [&](Structure&) { found = true; return false; }, nullptr, engine, cancel))
+                    return found;
+        }
+        return false;
+    }
+
+    // no order needs to be kept, so the first structure found by any thread stops all of them
+    auto shards = all_shards(parts);
+    std::map<std::string, std::vector<Point_2>> others;
+    for (const auto& [color, same] : parts) others[color] = other_colored_points(parts, color);
+    std::atomic<bool> found{false};
+    run_shards(shards.size(), jobs, found, [&](size_t i) {
+        const Shard& shard = shards[i];
+        search_shard(parts.at(shard.color), others.at(shard.color), shard.color, shard.a, only,
+            [&](Structure&) { found = true; return false; }, &found, engine, cancel);
+    });
     return found;
 }
@@ -6,6 +6,7 @@
 #include <CGAL/Polygon_set_2.h>
 #include <CGAL/convex_hull_2.h>
 
+#include <atomic>
 #include <functional>
 #include <map>
 #include <set>
@@ -35,6 +36,15 @@ struct Structure {
     Region             shape;
 };
 
+// ── Engines ───────────────────────────────────────────────────────────────────
+
+// predicates: decides each structure with exact orientation predicates (see
+//             predicates.hpp) and only builds the regions of found structures.
+// reference:  builds every region with exact constructions (Polygon_set_2) and
+//             tests each other-colored point against it.
+// Both report the same structures in the same order.
+enum class Engine { predicates, reference };
+
 // ── Public API ────────────────────────────────────────────────────────────────
 
 // All structures (name + region) that can be formed from a quad of 4 points.
@@ -45,12 +55,23 @@ all_structures_from_quad(const std::vector<Point_2>& pts,
 
 // Iterate over every empty monochromatic structure in parts.
 // on_found is called for each; returning false stops the search early.
+// With jobs > 1 (0 for all hardware threads), the 4-tuples of each color are
+// split by their first index among that many threads; on_found is still called
+// from the calling thread only and in the same order as for a serial search.
 void find_empty_monochromatic_structures(
     const PartitionedPointSet& parts,
     const std::set<std::string>& only,
-    std::function<bool(const Structure&)> on_found);
+    std::function<bool(const Structure&)> on_found,
+    unsigned jobs = 1,
+    Engine engine = Engine::predicates);
 
 // Returns true iff at least one empty monochromatic structure exists.
+// With jobs > 1, all threads stop as soon as any of them found a structure.
+// If cancel is given, the search is abandoned (returning false) once it is set,
+// e.g. by another thread whose check already failed.
 bool has_empty_monochromatic_structure(
     const PartitionedPointSet& parts,
-    const std::set<std::string>& only);
+    const std::set<std::string>& only,
+    unsigned jobs = 1,
+    Engine engine = Engine::predicates,
+    const std::atomic<bool>* cancel = nullptr);
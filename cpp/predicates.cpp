@@ -0,0 +1,102 @@
+#include "predicates.hpp"
+
+#include <CGAL/convex_hull_2.h>
+
+#include <iterator>
+
+// All regions are the (convex) hull of the 4-tuple minus triangles bounded by
+// its diagonals or, for pants, by the interior point, so whether a point lies
+// in the interior of a region follows from its side of the hull edges and of
+// these segments.  The variants are indexed as in lib.cpp, starting at the
+// hull vertex CGAL::convex_hull_2 reports first.
+
+std::vector<EPoint> predicate_points(const std::vector<Point_2>& pts) {
+    std::vector<EPoint> result;
+    result.reserve(pts.size());
+    for (const auto& p : pts)
+        result.emplace_back(CGAL::to_double(p.x()), CGAL::to_double(p.y()));
+    return result;
+}
+
+namespace {
+
+int orient(const EPoint& p, const EPoint& q, const EPoint& r) {
+    return CGAL::orientation(p, q, r);
+}
+
+bool strictly_inside(const std::vector<EPoint>& hull, const EPoint& p) {
+    for (size_t k = 0; k < hull.size(); k++)
+        if (orient(hull[k], hull[(k + 1) % hull.size()], p) <= 0) return false;
+    return true;
+}
+
+// Convex 4-tuple with hull c0..c3: d[k] is the side of p w.r.t. the diagonal
+// c_k -> c_{k+2}.  Necklace i is hull minus the triangle between c_{i+3}, c_i
+// and the crossing of the diagonals, bowtie i the two lobes at c_i c_{i+1} and
+// c_{i+2} c_{i+3}.
+unsigned blocked_convex(const std::vector<EPoint>& c, const EPoint& p,
+                        bool cravat, bool necklace, bool bowtie)
+{
+    if (!strictly_inside(c, p)) return 0;
+    int d0 = orient(c[0], c[2], p), d1 = orient(c[1], c[3], p);
+    int d[5] = {d0, d1, -d0, -d1, d0};
+    unsigned blocked = 0, bit = 0;
+    if (cravat) blocked |= 1u << bit++;
+    if (necklace)
+        for (int i = 0; i < 4; i++, bit++)
+            if (!(d[i] >= 0 && d[i + 1] >= 0)) blocked |= 1u << bit;
+    if (bowtie)
+        for (int i = 0; i < 2; i++, bit++)
+            if (d[i] * d[i + 1] < 0) blocked |= 1u << bit;
+    return blocked;
+}
+
+// Non-convex 4-tuple with hull h0..h2 and interior point q: e[k] is the side
+// of p w.r.t. q -> h_k.  Pant i is hull minus the triangle h_i, h_{i+1}, q.
+unsigned blocked_nonconvex(const std::vector<EPoint>& h, const EPoint& q, const EPoint& p,
+                           bool skirt, bool pant)
+{
+    if (!strictly_inside(h, p)) return 0;
+    unsigned blocked = 0, bit = 0;
+    if (skirt) blocked |= 1u << bit++;
+    if (pant) {
+        int e[4] = {orient(q, h[0], p), orient(q, h[1], p), orient(q, h[2], p), 0};
+        e[3] = e[0];
+        for (int i = 0; i < 3; i++, bit++)
+            if (!(e[i] >= 0 && e[i + 1] <= 0)) blocked |= 1u << bit;
+    }
+    return blocked;
+}
+
+} // anonymous namespace
+
+std::optional<unsigned> empty_structures(const std::array<EPoint, 4>& quad,
+                                         const EPoint* first, const EPoint* last,
+                                         const std::set<std::string>& only)
+{
+    for (int i = 0; i < 4; i++)
+        for (int j = i + 1; j < 4; j++)
+            for (int k = j + 1; k < 4; k++)
+                if (orient(quad[i], quad[j], quad[k]) == 0) return std::nullopt;
+
+    auto want = [&](const char* s) { return only.empty() || only.count(s) > 0; };
+    std::vector<EPoint> hull;
+    CGAL::convex_hull_2(quad.begin(), quad.end(), std::back_inserter(hull));
+
+    if (hull.size() == 4) {
+        bool cravat = want("cravat"), necklace = want("necklace"), bowtie = want("bowtie");
+        unsigned empty = (1u << (cravat + 4 * necklace + 2 * bowtie)) - 1;
+        for (auto p = first; p != last; ++p)
+            if (!(empty &= ~blocked_convex(hull, *p, cravat, necklace, bowtie))) break;
+        return empty;
+    }
+
+    EPoint q;
+    for (const auto& p : quad)
+        if (p != hull[0] && p != hull[1] && p != hull[2]) { q = p; break; }
+    bool skirt = want("skirt"), pant = want("pant");
+    unsigned empty = (1u << (skirt + 3 * pant)) - 1;
+    for (auto p = first; p != last; ++p)
+        if (!(empty &= ~blocked_nonconvex(hull, q, *p, skirt, pant))) break;
+    return empty;
+}
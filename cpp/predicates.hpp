@@ -0,0 +1,29 @@
+#pragma once
+
+// The construction-free engine: deciding which structures of a 4-tuple are
+// empty with exact orientation predicates on the exact-predicates/inexact-
+// constructions kernel, without building any region.
+
+#include "lib.hpp"
+
+#include <CGAL/Exact_predicates_inexact_constructions_kernel.h>
+
+#include <array>
+#include <optional>
+#include <set>
+#include <string>
+#include <vector>
+
+using EK     = CGAL::Exact_predicates_inexact_constructions_kernel;
+using EPoint = EK::Point_2;
+
+// The points on the predicate kernel (exact, as both kernels are built from doubles).
+std::vector<EPoint> predicate_points(const std::vector<Point_2>& pts);
+
+// Bit i is set iff the i-th structure of all_structures_from_quad(quad, only)
+// contains none of the other-colored points [first, last).  Returns nullopt for
+// 4-tuples with three collinear points, whose regions are degenerate and thus
+// have to be built.
+std::optional<unsigned> empty_structures(const std::array<EPoint, 4>& quad,
+                                         const EPoint* first, const EPoint* last,
+                                         const std::set<std::string>& only);
@@ -0,0 +1,43 @@
+#pragma once
+
+// Conversions for calling the checker from Python through cppyy, see
+// src/garment_nrs/cgal.py.  Coordinates are passed as flat vectors of doubles
+// (x0, y0, x1, y1, ...), which cppyy converts from and to Python cheaply.
+
+#include "lib.hpp"
+
+#include <string>
+#include <vector>
+
+inline void add_points(PartitionedPointSet& parts, const std::string& color,
+                       const std::vector<double>& coords) {
+    auto& pts = parts[color];
+    for (size_t i = 0; i + 1 < coords.size(); i += 2)
+        pts.emplace_back(coords[i], coords[i + 1]);
+}
+
+inline std::vector<double> coordinates(const std::vector<Point_2>& pts) {
+    std::vector<double> coords;
+    coords.reserve(2 * pts.size());
+    for (const auto& p : pts) {
+        coords.push_back(CGAL::to_double(p.x()));
+        coords.push_back(CGAL::to_double(p.y()));
+    }
+    return coords;
+}
+
+inline std::vector<double> coordinates(const Poly& poly) {
+    return coordinates(std::vector<Point_2>(poly.vertices_begin(), poly.vertices_end()));
+}
+
+// The outer boundary followed by the holes of each connected component.
+inline std::vector<std::vector<std::vector<double>>> outlines(const Region& region) {
+    std::vector<std::vector<std::vector<double>>> result;
+    for (const auto& pwh : region) {
+        std::vector<std::vector<double>> rings{coordinates(pwh.outer_boundary())};
+        for (auto h = pwh.holes_begin(); h != pwh.holes_end(); ++h)
+            rings.push_back(coordinates(*h));
+        result.push_back(std::move(rings));
+    }
+    return result;
+}
@@ -33,6 +33,8 @@ PartitionedPointSet partition(const std::vector<RawPoint>& pts) {
 
 static std::mt19937 rng(std::random_device{}());
 
+void seed_random(unsigned seed) { rng.seed(seed); }
+
 // Mirrors Python's random_point(): integer coords within an expanded bounding box,
 // random color drawn from the existing colors in parts.
 RawPoint random_point(const std::vector<RawPoint>& pts,
@@ -24,3 +24,6 @@ PartitionedPointSet partition(const std::vector<RawPoint>& pts);
 // and a randomly chosen color from parts.  Mirrors Python's random_point().
 RawPoint random_point(const std::vector<RawPoint>& pts,
                       const PartitionedPointSet& parts);
+
+// Seed the generator used by random_point() (seeded from std::random_device by default).
+void seed_random(unsigned seed);
@@ -1,8 +1,10 @@
 #!/bin/bash
 
-garment-render data/n10_c2_no_mc_bowtie_pant.csv    -c -t 0.4 -s 100
-garment-render data/n12_c2_no_mc_bowtie_skirt.csv   -c -t 0.4 -s 100
-garment-render data/n12_c2_no_mc_necklace_pant.csv  -c -t 0.4 -s 100
-garment-render data/n14_c2_no_mc_necklace.csv       -c -t 0.4 -s 100
-garment-render data/n22_c2_no_mc_cravat_pant.csv    -c -t 0.2 -s 200
-garment-render data/n35_c2_no_mc_cravat_skirt.csv   -c -t 0.2 -s 200
+garment-render -c -t 0.4 -s 100 \
+  data/n10_c2_no_mc_bowtie_pant.csv \
+  data/n12_c2_no_mc_bowtie_skirt.csv \
+  data/n12_c2_no_mc_necklace_pant.csv \
+  data/n14_c2_no_mc_necklace.csv
+garment-render -c -t 0.2 -s 200 \
+  data/n22_c2_no_mc_cravat_pant.csv \
+  data/n35_c2_no_mc_cravat_skirt.csv
@@ -0,0 +1,115 @@
+"""A long-running garment process answering searches requested as JSON lines.
+
+Each request is a JSON object on its own line, containing either the "points" as [x, y, color] triples or the path
+of a CSV "file", and optionally an "id" (copied to all answers), the "only" list of structure types, "add" (to add a
+random point first) and "exists" (to only check whether any empty structure exists).
+For each request, one line per found structure (as printed by garment, plus the id) is written, followed by a line
+with the number of "found" structures (and the "added" point, if any), or a single line with "exists" for existence
+queries, or a line with an "error" if the request is invalid.
+
+Requests are read from stdin (answering to stdout) or, with --socket, from any number of connections to a Unix domain
+socket. This way, shapely, numpy and the selected backend are only imported once instead of for every instance.
+"""
+import json
+import os
+import random
+import sys
+from typing import Callable, Dict, Iterable, Iterator, Optional
+
+import click
+
+from garment_nrs.lib import BACKENDS
+
+__all__ = ["answer", "serve"]
+
+
+def answer(request: Dict, backend: str = "shapely", jobs: Optional[int] = 1, cache=None, quiet: bool = False) \
+        -> Iterator[Dict]:
+    """ The answers to a single request, without its id, showing the progress of the search unless quiet is set """
+    from garment_nrs.lib import find_empty_monochromatic_structures, has_empty_monochromatic_structure
+    from garment_nrs.util import load_points_from_csv, partition_points, random_point
+
+    if "file" in request:
+        points = load_points_from_csv(request["file"])
+    else:
+        points = [((x, y), c) for x, y, c in request["points"]]
+    parts = partition_points(points)
+    only = request.get("only") or None
+    added = None
+    if request.get("add"):
+        added = (random_point(points), random.choice(list(parts.keys())))
+        parts[added[1]].append(added[0])
+
+    if request.get("exists"):
+        yield {"exists": has_empty_monochromatic_structure(parts, only, backend, jobs, cache)}
+        return
+    found = 0
+    for s in find_empty_monochromatic_structures(parts, only, backend, jobs, cache, quiet):
+        found += 1
+        yield s
+    yield {"found": found} if added is None else {"found": found, "added": added}
+
+
+def serve(lines: Iterable[str], write: Callable[[str], None], flush: Callable[[], None] = lambda: None,
+          backend: str = "shapely", jobs: Optional[int] = 1, cache=None, quiet: bool = False):
+    """ Answer each request line by writing answer lines """
+    for line in lines:
+        if not line.strip():
+            continue
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get("id")
+            for result in answer(request, backend, jobs, cache, quiet):
+                write(json.dumps({"id": request_id, **result}, default=str) + "\n")
+        except (KeyError, ValueError, TypeError, OSError, AttributeError) as e:
+            write(json.dumps({"id": request_id, "error": f"{type(e).__name__}: {e}"}) + "\n")
+        flush()
+
+
+@click.command()
+@click.option("-s", "--socket", "socket_path", type=click.Path(dir_okay=False), default=None,
+              help="Listen on a Unix domain socket at the given path instead of reading from stdin.")
+@click.option("-b", "--backend", type=click.Choice(list(BACKENDS.keys())), default="shapely", show_default=True,
+              help="The engine used for deciding which structures are empty.")
+@click.option("-j", "--jobs", type=click.IntRange(min=0), default=1, show_default=True,
+              help="The number of processes searching the 4-tuples in parallel, 0 for all cores.")
+@click.option("--cache", type=click.Path(dir_okay=False), default=None, envvar="GARMENT_CACHE",
+              help="Take the results from (and store them in) the given cache database, keyed by colored order type.")
+@click.option("--progress/--no-progress", default=False, show_default=True,
+              help="Whether to show the progress bars of each search on stderr.")
+def main(socket_path, backend, jobs, cache, progress):
+    if cache:
+        from garment_nrs.cache import ResultCache
+        cache = ResultCache(cache)
+    # import everything needed for searching up front, instead of when answering the first request
+    from garment_nrs import lib
+    lib.get_backend(backend)
+    import tqdm  # noqa: F401
+
+    if not socket_path:
+        serve(sys.stdin, sys.stdout.write, sys.stdout.flush, backend, jobs, cache, not progress)
+        return
+
+    import socketserver
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            lines = (line.decode() for line in self.rfile)
+            serve(lines, lambda s: self.wfile.write(s.encode()), self.wfile.flush, backend, jobs, cache,
+                  not progress)
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    with socketserver.ThreadingUnixStreamServer(socket_path, Handler) as server:
+        click.echo(f"Listening on {socket_path}.", err=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.unlink(socket_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""Benchmarks of find_empty_monochromatic_structures on the instances in data/ and on generated point sets.
+
+Each run searches one instance for one filter with one engine (a Python backend or the C++ garment executable) in
+a fresh process, so that its peak memory can be measured. All runs are appended as JSON lines to a history file,
+together with the commit and machine they were run on, so that the throughput of different commits can be compared.
+"""
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from math import comb
+from pathlib import Path
+
+import click
+
+from garment_nrs.lib import BACKENDS, CONVEX_SHAPES, NONCONVEX_SHAPES, FilterList, PartitionedPointSet
+
+ALL_SHAPES = [*CONVEX_SHAPES.keys(), *NONCONVEX_SHAPES.keys()]
+
+# every non-empty set of structure types, as accepted by --only
+ALL_FILTERS = [list(f) for k in range(1, len(ALL_SHAPES) + 1) for f in itertools.combinations(ALL_SHAPES, k)]
+
+
+def _colored(points, rnd: random.Random) -> PartitionedPointSet:
+    """ Randomly color half of the points red and the other half blue """
+    colors = ["red", "blue"] * (len(points) // 2) + ["red"] * (len(points) % 2)
+    rnd.shuffle(colors)
+    parts = {"red": [], "blue": []}
+    for p, c in zip(points, colors):
+        parts[c].append(p)
+    return parts
+
+
+def uniform(n: int, rnd: random.Random, size: int = 10000):
+    """ n points with distinct integer coordinates chosen uniformly from [0, size)^2 """
+    return [(c % size, c // size) for c in rnd.sample(range(size * size), n)]
+
+
+def convex_position(n: int, rnd: random.Random):
+    """ n points on the parabola y = x^2 """
+    return [(x, x * x) for x in sorted(rnd.sample(range(-4 * n, 4 * n), n))]
+
+
+def double_chain(n: int, rnd: random.Random):
+    """ Two flat chains of n/2 points each, facing each other such that every point sees the whole other chain,
+    so that only their 4 endpoints lie on the convex hull """
+    k = n - n // 2
+    # each chain bends towards the other one
+    lower = [(2 * i, i * (k - 1 - i)) for i in range(k)]
+    upper = [(2 * i + 1, 10 * n * n - i * (n // 2 - 1 - i)) for i in range(n // 2)]
+    return lower + upper
+
+
+def horton(n: int, rnd: random.Random):
+    """ A Horton set (with no empty convex heptagon): the points with even and odd x are Horton sets themselves,
+    where the odd ones are lifted high enough to lie above all lines through two even ones (and vice versa) """
+    if n <= 1:
+        return [(0, 0)] * n
+    even, odd = horton(n - n // 2, rnd), horton(n // 2, rnd)
+    height = max(abs(y) for _, y in even + odd) + 1
+    lift = 4 * n * n * height
+    return sorted([(2 * x, y) for x, y in even] + [(2 * x + 1, y + lift) for x, y in odd])
+
+
+FAMILIES = {
+    "uniform": uniform,
+    "convex": convex_position,
+    "double-chain": double_chain,
+    "horton": horton,
+}
+
+
+def instances(data, families, sizes, seed):
+    """ Yield (name, parts) for all files in the data directory and for each family and size """
+    from garment_nrs.util import load_points_from_csv, partition_points
+
+    if data:
+        for file in sorted(Path(data).glob("*.csv")):
+            yield file.stem, dict(partition_points(load_points_from_csv(file)))
+    for family in families:
+        for n in sizes:
+            rnd = random.Random(f"{seed}-{family}-{n}")
+            yield f"{family}-n{n}", _colored(FAMILIES[family](n, rnd), rnd)
+
+
+def quad_count(parts: PartitionedPointSet) -> int:
+    return sum(comb(len(ps), 4) for ps in parts.values())
+
+
+def _peak_memory() -> int:
+    """ The peak resident memory of this process in bytes """
+    import resource
+
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def _python_run(conn, parts, only, backend):
+    from garment_nrs.lib import find_empty_monochromatic_structures
+
+    start = time.perf_counter()
+    # without progress bars, so that they are not measured
+    found = sum(1 for _ in find_empty_monochromatic_structures(parts, only, backend, quiet=True))
+    conn.send((time.perf_counter() - start, found, _peak_memory()))
+
+
+def run_python(parts: PartitionedPointSet, only: FilterList, backend: str, timeout: float):
+    """ Search parts in a fresh process and return (seconds, found, peak memory), or None on timeout """
+    import multiprocessing
+
+    ctx = multiprocessing.get_context("spawn")
+    recv, send = ctx.Pipe(duplex=False)
+    process = ctx.Process(target=_python_run, args=(send, parts, only, backend))
+    process.start()
+    result = recv.recv() if recv.poll(timeout) else None
+    if result is None:
+        process.kill()
+    process.join()
+    return result
+
+
+def run_cpp(parts: PartitionedPointSet, only: FilterList, executable: str, timeout: float):
+    """ Search parts with the C++ garment executable and return (seconds, found, peak memory), or None on timeout """
+    from garment_nrs.util import write_points_to_csv
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "instance.csv"
+        with open(path, "w", newline="") as f:
+            write_points_to_csv(parts, f)
+        with open(Path(tmp) / "out.jsonl", "w+") as out:
+            args = [executable, *itertools.chain(*(("--only", o) for o in only or [])), str(path)]
+            start = time.perf_counter()
+            process = subprocess.Popen(args, stdout=out, stderr=subprocess.DEVNULL)
+            timer = threading.Timer(timeout, process.kill)
+            timer.start()
+            _, status, usage = os.wait4(process.pid, 0)
+            seconds = time.perf_counter() - start
+            timer.cancel()
+            process.returncode = os.waitstatus_to_exitcode(status)
+            if process.returncode < 0:  # killed after the timeout
+                return None
+            out.seek(0)
+            found = sum(1 for line in out if line.startswith("{"))
+    memory = usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+    return seconds, found, memory
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=Path(__file__).parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_history(path):
+    if not Path(path).is_file():
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+@click.command()
+@click.option("-d", "--data", type=click.Path(exists=True, file_okay=False), default=None,
+              help="Benchmark all instances in this directory, e.g. data/.")
+@click.option("-f", "--family", "families", type=click.Choice(list(FAMILIES.keys())), multiple=True,
+              help="Benchmark randomly colored point sets of this family, can be specified multiple times.")
+@click.option("-n", "--sizes", default="10,20,30,40,50,60,70,80", show_default=True,
+              help="The comma-separated numbers of points of the generated point sets.")
+@click.option("-o", "--only", "filters", multiple=True,
+              help="A comma-separated filter to benchmark (e.g. bowtie,pant), can be specified multiple times; "
+                   "all combinations of structure types by default.")
+@click.option("-b", "--backend", "backends", type=click.Choice(list(BACKENDS.keys())), multiple=True,
+              help="The Python backends to benchmark, can be specified multiple times; shapely by default.")
+@click.option("--cpp", type=click.Path(exists=True, dir_okay=False), default=None,
+              help="Also benchmark the given C++ garment executable.")
+@click.option("--timeout", type=click.FloatRange(min=0, min_open=True), default=600, show_default=True,
+              help="The number of seconds after which a single run is aborted.")
+@click.option("--seed", default="0", show_default=True, help="The seed for generating the point sets.")
+@click.option("--history", type=click.Path(dir_okay=False), default="benchmarks.jsonl", show_default=True,
+              help="The file to which all runs are appended as JSON lines.")
+@click.option("--baseline", default=None,
+              help="Compare the runs to the latest ones of the given commit (prefix) in the history.")
+def main(data, families, sizes, filters, backends, cpp, timeout, seed, history, baseline):
+    filters = [f.split(",") for f in filters] or ALL_FILTERS
+    for only in filters:
+        for key in only:
+            if key not in ALL_SHAPES:
+                raise KeyError(f"invalid only value {key}")
+    engines = [(b, None) for b in backends or ["shapely"]] + ([("cpp", cpp)] if cpp else [])
+    sizes = [int(n) for n in sizes.split(",") if n]
+
+    previous = {}
+    if baseline:
+        for run in load_history(history):
+            if (run["commit"] or "").startswith(baseline):
+                previous[run["instance"], tuple(run["only"]), run["engine"]] = run
+
+    meta = {
+        "commit": git_commit(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": platform.node(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+    }
+    with open(history, "a") as f:
+        for name, parts in instances(data, families, sizes, seed):
+            quads = quad_count(parts)
+            for only, (engine, executable) in itertools.product(filters, engines):
+                if engine == "cpp":
+                    result = run_cpp(parts, only, executable, timeout)
+                else:
+                    result = run_python(parts, only, engine, timeout)
+                run = {
+                    **meta, "instance": name, "points": sum(len(ps) for ps in parts.values()), "only": only,
+                    "engine": engine, "quads": quads, "timeout": result is None,
+                }
+                if result is None:
+                    click.echo(f"{name} {','.join(only)} {engine}: timeout after {timeout}s")
+                else:
+                    seconds, found, memory = result
+                    run.update(seconds=seconds, found=found, memory=memory, quads_per_second=quads / seconds)
+                    line = f"{name} {','.join(only)} {engine}: {seconds:.3f}s, {quads / seconds:,.0f} quads/s, " \
+                           f"{memory / 2 ** 20:.1f} MiB, {found} found"
+                    old = previous.get((name, tuple(only), engine))
+                    if old and not old["timeout"]:
+                        line += f" ({old['seconds'] / seconds:.2f}x vs {old['commit'][:8]})"
+                    click.echo(line)
+                f.write(json.dumps(run) + "\n")
+                f.flush()
+
+
+if __name__ == "__main__":
+    main()
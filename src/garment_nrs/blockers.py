@@ -0,0 +1,121 @@
+"""The other-colored points blocking each structure, for minimizing counterexamples in a single pass.
+
+A structure is empty exactly if none of its blockers (the other-colored points within its region) is left, and it
+only exists while all of its four vertices are left.
+Thus, after removing a set R of points, the remaining set contains an empty structure exactly if some structure has
+no vertex in R and all of its blockers in R.
+The BlockerTable enumerates all structures once, storing their vertices and their blockers as bitsets over all points,
+and then answers which points can be removed (after removing R) with one vectorized pass over these bitsets.
+"""
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from garment_nrs.exact import integer_coordinates
+from garment_nrs.lib import CONVEX_SHAPES, NONCONVEX_SHAPES, FilterList, PartitionedPointSet
+from garment_nrs.vectorized import Coordinates, SignTable, bottom_left_rank, classify_quads, quad_chunks, region_masks
+
+__all__ = ["BlockerTable"]
+
+# number of set bits of every byte
+POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.intp)
+
+
+class BlockerTable:
+    """ The vertices and blockers of all structures of a point set.
+
+    Points are identified by (color, index within parts[color]) pairs, while internally, all points are numbered
+    in the order of parts.
+    """
+
+    def __init__(self, parts: PartitionedPointSet, only: FilterList = None,
+                 coordinates: Coordinates = integer_coordinates):
+        for key in only or []:
+            if key not in CONVEX_SHAPES and key not in NONCONVEX_SHAPES:
+                raise KeyError(f"invalid only value {key}")
+        self.parts = parts
+        self.points: List[Tuple[str, int]] = [(c, i) for c, ps in parts.items() for i in range(len(ps))]
+        self.index = {p: i for i, p in enumerate(self.points)}
+        offset = dict(zip(parts.keys(), np.cumsum([0, *(len(ps) for ps in parts.values())])))
+        n = len(self.points)
+
+        vertices, blockers = [np.empty((0, 4), dtype=np.intp)], [np.empty((0, (n + 7) // 8), dtype=np.uint8)]
+        coords = coordinates(parts)
+        for color in parts.keys():
+            same = coords[color]
+            others = [c for c in parts.keys() if c != color]
+            other = np.concatenate([coords[c] for c in others] or [same[:0]])
+            other_index = np.concatenate([offset[c] + np.arange(len(parts[c])) for c in others]
+                                         or [np.empty(0, dtype=np.intp)])
+            signs = SignTable(same, other)
+            rank = bottom_left_rank(same)
+            for quads in quad_chunks(len(same)):
+                kind, order = classify_quads(quads, signs.S, rank)
+                for slot, rows, mask in region_masks(kind, order, signs.S, signs.L, only):
+                    inside = np.zeros((len(rows), n), dtype=bool)
+                    inside[:, other_index] = mask
+                    vertices.append(offset[color] + quads[rows])
+                    blockers.append(np.packbits(inside, axis=1))
+        self.vertices = np.concatenate(vertices)
+        self.blockers = np.concatenate(blockers)
+
+    def _mask(self, removed: Sequence[Tuple[str, int]]) -> np.ndarray:
+        mask = np.zeros(len(self.points), dtype=bool)
+        mask[[self.index[p] for p in removed]] = True
+        return mask
+
+    def removable(self, removed: Sequence[Tuple[str, int]] = ()) -> List[Tuple[str, int]]:
+        """ All points whose removal (in addition to the already removed ones) leaves no empty structure """
+        gone = self._mask(removed)
+        alive = ~gone[self.vertices].any(axis=1)
+        left = self.blockers[alive] & ~np.packbits(gone)
+        count = POPCOUNT[left].sum(axis=1)
+
+        # a point that is the only blocker left of some structure cannot be removed ...
+        keep = gone.copy()
+        sole = np.unpackbits(left[count == 1], axis=1, count=len(self.points)).astype(bool)
+        keep |= sole.any(axis=0)
+        # ... and if there already are empty structures, a point can only be removed if it is a vertex of all of them
+        empty = self.vertices[alive][count == 0]
+        if len(empty):
+            keep |= np.bincount(empty.ravel(), minlength=len(self.points)) < len(empty)
+        return [self.points[i] for i in np.flatnonzero(~keep)]
+
+    def is_counterexample(self, removed: Sequence[Tuple[str, int]] = ()) -> bool:
+        """ Check whether no empty structure is left after removing the given points """
+        gone = self._mask(removed)
+        alive = ~gone[self.vertices].any(axis=1)
+        left = self.blockers[alive] & ~np.packbits(gone)
+        return bool(left.any(axis=1).all())
+
+    def greedy(self, removed: Sequence[Tuple[str, int]] = ()) -> List[Tuple[str, int]]:
+        """ Repeatedly remove the first removable point, until the counterexample is minimal;
+        returns all removed points """
+        removed = list(removed)
+        while candidates := self.removable(removed):
+            removed.append(candidates[0])
+        return removed
+
+    def exhaustive(self, removed: Sequence[Tuple[str, int]] = (), limit: Optional[int] = None) \
+            -> List[Tuple[str, int]]:
+        """ Search all orders of removing one point after the other (each intermediate set being a counterexample)
+        and return the largest set of removed points, i.e. the smallest counterexample reachable this way.
+        Each set of removed points is only visited once; the search stops after visiting limit sets (if given). """
+        best = list(removed)
+        seen = set()
+        stack = [tuple(sorted(removed, key=self.index.get))]
+        while stack and (limit is None or len(seen) < limit):
+            current = stack.pop()
+            if current in seen:
+                continue
+            seen.add(current)
+            if len(current) > len(best):
+                best = list(current)
+            for p in reversed(self.removable(current)):
+                stack.append(tuple(sorted((*current, p), key=self.index.get)))
+        return best
+
+    def reduced(self, removed: Sequence[Tuple[str, int]]) -> PartitionedPointSet:
+        """ The point set without the removed points """
+        removed = set(removed)
+        return {c: [p for i, p in enumerate(ps) if (c, i) not in removed] for c, ps in self.parts.items()}
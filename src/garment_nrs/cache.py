@@ -0,0 +1,245 @@
+"""Persistent cache of found structures, keyed by the canonical colored order type of a point set.
+
+Which structures are empty only depends on the orientations of all point triples and on the colors of the points.
+To recognize a point set independent of its coordinates, the order in which it is labeled and its orientation, its
+points are labeled by sorting them around a vertex of the convex hull, once counter-clockwise and once clockwise with
+all orientations flipped. The smallest of these labelings (comparing the colors and then the orientations of all
+triples) is canonical and, together with the filter of structure types, hashed to the cache key. As the results of
+backends with rounding (shapely and numpy) may differ between point sets with the same order type, the key also
+contains the backend, except for the exact backends, which share their entries.
+
+Found structures are stored through the canonical labels of their 4 points and the labels of the hull edge(s)
+identifying the variant (e.g. which of the 4 necklaces of a convex 4-tuple), from which the records of any point set
+with the same key can be rebuilt. Existence queries only store whether any structure exists, until a full search
+stores all structures. Entries are kept in an SQLite database, evicting the least recently used ones once it grows
+beyond the given size.
+"""
+import functools
+import hashlib
+import itertools
+import json
+import sqlite3
+import time
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+from shapely import Polygon
+
+from garment_nrs.exact import integer_coordinates
+from garment_nrs.lib import (CONVEX_SHAPES, NONCONVEX_SHAPES, FilterList, PartitionedPointSet, PointSet,
+                             find_empty_monochromatic_structures, get_backend, has_empty_monochromatic_structure,
+                             is_convex_quad)
+from garment_nrs.vectorized import SLOTS, orientation_signs
+
+__all__ = ["canonical_labeling", "canonical_form", "candidate_labelings", "ResultCache"]
+
+# bumped whenever the meaning of stored entries changes
+CACHE_VERSION = 2
+
+# the backends deciding emptiness without rounding, which thus only depends on the colored order type and whose
+# entries are shared; the entries of all other backends are only used by the same backend
+EXACT_BACKENDS = {"exact", "table", "walk", "cgal"}
+
+DEFAULT_MAX_SIZE = 256 * 2 ** 20
+
+
+def _hull_vertices(coords: List[Tuple[int, int]]) -> List[int]:
+    """ The indices of the strictly convex vertices of the convex hull (monotone chain on exact coordinates) """
+    order = sorted(set(range(len(coords))), key=lambda i: coords[i])
+
+    def cross(o, a, b):
+        (ox, oy), (ax, ay), (bx, by) = coords[o], coords[a], coords[b]
+        return (ax - ox) * (by - oy) - (ay - oy) * (bx - ox)
+
+    chains = []
+    for points in (order, order[::-1]):
+        chain = []
+        for i in points:
+            while len(chain) >= 2 and cross(chain[-2], chain[-1], i) <= 0:
+                chain.pop()
+            if not chain or coords[chain[-1]] != coords[i]:
+                chain.append(i)
+        chains.append(chain[:-1])
+    return sorted(set(chains[0] + chains[1]))
+
+
+def canonical_labeling(parts: PartitionedPointSet) -> Tuple[bytes, List[Tuple[str, int]]]:
+    """ The canonical form of the colored order type of parts and the (color, index) of the point with each label """
+    points = [(c, i) for c, ps in parts.items() for i in range(len(ps))]
+    coords = [tuple(int(v) for v in p) for ps in integer_coordinates(parts).values() for p in ps]
+    arr = np.array(coords, dtype=object).reshape(-1, 2)
+    S = orientation_signs(arr[:, None, None, :], arr[None, :, None, :], arr[None, None, :, :])
+    return canonical_form(points, coords, S)
+
+
+def candidate_labelings(coords: List[Tuple[int, int]], S: np.ndarray) -> Iterator[Tuple[np.ndarray, bytes]]:
+    """ The labelings (as permutations of the points) starting at each hull vertex, once counter-clockwise and once
+    clockwise, together with the orientations of all triples in each of them (flipped for the clockwise ones) """
+    n = len(coords)
+    triples = np.array(list(itertools.combinations(range(n), 3)), dtype=np.intp).reshape(-1, 3)
+
+    def distance(p, q):
+        return (coords[p][0] - coords[q][0]) ** 2 + (coords[p][1] - coords[q][1]) ** 2
+
+    for apex, sigma in itertools.product(_hull_vertices(coords) or [0], (1, -1)):
+        def before(q, r):
+            # q comes before r if it is counter-clockwise (for sigma=1) of r, or closer on the same ray
+            return -int(S[apex, q, r]) * sigma or distance(apex, q) - distance(apex, r)
+
+        perm = [apex, *sorted((q for q in range(n) if q != apex), key=functools.cmp_to_key(before))]
+        perm = np.array(perm, dtype=np.intp)
+        signs = (S[perm[triples[:, 0]], perm[triples[:, 1]], perm[triples[:, 2]]] * sigma).astype(np.int8)
+        yield perm, signs.tobytes()
+
+
+def canonical_form(points: List[Tuple[str, int]], coords: List[Tuple[int, int]], S: np.ndarray) \
+        -> Tuple[bytes, List[Tuple[str, int]]]:
+    """ canonical_labeling of the (color, index) points with the given exact coordinates
+    and the (n, n, n) orientation signs S of all their triples """
+    if not points:
+        return b"", []
+    best = None
+    for perm, signs in candidate_labelings(coords, S):
+        candidate = ([points[i][0] for i in perm], signs)
+        if best is None or candidate < best[0]:
+            best = candidate, [points[i] for i in perm]
+
+    (colors, signs), labels = best
+    return json.dumps(colors).encode() + b"\0" + signs, labels
+
+
+def _variant_edges(name: str, variant: int, hull: List[int], interior: Optional[int]) -> List[Tuple[int, int]]:
+    """ The hull edges (as pairs of vertices in hull order) identifying a variant of a structure """
+    if name == "necklace":  # the union of the two triangles sharing this edge
+        return [(hull[(variant + 1) % 4], hull[(variant + 2) % 4])]
+    if name == "bowtie":  # the two lobes at these opposite edges
+        return [(hull[variant], hull[variant + 1]), (hull[variant + 2], hull[(variant + 3) % 4])]
+    if name == "pant":  # the edge into which the interior point is inserted
+        return [(hull[variant], hull[(variant + 1) % 3])]
+    return []
+
+
+def _identity(edges: List[Tuple[int, int]], labels) -> List[List[int]]:
+    return sorted(sorted(labels[i] for i in edge) for edge in edges)
+
+
+class ResultCache:
+    """ Found structures by canonical colored order type and filter, stored in an SQLite database at path """
+
+    def __init__(self, path, max_size: int = DEFAULT_MAX_SIZE):
+        self.path = str(path)
+        self.max_size = max_size
+        with self._connect() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS entries "
+                       "(key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, used REAL NOT NULL)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=60)
+
+    @staticmethod
+    def key(order_type: bytes, only: FilterList, backend: str) -> str:
+        only = sorted(only or [*CONVEX_SHAPES, *NONCONVEX_SHAPES])
+        predicates = "exact" if backend in EXACT_BACKENDS else backend
+        return hashlib.sha256(b"%d\0%s\0%s\0%s" % (
+            CACHE_VERSION, predicates.encode(), json.dumps(only).encode(), order_type)).hexdigest()
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._connect() as db:
+            row = db.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            db.execute("UPDATE entries SET used = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[0])
+
+    def put(self, key: str, value: dict):
+        value = json.dumps(value)
+        with self._connect() as db:
+            db.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)", (key, value, len(value), time.time()))
+            total, = db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()
+            # evict the least recently used entries
+            for old, size in db.execute("SELECT key, size FROM entries ORDER BY used").fetchall():
+                if total <= self.max_size or old == key:
+                    break
+                db.execute("DELETE FROM entries WHERE key = ?", (old,))
+                total -= size
+
+    @staticmethod
+    def _hull(pts: PointSet, backend: str) -> Tuple[Polygon, List[int], Optional[int]]:
+        """ The hull of a 4-tuple as the backend computes it, its vertices as indices into pts and the interior one """
+        hull = get_backend(backend).convex_hull(pts) if backend != "shapely" else Polygon(pts).convex_hull
+        vertices = [pts.index(tuple(c)) for c in hull.exterior.coords[:-1]]
+        interior = next((i for i in range(4) if i not in vertices), None)
+        return hull, vertices, interior
+
+    def _store(self, record: dict, labels: dict, backend: str) -> Optional[list]:
+        """ A found structure by the labels of its points and of the hull edges identifying its variant """
+        pts = tuple(map(tuple, record["points"]))
+        hull, vertices, interior = self._hull(pts, backend)
+        shapes = CONVEX_SHAPES if is_convex_quad(hull) else NONCONVEX_SHAPES
+        for variant, region in enumerate(shapes[record["type"]](hull, pts)):
+            if region.equals(record["shape"]):
+                quad_labels = [labels[record["color"], p] for p in pts]
+                edges = _variant_edges(record["type"], variant, vertices, interior)
+                return [sorted(quad_labels), record["type"], _identity(edges, quad_labels)]
+        return None
+
+    def _rebuild(self, parts: PartitionedPointSet, labels: List[Tuple[str, int]], structures: list, backend: str):
+        """ The records of the cached structures for the given point set, in the order of the search """
+        colors = list(parts.keys())
+        found = []
+        for quad_labels, name, identity in structures:
+            color = labels[quad_labels[0]][0]
+            index = sorted(labels[l][1] for l in quad_labels)
+            pts = tuple(parts[color][i] for i in index)
+            by_point = {labels[l][1]: l for l in quad_labels}
+            hull, vertices, interior = self._hull(pts, backend)
+            shapes = CONVEX_SHAPES if is_convex_quad(hull) else NONCONVEX_SHAPES
+            for variant, region in enumerate(shapes[name](hull, pts)):
+                edges = _variant_edges(name, variant, vertices, interior)
+                if _identity(edges, [by_point[i] for i in index]) == identity:
+                    found.append(((colors.index(color), index, SLOTS.index((name, variant))), {
+                        "color": color,
+                        "type": name,
+                        "points": pts,
+                        "shape": region,
+                    }))
+                    break
+        return [record for _, record in sorted(found, key=lambda f: f[0])]
+
+    def find_empty_monochromatic_structures(self, parts: PartitionedPointSet, only: FilterList = None,
+                                            backend: str = "shapely", jobs: Optional[int] = 1, quiet: bool = False):
+        """ All empty structures like find_empty_monochromatic_structures, taken from the cache if possible """
+        order_type, labels = canonical_labeling(parts)
+        key = self.key(order_type, only, backend)
+        entry = self.get(key)
+        if entry is not None and entry["structures"] is not None:
+            yield from self._rebuild(parts, labels, entry["structures"], backend)
+            return
+
+        label_of = {point: label for label, point in enumerate(labels)}
+        index_of = {c: {p: i for i, p in enumerate(ps)} for c, ps in parts.items()}
+        structures = []
+        for record in find_empty_monochromatic_structures(parts, only, backend, jobs, quiet=quiet):
+            yield record
+            if structures is not None:
+                color = record["color"]
+                point_labels = {(color, p): label_of[color, index_of[color][p]] for p in record["points"]}
+                stored = self._store(record, point_labels, backend)
+                if stored is None:  # the variant could not be identified, so do not cache this point set
+                    structures = None
+                else:
+                    structures.append(stored)
+        if structures is not None:
+            self.put(key, {"found": bool(structures), "structures": structures})
+
+    def has_empty_monochromatic_structure(self, parts: PartitionedPointSet, only: FilterList = None,
+                                          backend: str = "shapely", jobs: Optional[int] = 1) -> bool:
+        """ Whether any empty structure exists, taken from the cache if possible """
+        order_type, labels = canonical_labeling(parts)
+        key = self.key(order_type, only, backend)
+        entry = self.get(key)
+        if entry is not None:
+            return entry["found"]
+        found = has_empty_monochromatic_structure(parts, only, backend, jobs)
+        self.put(key, {"found": found, "structures": None if found else []})
+        return found
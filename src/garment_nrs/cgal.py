@@ -0,0 +1,176 @@
+"""The exact C++ checker from cpp/ as backend, called in-process through cppyy.
+
+This needs the shared library built by the `garment_py` target of cpp/CMakeLists.txt (see the README), which is
+loaded from $GARMENT_CGAL_LIBRARY (default cpp/build/libgarment_py.so), while the headers are included from
+$GARMENT_CGAL_INCLUDE (default cpp/). The points are passed to C++ as doubles, so they are exact for all integer and
+most decimal inputs.
+
+The C++ search reports each found structure through a callback, which `search` forwards to a Python function.
+To report the same records as the other backends, the colors are passed to C++ under keys sorting in the order of
+parts and the structures of each 4-tuple are reordered by slot, so that a record only has to be buffered until the
+next 4-tuple is reached. The region of each record is the shapely variant equal to the region built by CGAL.
+"""
+import os
+import queue
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import cppyy
+from shapely import MultiPolygon, Polygon
+
+from garment_nrs.lib import CONVEX_SHAPES, NONCONVEX_SHAPES, FilterList, PartitionedPointSet, PointSet
+from garment_nrs.vectorized import SLOTS
+
+__all__ = ["search", "convex_hull", "find_empty_monochromatic_structures", "has_empty_monochromatic_structure"]
+
+_ROOT = Path(__file__).parents[2]
+cppyy.add_include_path(os.environ.get("GARMENT_CGAL_INCLUDE", str(_ROOT / "cpp")))
+cppyy.include("python.hpp")
+cppyy.load_library(os.environ.get("GARMENT_CGAL_LIBRARY", str(_ROOT / "cpp" / "build" / "libgarment_py.so")))
+
+gbl = cppyy.gbl
+std = cppyy.gbl.std
+
+# the search runs on C++ threads, which only take the GIL when calling back into Python
+gbl.find_empty_monochromatic_structures.__release_gil__ = True
+gbl.has_empty_monochromatic_structure.__release_gil__ = True
+
+# the C++ checker does all its work on its own threads, so lib passes jobs on instead of starting processes
+THREADED = True
+
+
+def _key(index: int) -> str:
+    """ The C++ name of the index-th color, as std::map sorts its colors """
+    return f"{index:08d}"
+
+
+def _convert(parts: PartitionedPointSet, only: FilterList):
+    cpp_parts = gbl.PartitionedPointSet()
+    for i, ps in enumerate(parts.values()):
+        gbl.add_points(cpp_parts, _key(i), std.vector["double"]([float(v) for p in ps for v in p]))
+    cpp_only = std.set[std.string]()
+    for key in only or []:
+        if key not in CONVEX_SHAPES and key not in NONCONVEX_SHAPES:
+            raise KeyError(f"invalid only value {key}")
+        cpp_only.insert(key)
+    return cpp_parts, cpp_only
+
+
+def _region(structure) -> Polygon | MultiPolygon:
+    polygons = []
+    for rings in gbl.outlines(structure.shape):
+        shell, *holes = [list(zip(ring[::2], ring[1::2])) for ring in map(list, rings)]
+        polygons.append(Polygon(shell, holes))
+    return polygons[0] if len(polygons) == 1 else MultiPolygon(polygons)
+
+
+def convex_hull(pts: PointSet) -> Polygon:
+    return Polygon(pts).convex_hull
+
+
+class _Records:
+    """ Turns the C++ structures into records, passing those of each 4-tuple on in reference order """
+
+    def __init__(self, parts: PartitionedPointSet, on_found: Callable[[Dict], bool]):
+        self.colors = list(parts.keys())
+        self.parts = parts
+        self.index = [{(float(x), float(y)): i for i, (x, y) in reversed(list(enumerate(ps)))} for ps in parts.values()]
+        self.on_found = on_found
+        self.quad = None
+        self.pending = []
+
+    def add(self, structure) -> bool:
+        c = int(structure.color)
+        coords = list(gbl.coordinates(structure.points))
+        quad = (c, tuple(self.index[c][p] for p in zip(coords[::2], coords[1::2])))
+        if quad != self.quad and not self.flush():
+            return False
+        self.quad = quad
+        self.pending.append((str(structure.type), _region(structure)))
+        return True
+
+    def flush(self) -> bool:
+        if not self.pending:
+            return True
+        c, quad = self.quad
+        color = self.colors[c]
+        pts = tuple(self.parts[color][i] for i in quad)
+        hull = convex_hull(pts)
+        records = []
+        for kind, region in self.pending:
+            func = CONVEX_SHAPES[kind] if kind in CONVEX_SHAPES else NONCONVEX_SHAPES[kind]
+            for variant, shape in enumerate(func(hull, pts)):
+                if shape.equals(region):
+                    records.append((SLOTS.index((kind, variant)), shape))
+                    break
+            else:
+                raise ValueError(f"{kind} on {pts} built by CGAL matches none of the shapely variants")
+        self.pending = []
+        for slot, shape in sorted(records, key=lambda r: r[0]):
+            if not self.on_found({"color": color, "type": SLOTS[slot][0], "points": pts, "shape": shape}):
+                return False
+        return True
+
+
+def search(parts: PartitionedPointSet, only: FilterList, on_found: Callable[[Dict], bool], jobs: Optional[int] = 1):
+    """ Call on_found with each record, in the order of the reference, until it returns False """
+    cpp_parts, cpp_only = _convert(parts, only)
+    records = _Records(parts, on_found)
+    stopped = []
+
+    def found(structure):
+        try:
+            if records.add(structure):
+                return True
+        except BaseException as e:  # exceptions can't be raised through C++, so re-raise them afterwards
+            stopped.append(e)
+        stopped.append(None)
+        return False
+
+    gbl.find_empty_monochromatic_structures(cpp_parts, cpp_only, found, jobs or 0)
+    if stopped and stopped[0] is not None:
+        raise stopped[0]
+    if not stopped:
+        records.flush()
+
+
+def find_empty_monochromatic_structures(parts: PartitionedPointSet, only: FilterList = None,
+                                        jobs: Optional[int] = 1):
+    """ Yield the records found by search, which runs on a separate thread until the consumer stops iterating """
+    results = queue.Queue(maxsize=64)
+    closed = threading.Event()
+    done = object()
+
+    def put(item) -> bool:
+        while not closed.is_set():
+            try:
+                results.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def run():
+        try:
+            search(parts, only, put, jobs)
+        except BaseException as e:
+            put(e)
+        else:
+            put(done)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    try:
+        while (item := results.get()) is not done:
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        closed.set()
+        thread.join()
+
+
+def has_empty_monochromatic_structure(parts: PartitionedPointSet, only: FilterList = None,
+                                      jobs: Optional[int] = 1) -> bool:
+    return bool(gbl.has_empty_monochromatic_structure(*_convert(parts, only), jobs or 0))
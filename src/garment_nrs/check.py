@@ -1,9 +1,14 @@
+import hashlib
+import json
 import random
+import threading
+import time
 from pathlib import Path
+from typing import List
 
 import click
 
-from garment_nrs.lib import CONVEX_SHAPES, NONCONVEX_SHAPES, find_empty_monochromatic_structures
+from garment_nrs.lib import BACKENDS, CONVEX_SHAPES, NONCONVEX_SHAPES, has_empty_monochromatic_structure
 from garment_nrs.util import *
 
 
@@ -40,44 +45,316 @@ def strengthen_filter(only):
 ALL_SHAPES = [*CONVEX_SHAPES.keys(), *NONCONVEX_SHAPES.keys()]
 
 
+EXTENSIONS = {"cells": False, "all-cells": True}  # whether cells outside of the bounding box are also tried
+
+
+def check_tasks(only, trials, cells=None):
+    """ The independent searches for checking a file, as (name, filter, added point) triples in the order of reporting.
+
+    The file is fine if there is no structure for "base", but one for each "add" and "strengthen" task. If cells is
+    one of EXTENSIONS, a single task of that name trying a point in every cell replaces the random points to "add".
+    """
+    yield "base", list(only), None
+    if cells:
+        yield cells, list(only), None
+    for p in trials:
+        yield "add", list(only), p
+    for s_only in strengthen_filter(only):
+        yield "strengthen", s_only, None
+
+
+def run_check_task(parts, only, backend, jobs, cache=None, stats=False):
+    """ Whether parts contains an empty structure of the given types,
+    together with the counters of the search (see garment_nrs.stats) if stats is set """
+    if not stats:
+        return has_empty_monochromatic_structure(parts, only, backend, jobs, cache)
+    from garment_nrs.stats import collect
+
+    with collect() as counters:
+        start = time.perf_counter()
+        found = has_empty_monochromatic_structure(parts, only, backend, jobs, cache)
+        counters.color = None  # count the whole search for all colors
+        counters.time("search", time.perf_counter() - start)
+        counters.count("checks")
+    return found, counters.to_dict()
+
+
+def run_trials(parts, only, points, backend="numpy", jobs=1, cache=None) -> List[bool]:
+    """ Whether parts contains an empty structure of the given types after adding each of the points on its own.
+
+    For the backends based on the vectorized predicates, the structures are updated incrementally for each point,
+    on the same (float or exact integer) coordinates. The other backends search each extended point set from scratch.
+    """
+    from garment_nrs.exact import integer_coordinates, scaled_coordinates
+    from garment_nrs.incremental import IncrementalChecker
+    from garment_nrs.lib import get_backend
+
+    coordinates = getattr(get_backend(backend), "COORDINATES", None)
+    if coordinates is None:
+        return [has_empty_monochromatic_structure({**parts, c: [*parts.get(c, []), p]}, only, backend, jobs, cache)
+                for p, c in points]
+    if coordinates is integer_coordinates:
+        coordinates = scaled_coordinates({c: [*ps, *(p for p, pc in points if pc == c)] for c, ps in parts.items()})
+    checker = IncrementalChecker(parts, only, coordinates)
+    found = []
+    for p in points:
+        checker.add_point(*p)
+        found.append(checker.has_empty_structure())
+        checker.remove_point()
+    return found
+
+
+def run_extensions(parts, only, cells, jobs):
+    """ A point and color that can be added to parts without creating an empty structure, or None if every point in
+    every cell of the arrangement of parts (see garment_nrs.extensions) creates one """
+    from garment_nrs.extensions import find_extension
+
+    return find_extension(parts, only, EXTENSIONS[cells], jobs)[0]
+
+
+class Checkpoint:
+    """ The results of finished check tasks and the random points of each file, appended as JSON lines to a file
+    so that an interrupted run can be resumed. Entries are keyed by the file's content hash, so changed files are
+    checked again, and by the backend that decided them, so that switching e.g. from shapely to exact checks them
+    again instead of reusing results that may be subject to rounding. """
+
+    def __init__(self, path=None, backend=None):
+        self.path = path
+        self.backend = backend
+        self.results = {}
+        self.trials = {}
+        self.lock = threading.Lock()
+        if path and Path(path).is_file():
+            with open(path) as f:
+                for line in f:
+                    if not line.strip():
+                        continue  # possibly truncated by an interruption
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if "trials" in entry:
+                        self.trials[entry["digest"]] = [((x, y), c) for (x, y), c in entry["trials"]]
+                    else:
+                        key = self._key(entry.get("backend"), entry["digest"], entry["task"], entry["only"],
+                                        entry["point"])
+                        self.results[key] = entry["found"]
+
+    @staticmethod
+    def _key(backend, digest, task, only, point):
+        if point is not None:
+            point = [list(point[0]), point[1]]
+        return json.dumps([backend, digest, task, sorted(only), point])
+
+    def key(self, digest, task, only, point):
+        return self._key(self.backend, digest, task, only, point)
+
+    def _append(self, entry):
+        if not self.path:
+            return
+        with self.lock, open(self.path, "a") as f:
+            f.write(json.dumps(entry, default=str) + "\n")
+
+    def get_trials(self, file, digest, count, draw):
+        trials = self.trials.setdefault(digest, [])
+        if len(trials) < count:
+            trials.extend(draw() for _ in range(count - len(trials)))
+            self._append({"file": str(file), "digest": digest, "trials": trials})
+        return trials[:count]
+
+    def record(self, file, digest, task, only, point, found):
+        with self.lock:
+            self.results[self.key(digest, task, only, point)] = found
+        self._append({"file": str(file), "digest": digest, "backend": self.backend, "task": task, "only": only,
+                      "point": point, "found": found})
+
+
+def collect_files(dir: Path, checkpoint: Checkpoint, trials: int, cells=None):
+    """ Lazily load all CSV files and all instances of containers in dir (or the container dir itself)
+    with their filter (derived from the name), content hash and check tasks """
+    from garment_nrs.instances import SUFFIX, InstanceFile
+
+    if dir.is_file():
+        sources = [dir]
+    else:
+        sources = [f for f in dir.rglob("*") if f.is_file() and f.suffix in (".csv", SUFFIX)]
+    for source in sources:
+        if source.suffix == ".csv":
+            instances = [(source, source.stem, load_points_from_csv(source), source.read_bytes())]
+        else:
+            instances = ((f"{source}:{name}", name, points, json.dumps(points).encode())
+                         for name, points in InstanceFile(source))
+        for file, name, points, content in instances:
+            parts = partition_points(points)
+            ignore = {f"n{len(points)}", "c2", "no", "mc"}
+            only = [s for s in name.split("_") if not s in ignore]
+
+            digest = hashlib.sha256(content).hexdigest()
+            points_to_add = [] if cells else \
+                checkpoint.get_trials(file, digest, trials,
+                                      lambda: (random_point(points), random.choice(list(parts.keys()))))
+            yield file, points, parts, only, digest, list(check_tasks(only, points_to_add, cells))
+
+
 @click.command()
-@click.argument("dir", type=click.Path(exists=True, file_okay=False))
-def main(dir):
-    checked = []
-    dir = Path(dir)
-    for file in dir.rglob("*.csv"):
-        if not file.is_file(): continue
+@click.argument("dir", type=click.Path(exists=True))
+@click.option("-b", "--backend", type=click.Choice(list(BACKENDS.keys())), default="shapely", show_default=True,
+              help="The engine used for deciding which structures are empty.")
+@click.option("-j", "--jobs", type=click.IntRange(min=0), default=1, show_default=True,
+              help="The number of processes searching the 4-tuples in parallel, 0 for all cores.")
+@click.option("-w", "--workers", type=click.IntRange(min=0), default=1, show_default=True,
+              help="The number of processes running the checks of all files in parallel, 0 for all cores.")
+@click.option("-t", "--trials", type=click.IntRange(min=0), default=10, show_default=True,
+              help="The number of random points that are added one at a time, each of which should yield a structure. "
+                   "They are checked incrementally on the predicates of the selected backend, except for the shapely "
+                   "and cgal backends, which search each extended point set from scratch.")
+@click.option("-e", "--extensions", "cells", type=click.Choice(list(EXTENSIONS.keys())), default=None,
+              help="Instead of random points, add a point in each cell of the arrangement of the lines through all "
+                   "pairs of points (within their bounding box or, for all-cells, everywhere).")
+@click.option("-c", "--checkpoint", type=click.Path(dir_okay=False), default=None,
+              help="Record finished checks in the given file and skip those already recorded there.")
+@click.option("--cache", type=click.Path(dir_okay=False), default=None, envvar="GARMENT_CACHE",
+              help="Take the results from (and store them in) the given cache database, keyed by colored order type.")
+@click.option("--cache-size", type=click.IntRange(min=1), default=256, show_default=True,
+              help="The size in MiB beyond which the least recently used cache entries are evicted.")
+@click.option("--stats", "stats_file", type=click.Path(writable=True, dir_okay=False), default=None,
+              help="Write the time spent in and the counters of each phase of the searches per file as JSON "
+                   "to the given file.")
+def main(dir, backend, jobs, workers, trials, cells, checkpoint, cache, cache_size, stats_file):
+    checkpoint = Checkpoint(checkpoint, backend)
+    if cache:
+        from garment_nrs.cache import ResultCache
+        cache = ResultCache(cache, cache_size * 2 ** 20)
+    files = collect_files(Path(dir), checkpoint, trials, cells)
+
+    pool = None
+    if workers != 1:
+        from concurrent.futures import ProcessPoolExecutor
+        pool = ProcessPoolExecutor(workers or None)
+        files = list(files)  # all checks are submitted up front
+    stats = {} if stats_file else None
+    try:
+        return report(files, checkpoint, pool, backend, jobs, cache, stats)
+    finally:
+        if pool:
+            pool.shutdown(wait=False, cancel_futures=True)
+        if stats_file:
+            with open(stats_file, "w") as f:
+                json.dump({file: counters.to_dict() for file, counters in stats.items()}, f, indent=2)
 
-        points = load_points_from_csv(file)
-        parts = partition_points(points)
-        ignore = {f"n{len(points)}", "c2", "no", "mc"}
-        only = [s for s in file.stem.split("_") if not s in ignore]
 
+def report(files, checkpoint, pool, backend, jobs, cache=None, counters=None):
+    """ Print the outcome of all checks in order and return the exit code of the first failing one.
+
+    The base and strengthening checks are answered from the cache (if given) for already known order types.
+    If counters is a dict, the counters of all searches run for a file are collected in a Stats object under its name.
+    If a pool is given, all checks not in the checkpoint are submitted to it up front and recorded as they finish,
+    otherwise they are run (and recorded) one after the other while reporting.
+    The random points of each file are checked together, as their structures are updated incrementally
+    (see run_trials).
+    The point found by a failing extension task is only reported if it was not taken from the checkpoint.
+    """
+    pending = {}
+    witnesses = {}
+
+    def unfinished(digest, tasks):
+        keys = [checkpoint.key(digest, *task) for task in tasks]
+        return [(key, task) for key, task in zip(keys, tasks) if key not in checkpoint.results and key not in pending]
+
+    def collected(file, result):
+        """ Add the counters returned by run_check_task to the stats of file and return whether it found a structure """
+        if counters is None:
+            return result
+        from garment_nrs.stats import Stats
+
+        found, data = result
+        counters.setdefault(str(file), Stats()).merge(data)
+        return found
+
+    def record_trials(file, digest, trials, found):
+        if counters is not None:
+            from garment_nrs.stats import Stats
+            counters.setdefault(str(file), Stats()).count("incremental trials", len(found))
+        for (key, (task, t_only, p)), f in zip(trials, found):
+            checkpoint.record(file, digest, task, t_only, p, f)
+
+    if pool:
+        for file, points, parts, only, digest, tasks in files:
+            for key, (task, t_only, p) in unfinished(digest, [t for t in tasks if t[0] != "add"]):
+                if task in EXTENSIONS:
+                    future = pool.submit(run_extensions, dict(parts), t_only, task, jobs)
+                    future.add_done_callback(lambda f, args=(file, digest, task, t_only, p): (
+                        f.cancelled() or f.exception() or checkpoint.record(*args, f.result() is None)))
+                    pending[key] = future, "witness"
+                    continue
+                future = pool.submit(run_check_task, dict(parts), t_only, backend, jobs, cache, counters is not None)
+                future.add_done_callback(lambda f, args=(file, digest, task, t_only, p): (
+                    f.cancelled() or f.exception() or checkpoint.record(*args, collected(args[0], f.result()))))
+                pending[key] = future, None
+            trials = unfinished(digest, [t for t in tasks if t[0] == "add"])
+            if trials:
+                future = pool.submit(run_trials, dict(parts), only, [p for key, (_, _, p) in trials],
+                                     backend, jobs, cache)
+                future.add_done_callback(lambda f, args=(file, digest, trials): (
+                    f.cancelled() or f.exception() or record_trials(*args, f.result())))
+                pending.update((key, (future, i)) for i, (key, task) in enumerate(trials))
+
+    def found(file, parts, digest, tasks, task, t_only, p):
+        key = checkpoint.key(digest, task, t_only, p)
+        if key in pending:
+            future, index = pending[key]
+            if index == "witness":
+                witnesses[key] = future.result()
+                return witnesses[key] is None
+            if index is not None:
+                return future.result()[index]
+            return future.result()[0] if counters is not None else future.result()
+        if key not in checkpoint.results:
+            if task == "add":
+                trials = unfinished(digest, [t for t in tasks if t[0] == "add"])
+                record_trials(file, digest, trials, run_trials(parts, t_only, [p for key, (_, _, p) in trials],
+                                                               backend, jobs, cache))
+            elif task in EXTENSIONS:
+                witnesses[key] = run_extensions(parts, t_only, task, jobs)
+                checkpoint.record(file, digest, task, t_only, p, witnesses[key] is None)
+            else:
+                result = run_check_task(parts, t_only, backend, jobs, cache, counters is not None)
+                checkpoint.record(file, digest, task, t_only, p, collected(file, result))
+        return checkpoint.results[key]
+
+    checked = []
+    for file, points, parts, only, digest, tasks in files:
         stats = ", ".join(f"{len(ps)} {c}" for c, ps in parts.items())
         checked.append((file, len(points), stats, only))
         print(f"File {file} contains {len(points)} points ({stats}) for {only}.")
 
-        if any(find_empty_monochromatic_structures(parts, only)):
-            print(f"File {file} contains an empty {only} structure.")
-            return 1
-
-        for _ in range(10):
-            p = (random_point(points), random.choice(list(parts.keys())))
-            points.append(p)
-            parts[p[1]].append(p[0])
-            print(f"Adding point {p} ({len(points)} points, {len(parts[p[1]])} {p[1]})")
-            if not any(find_empty_monochromatic_structures(parts, only)):
-                print(f"Adding point {p} to file {file} still yields no empty {only} structure.")
-                return 2
-            del points[-1]
-            del parts[p[1]][-1]
-
-        for s_only in strengthen_filter(only):
-            print(f"Strengthening filter {only} to {s_only}")
-            if not any(find_empty_monochromatic_structures(parts, s_only)):
-                print(f"Strengthening the filter from {only} to {s_only} "
-                      f"for file {file} still yields no empty structure.")
-                return 3
+        for task, t_only, p in tasks:
+            if task == "base":
+                if found(file, parts, digest, tasks, task, t_only, p):
+                    print(f"File {file} contains an empty {only} structure.")
+                    return 1
+            elif task in EXTENSIONS:
+                where = "also outside of" if EXTENSIONS[task] else "within"
+                print(f"Adding a point in each cell of the arrangement of all lines through two points "
+                      f"({where} the bounding box)")
+                if not found(file, parts, digest, tasks, task, t_only, p):
+                    witness = witnesses.get(checkpoint.key(digest, task, t_only, p))
+                    at = "some point" if not witness else \
+                        f"point ({witness[0][0]}, {witness[0][1]}) of color {witness[1]}"
+                    print(f"Adding {at} to file {file} still yields no empty {only} structure.")
+                    return 2
+                print(f"No single point can be added to file {file} without yielding an empty {only} structure.")
+            elif task == "add":
+                print(f"Adding point {p} ({len(points) + 1} points, {len(parts[p[1]]) + 1} {p[1]})")
+                if not found(file, parts, digest, tasks, task, t_only, p):
+                    print(f"Adding point {p} to file {file} still yields no empty {only} structure.")
+                    return 2
+            else:
+                print(f"Strengthening filter {only} to {t_only}")
+                if not found(file, parts, digest, tasks, task, t_only, p):
+                    print(f"Strengthening the filter from {only} to {t_only} "
+                          f"for file {file} still yields no empty structure.")
+                    return 3
         print()
 
     print(f"Checked {len(checked)} files:")
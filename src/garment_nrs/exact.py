@@ -0,0 +1,75 @@
+"""Exact integer orientation predicates.
+
+All coordinates are converted exactly to integers (floats and fractions are scaled by their common denominator)
+and translated to the origin, so that emptiness is decided without any rounding.
+While all coordinates are within INT64_SAFE_RANGE, the orientation determinants cannot overflow and are evaluated
+as int64 NumPy arrays, otherwise the same vectorized code runs on object arrays holding Python big ints.
+Shapely geometry is only constructed for the structures that are reported.
+"""
+from fractions import Fraction
+from math import lcm
+from typing import Dict
+
+import numpy as np
+from shapely import Polygon
+
+from garment_nrs import vectorized
+from garment_nrs.lib import FilterList, PartitionedPointSet, PointSet
+
+__all__ = [
+    "INT64_SAFE_RANGE", "integer_coordinates", "scaled_coordinates", "convex_hull",
+    "find_empty_monochromatic_structures"
+]
+
+# for coordinates in [0, INT64_SAFE_RANGE), |dx * dy - dy * dx| < 2 ** 63
+INT64_SAFE_RANGE = 2 ** 31
+
+
+def integer_coordinates(parts: PartitionedPointSet) -> Dict[str, np.ndarray]:
+    """ Coordinates of all points of each color as (n, 2) integer arrays with the same orientations as the input """
+    fracs = {c: [(Fraction(x), Fraction(y)) for x, y in ps] for c, ps in parts.items()}
+    scale = lcm(*(f.denominator for ps in fracs.values() for p in ps for f in p))
+    ints = {c: [(int(x * scale), int(y * scale)) for x, y in ps] for c, ps in fracs.items()}
+
+    all_points = [p for ps in ints.values() for p in ps]
+    if not all_points:
+        return {c: np.empty((0, 2), dtype=np.int64) for c in ints}
+    min_x = min(x for x, y in all_points)
+    min_y = min(y for x, y in all_points)
+    extent = max(max(x - min_x, y - min_y) for x, y in all_points)
+    dtype = np.int64 if extent < INT64_SAFE_RANGE else object
+    return {
+        c: np.array([(x - min_x, y - min_y) for x, y in ps], dtype=dtype).reshape(-1, 2)
+        for c, ps in ints.items()
+    }
+
+
+def scaled_coordinates(parts: PartitionedPointSet) -> vectorized.Coordinates:
+    """ A function converting any of the points of parts exactly to integers like integer_coordinates, but without
+    translating them, so that it can be applied to single points on their own (e.g. by the IncrementalChecker) """
+    fracs = [Fraction(v) for ps in parts.values() for p in ps for v in p]
+    scale = lcm(*(f.denominator for f in fracs))
+    # without translation, the coordinates may have either sign, so they need one bit less to not overflow
+    dtype = np.int64 if all(abs(f * scale) < INT64_SAFE_RANGE // 2 for f in fracs) else object
+
+    def coordinates(points: PartitionedPointSet) -> Dict[str, np.ndarray]:
+        return {
+            c: np.array([(int(Fraction(x) * scale), int(Fraction(y) * scale)) for x, y in ps],
+                        dtype=dtype).reshape(-1, 2)
+            for c, ps in points.items()
+        }
+
+    return coordinates
+
+
+# the coordinates and table used by this backend, see garment_nrs.vectorized
+COORDINATES = integer_coordinates
+TABLE = vectorized.SignTable
+
+
+def convex_hull(pts: PointSet) -> Polygon:
+    return vectorized.convex_hull(pts, integer_coordinates)
+
+
+def find_empty_monochromatic_structures(parts: PartitionedPointSet, only: FilterList = None, quiet: bool = False):
+    return vectorized.find_empty_monochromatic_structures(parts, only, COORDINATES, TABLE, quiet)
@@ -0,0 +1,289 @@
+"""Exhaustively checking whether a single point can be added to a point set without creating an empty structure.
+
+Which structures exist and are empty only depends on the colored order type, and the order type of the point set
+with an added point p only depends on the sides of p w.r.t. the lines through all pairs of points. So all points in
+the same cell of the arrangement of these lines yield the same extension, and it suffices to try one representative
+point of every (open, two-dimensional) cell with every color; points on the lines create collinear triples and are
+not considered.
+
+The cells are enumerated exactly (on Fractions) by sweeping in a generic direction h(x, y) = y + delta * x, in which no
+line is horizontal: every cell with a lowest point has it at a vertex of the arrangement, between two consecutive
+upward rays of the lines through this vertex, and its representative is the centroid of the vertex and the next
+vertices along these two rays. The remaining cells are unbounded downwards and are all crossed by a level line below
+all vertices. Unless outside cells are requested, the sides of the bounding box of the points are added as lines,
+so that every cell meeting the interior of the bounding box has a representative within it.
+
+Candidates yielding the same colored order type (see garment_nrs.cache) are only checked once. As the canonical form
+costs about as much as checking a candidate, it is only computed for candidates whose cheap invariant (the colors of
+the points on either side of the lines through all pairs of points) collides with that of an earlier one.
+As the point set itself contains no empty structure, a candidate point can only create one on the 4-tuples of its
+color containing it, which are checked with the predicates of the vectorized engine on the orientations of all
+triples, computed exactly on integers.
+"""
+import functools
+import itertools
+from fractions import Fraction
+from math import lcm
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+
+from garment_nrs.lib import FilterList, PartitionedPointSet, Point, PointSet
+
+__all__ = ["arrangement_lines", "cell_representatives", "extension_candidates", "find_extension"]
+
+Line = Tuple[Fraction, Fraction, Fraction]  # a * x + b * y = c, scaled such that the first non-zero of a, b is 1
+Candidate = Tuple[Point, str]
+
+# the number of candidates checked together by a process
+BATCH_SIZE = 64
+
+
+def _line(p: Tuple[Fraction, Fraction], q: Tuple[Fraction, Fraction]) -> Line:
+    a, b = q[1] - p[1], p[0] - q[0]
+    c = a * p[0] + b * p[1]
+    s = a or b
+    return a / s, b / s, c / s
+
+
+def arrangement_lines(points: PointSet, outside: bool = False) -> List[Line]:
+    """ The distinct lines through all pairs of (distinct) points and, unless outside is set,
+    the sides of their bounding box """
+    points = sorted({(Fraction(x), Fraction(y)) for x, y in points})
+    lines = {_line(p, q) for i, p in enumerate(points) for q in points[i + 1:]}
+    if points and not outside:
+        xs, ys = [x for x, _ in points], [y for _, y in points]
+        lines |= {(Fraction(1), Fraction(0), min(xs)), (Fraction(1), Fraction(0), max(xs)),
+                  (Fraction(0), Fraction(1), min(ys)), (Fraction(0), Fraction(1), max(ys))}
+    return sorted(lines)
+
+
+def _intersection(l: Line, m: Line) -> Optional[Tuple[Fraction, Fraction]]:
+    det = l[0] * m[1] - m[0] * l[1]
+    if not det:
+        return None
+    return (l[2] * m[1] - m[2] * l[1]) / det, (l[0] * m[2] - m[0] * l[2]) / det
+
+
+def _cross(u, v) -> Fraction:
+    return u[0] * v[1] - u[1] * v[0]
+
+
+def cell_representatives(points: PointSet, outside: bool = False) -> Iterator[Tuple[Fraction, Fraction]]:
+    """ One point in the interior of every cell of the arrangement of the lines through all pairs of points
+    (as exact Fractions); unless outside is set, only of the cells meeting the interior of the bounding box """
+    lines = arrangement_lines(points, outside)
+    if not lines:
+        yield from ((Fraction(x) + 1, Fraction(y)) for x, y in points[:1])  # no line: the whole plane is one cell
+        return
+
+    # a sweep direction in which no line is horizontal
+    delta = next(Fraction(1, k) for k in range(2, len(lines) + 3)
+                 if all(a != Fraction(1, k) * b for a, b, _ in lines))
+
+    def h(p):
+        return p[1] + delta * p[0]
+
+    upward = [(b, -a) if delta * b - a > 0 else (-b, a) for a, b, _ in lines]
+
+    on_line: Dict[int, Set[Tuple[Fraction, Fraction]]] = {i: set() for i in range(len(lines))}
+    through: Dict[Tuple[Fraction, Fraction], Set[int]] = {}
+    for i, l in enumerate(lines):
+        for j in range(i + 1, len(lines)):
+            v = _intersection(l, lines[j])
+            if v is not None:
+                on_line[i].add(v)
+                on_line[j].add(v)
+                through.setdefault(v, set()).update((i, j))
+    above = {}  # (line, vertex) -> the next vertex on the upward ray
+    for i, vs in on_line.items():
+        vs = sorted(vs, key=h)
+        above.update(((i, v), w) for v, w in zip(vs, vs[1:]))
+
+    if outside:
+        def keep(r):
+            return True
+    else:
+        xs, ys = [Fraction(x) for x, _ in points], [Fraction(y) for _, y in points]
+
+        def keep(r):
+            return min(xs) < r[0] < max(xs) and min(ys) < r[1] < max(ys)
+
+    def ray(i, v):
+        w = above.get((i, v))
+        return w if w is not None else (v[0] + upward[i][0], v[1] + upward[i][1])
+
+    for v in sorted(through, key=lambda v: (h(v), v)):
+        # the upward rays all lie in the half-plane above v, so they are sorted clockwise by their cross products
+        rays = sorted(through[v], key=functools.cmp_to_key(
+            lambda i, j: 1 if _cross(upward[i], upward[j]) > 0 else -1))
+        for i, j in zip(rays, rays[1:]):
+            (ax, ay), (bx, by) = ray(i, v), ray(j, v)
+            r = ((v[0] + ax + bx) / 3, (v[1] + ay + by) / 3)
+            if keep(r):
+                yield r
+
+    # the cells unbounded downwards, along a level line below all vertices
+    level = min(map(h, through), default=Fraction(0)) - 1
+    xs = sorted((c - b * level) / (a - b * delta) for a, b, c in lines)
+    for x in [xs[0] - 1, *((x + y) / 2 for x, y in zip(xs, xs[1:])), xs[-1] + 1]:
+        r = (x, level - delta * x)
+        if keep(r):
+            yield r
+
+
+class _Extensions:
+    """ The orientations of all triples of parts with a single added point, reusing those of the triples of parts.
+
+    The added point is given in homogeneous integer coordinates (X / D, Y / D), so that only integers are needed,
+    and its signs are appended as the last index n of the (n + 1, n + 1, n + 1) table.
+    """
+
+    def __init__(self, parts: PartitionedPointSet):
+        from garment_nrs.vectorized import orientation_signs
+
+        self.parts = parts
+        self.points = [(c, i) for c, ps in parts.items() for i in range(len(ps))]
+        fracs = [(Fraction(x), Fraction(y)) for ps in parts.values() for x, y in ps]
+        self.scale = lcm(*(f.denominator for p in fracs for f in p))
+        self.coords = [(int(x * self.scale), int(y * self.scale)) for x, y in fracs]
+        self.arr = arr = np.array(self.coords, dtype=object).reshape(-1, 2)
+        self.S = orientation_signs(arr[:, None, None, :], arr[None, :, None, :], arr[None, None, :, :])
+        self.index = {c: np.array([i for i, (pc, _) in enumerate(self.points) if pc == c], dtype=np.intp)
+                      for c in parts.keys()}
+
+    def signs(self, point: Point) -> Tuple[np.ndarray, List[Tuple[int, int]]]:
+        """ The orientations of all triples with the added point and the exact (scaled) coordinates of all points """
+        x, y = Fraction(point[0]) * self.scale, Fraction(point[1]) * self.scale
+        d = lcm(x.denominator, y.denominator)
+        X, Y = int(x * d), int(y * d)
+        p, n = self.arr, len(self.arr)
+        q = p[None, :, :] - p[:, None, :]
+        signs = np.sign(q[..., 0] * (Y - d * p[:, None, 1]) - q[..., 1] * (X - d * p[:, None, 0])).astype(np.int8)
+        S = np.zeros((n + 1, n + 1, n + 1), dtype=np.int8)
+        S[:n, :n, :n] = self.S
+        S[:n, :n, n] = S[n, :n, :n] = signs
+        S[:n, n, :n] = -signs
+        return S, [(px * d, py * d) for px, py in self.coords] + [(X, Y)]
+
+    def key(self, point: Point, color: str) -> bytes:
+        """ The canonical colored order type of parts with the added point (see garment_nrs.cache) """
+        from garment_nrs.cache import canonical_form
+
+        S, coords = self.signs(point)
+        return canonical_form([*self.points, (color, len(self.parts.get(color, [])))], coords, S)[0]
+
+    def invariant(self, point: Point, color: str) -> bytes:
+        """ A cheap invariant of the colored order type of parts with the added point: for each point, the number of
+        points of each color on either side of the lines from it through each other point, up to reflection """
+        S, _ = self.signs(point)
+        names = sorted(self.parts.keys())
+        colors = np.array([names.index(c) for c, _ in self.points] + [names.index(color)])
+        m = len(colors)
+        sides = [np.stack([(S[..., colors == c] * sign > 0).sum(axis=2) for c in range(len(names))], axis=2)
+                 for sign in (1, -1)]
+
+        def profile(left, right):
+            # each pair (i, j) as a single number in base m + 1, sorted within each row and then by rows
+            digits = np.concatenate([np.broadcast_to(colors[None, :, None], (m, m, 1)), left, right], axis=2)
+            codes = digits @ (m + 1) ** np.arange(digits.shape[2], dtype=np.int64)
+            codes[np.arange(m), np.arange(m)] = -1
+            rows = np.concatenate([colors[:, None], np.sort(codes, axis=1)], axis=1)
+            return rows[np.lexsort(rows.T[::-1])].tobytes()
+
+        return min(profile(*sides), profile(*sides[::-1]))
+
+    def creates_empty_structure(self, point: Point, color: str, only: FilterList) -> bool:
+        """ Whether one of the 4-tuples of color containing the added point is an empty structure """
+        from garment_nrs.vectorized import bottom_left_rank, classify_quads, region_masks
+
+        S, coords = self.signs(point)
+        n, same = len(self.points), self.index[color]
+        others = np.setdiff1d(np.arange(n), same)
+        same = np.append(same, n)
+        k = len(same) - 1
+        quads = np.array([(*t, k) for t in itertools.combinations(range(k), 3)], dtype=np.intp).reshape(-1, 4)
+        S_c, L_c = S[np.ix_(same, same, same)], S[np.ix_(same, same, others)]
+        kind, order = classify_quads(quads, S_c, bottom_left_rank(np.array([coords[i] for i in same], dtype=object)))
+        return any((~mask.any(axis=1)).any() for _, _, mask in region_masks(kind, order, S_c, L_c, only))
+
+
+def extension_candidates(parts: PartitionedPointSet, outside: bool = False) -> Iterator[Candidate]:
+    """ A representative point of every cell of the arrangement together with each color """
+    points = [p for ps in parts.values() for p in ps]
+    for r in cell_representatives(points, outside):
+        for color in parts.keys():
+            yield r, color
+
+
+def _distinct(extensions: _Extensions, candidates: Iterator[Candidate]) -> Iterator[Candidate]:
+    """ Lazily yield the candidates whose colored order type differs from those of all earlier ones, computing the
+    canonical form only for candidates whose invariant collides with that of an earlier one """
+    groups: Dict[tuple, Tuple[Candidate, Optional[Set[bytes]]]] = {}
+    for candidate in candidates:
+        invariant = extensions.invariant(*candidate)
+        if invariant not in groups:
+            groups[invariant] = candidate, None
+            yield candidate
+            continue
+        first, keys = groups[invariant]
+        if keys is None:
+            keys = {extensions.key(*first)}
+            groups[invariant] = first, keys
+        key = extensions.key(*candidate)
+        if key not in keys:
+            keys.add(key)
+            yield candidate
+
+
+def _first_without_structure(parts: PartitionedPointSet, only: FilterList, candidates: List[Candidate]) \
+        -> Optional[Candidate]:
+    extensions = _Extensions(parts)
+    return next((c for c in candidates if not extensions.creates_empty_structure(*c, only)), None)
+
+
+def find_extension(parts: PartitionedPointSet, only: FilterList = None, outside: bool = False, jobs: int = 1) \
+        -> Tuple[Optional[Candidate], int, int]:
+    """ A point and color that can be added to parts without creating an empty structure (or None if there is none),
+    together with the number of candidates (cells times colors) and of those that were checked.
+
+    As the added point can only create structures of its own color, parts itself must not contain any empty
+    structure. The candidates are checked lazily in order, skipping those with the colored order type of an earlier
+    one, and stopping at the first point without structure. With jobs other than 1, batches of BATCH_SIZE candidates
+    are checked on jobs processes (0 for all cores).
+    """
+    from garment_nrs.lib import has_empty_monochromatic_structure
+
+    if has_empty_monochromatic_structure(parts, only, "exact"):
+        raise ValueError("the point set already contains an empty structure")
+    candidates = list(extension_candidates(parts, outside))
+    extensions = _Extensions(parts)
+    distinct = _distinct(extensions, candidates)
+    checked = 0
+    if jobs == 1 or len(candidates) <= 1:
+        for candidate in distinct:
+            checked += 1
+            if not extensions.creates_empty_structure(*candidate, only):
+                return candidate, len(candidates), checked
+        return None, len(candidates), checked
+
+    import os
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+    jobs = jobs or os.cpu_count() or 1
+    batches = iter(lambda: list(itertools.islice(distinct, BATCH_SIZE)), [])
+    pool = ProcessPoolExecutor(jobs)
+    try:
+        running, witness = set(), None
+        while witness is None:
+            # only a few batches are submitted ahead, so that no more candidates are checked than necessary
+            while len(running) < 2 * jobs and (batch := next(batches, None)):
+                checked += len(batch)
+                running.add(pool.submit(_first_without_structure, parts, only, batch))
+            if not running:
+                break
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            witness = next(filter(None, (f.result() for f in done)), None)
+        return witness, len(candidates), checked
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,343 @@
+"""Incrementally re-checking a point set when single points are added.
+
+Adding a point p of color c only creates new empty structures on the 4-tuples of c that contain p, while for all
+other colors, p can only block structures that were empty before.
+The IncrementalChecker thus keeps, per color, the orientation signs of the vectorized engine together with all
+currently empty structures, and on adding p only computes the signs involving p, tests the C(k, 3) new 4-tuples of c
+and tests p against the regions of the empty structures of the other colors.
+All state is replaced instead of modified, so removing the last added point just restores the previous state.
+
+For local search, points also need to be deleted, which can make structures of the other colors empty that were only
+blocked by the deleted point. The DeltaChecker thus keeps the number of blockers of all structures, so that both
+insertions and deletions are evaluated from the signs involving the changed point alone.
+"""
+import itertools
+from typing import Dict, List, NamedTuple, Tuple
+
+import numpy as np
+
+from garment_nrs.lib import CONVEX_SHAPES, NONCONVEX_SHAPES, FilterList, PartitionedPointSet, Point, PointSet
+from garment_nrs.vectorized import (DEGENERATE, SLOTS, Coordinates, SignTable, bottom_left_rank, build_structure,
+                                    classify_quads, float_coordinates, orientation_signs, quad_chunks, region_masks)
+
+__all__ = ["IncrementalChecker", "DeltaChecker"]
+
+
+class ColorState(NamedTuple):
+    points: PointSet
+    same: np.ndarray  # (k, 2) coordinates of the points of this color
+    other: np.ndarray  # (m, 2) coordinates of all other-colored points
+    S: np.ndarray  # (k, k, k) signs of same-colored pairs against same-colored points
+    L: np.ndarray  # (k, k, m) signs of same-colored pairs against other-colored points
+    rank: np.ndarray
+    empty: np.ndarray  # (e, 4) 4-tuples of the empty structures, in lexicographic order
+    order: np.ndarray  # (e, 4) their hull order
+    kind: np.ndarray  # (e,) CONVEX or NONCONVEX
+    slot: np.ndarray  # (e,) index into SLOTS
+
+
+def _empty_structures(quads: np.ndarray, S: np.ndarray, L: np.ndarray, rank: np.ndarray, only: FilterList):
+    """ The rows, hull orders, kinds and slots of all empty structures on the given 4-tuples """
+    kind, order = classify_quads(quads, S, rank)
+    blocked = np.ones((len(quads), len(SLOTS)), dtype=bool)
+    for slot, rows, mask in region_masks(kind, order, S, L, only):
+        blocked[rows, slot] = mask.any(axis=1)
+    rows, slots = np.nonzero(~blocked)
+    return rows, order[rows], kind[rows], slots
+
+
+def _extended_signs(same: np.ndarray, other: np.ndarray, S: np.ndarray, L: np.ndarray, p: np.ndarray):
+    """ Append the (1, 2) point p to same and extend S and L by the signs involving it """
+    k = len(same)
+    same = np.concatenate([same, p.astype(same.dtype)])
+    S_ext = np.zeros((k + 1, k + 1, k + 1), dtype=np.int8)
+    S_ext[:k, :k, :k] = S
+    S_ext[k] = orientation_signs(same[k], same[:, None, :], same[None, :, :])
+    S_ext[:, k] = orientation_signs(same[:, None, :], same[k], same[None, :, :])
+    S_ext[:, :, k] = orientation_signs(same[:, None, :], same[None, :, :], same[k])
+    L_ext = np.zeros((k + 1, k + 1, len(other)), dtype=np.int8)
+    L_ext[:k, :k] = L
+    L_ext[k] = orientation_signs(same[k], same[:, None, :], other[None, :, :])
+    L_ext[:, k] = orientation_signs(same[:, None, :], same[k], other[None, :, :])
+    return same, S_ext, L_ext
+
+
+def _point_signs(same: np.ndarray, p: np.ndarray) -> np.ndarray:
+    """ The (k, k) signs of all pairs of same against the (1, 2) point p """
+    return orientation_signs(same[:, None, None, :], same[None, :, None, :], p[None, None, :, :])[:, :, 0]
+
+
+def _blocked_by(state: ColorState, L_point: np.ndarray, only: FilterList) -> np.ndarray:
+    """ Which of the empty structures of state contain the point whose signs against all pairs are L_point """
+    blocked = np.zeros(len(state.empty), dtype=bool)
+    for slot, rows, mask in region_masks(state.kind, state.order, state.S, L_point[:, :, None], only):
+        hit = state.slot[rows] == slot
+        blocked[rows[hit]] |= mask[hit, 0]
+    return blocked
+
+
+class IncrementalChecker:
+    """ The empty monochromatic structures of a point set, which can be updated by adding and removing single points.
+
+    Emptiness is decided with the same predicates as the vectorized engine on the coordinates from the given function,
+    which is applied to each added point on its own and thus must not depend on the other points (e.g. through
+    translation), as float_coordinates and garment_nrs.exact.scaled_coordinates do.
+    """
+
+    def __init__(self, parts: PartitionedPointSet, only: FilterList = None,
+                 coordinates: Coordinates = float_coordinates):
+        for key in only or []:
+            if key not in CONVEX_SHAPES and key not in NONCONVEX_SHAPES:
+                raise KeyError(f"invalid only value {key}")
+        self.only = only
+        self.coordinates = coordinates
+        self.history: List[Dict[str, ColorState]] = []
+        self.state: Dict[str, ColorState] = {}
+
+        coords = coordinates(parts)
+        for color in parts.keys():
+            same = coords[color]
+            other = np.concatenate([coords[c] for c in parts.keys() if c != color] or [same[:0]])
+            signs = SignTable(same, other)
+            rank = bottom_left_rank(same)
+            found = [(quads[rows], order, kind, slot) for quads in quad_chunks(len(same))
+                     for rows, order, kind, slot in [_empty_structures(quads, signs.S, signs.L, rank, only)]]
+            empty, order, kind, slot = (np.concatenate(a) for a in zip(*found)) if found else self._no_structures()
+            self.state[color] = ColorState(list(parts[color]), same, other, signs.S, signs.L, rank,
+                                           empty, order, kind, slot)
+
+    @staticmethod
+    def _no_structures():
+        return np.empty((0, 4), dtype=np.intp), np.empty((0, 4), dtype=np.intp), \
+            np.empty(0, dtype=np.int8), np.empty(0, dtype=np.intp)
+
+    def add_point(self, point: Point, color: str) -> int:
+        """ Add a point of the given color and return the number of empty structures that this created """
+        p = self.coordinates({color: [point]})[color]
+        self.history.append(self.state)
+        state = dict(self.state)
+
+        for c, s in state.items():
+            if c == color:
+                continue
+            # the point only adds a column to L and may block the empty structures of c
+            L_point = _point_signs(s.same, p)
+            keep = ~_blocked_by(s, L_point, self.only)
+            state[c] = s._replace(
+                other=np.concatenate([s.other, p.astype(s.other.dtype)]),
+                L=np.concatenate([s.L, L_point[:, :, None]], axis=2),
+                empty=s.empty[keep], order=s.order[keep], kind=s.kind[keep], slot=s.slot[keep])
+
+        if color not in state:
+            other = np.concatenate([s.same for s in self.state.values()] or [p[:0]])
+            state[color] = ColorState([], p[:0], other, np.empty((0, 0, 0), dtype=np.int8),
+                                      np.empty((0, 0, len(other)), dtype=np.int8), np.empty(0, dtype=np.intp),
+                                      *self._no_structures())
+        s = state[color]
+
+        k = len(s.same)
+        same, S, L = _extended_signs(s.same, s.other, s.S, s.L, p)
+        rank = bottom_left_rank(same)
+
+        # only the 4-tuples containing the new point can become empty, the previous ones keep their hull order
+        # as the hull order only depends on the rank among the points of the 4-tuple
+        quads = np.array([(*t, k) for t in itertools.combinations(range(k), 3)], dtype=np.intp).reshape(-1, 4)
+        rows, order, kind, slot = _empty_structures(quads, S, L, rank, self.only)
+        empty = np.concatenate([s.empty, quads[rows]])
+        order, kind, slot = np.concatenate([s.order, order]), np.concatenate([s.kind, kind]), \
+            np.concatenate([s.slot, slot])
+        lex = np.lexsort((slot, *empty.T[::-1]))
+        state[color] = ColorState([*s.points, point], same, s.other, S, L, rank,
+                                  empty[lex], order[lex], kind[lex], slot[lex])
+
+        self.state = state
+        return len(rows)
+
+    def remove_point(self):
+        """ Undo the last call to add_point """
+        self.state = self.history.pop()
+
+    def creates_empty_structure(self, point: Point, color: str) -> bool:
+        """ Check whether adding the point of the given color creates an empty structure, without keeping it """
+        try:
+            return self.add_point(point, color) > 0
+        finally:
+            self.remove_point()
+
+    def has_empty_structure(self) -> bool:
+        """ Check whether the current point set contains any empty structure """
+        return any(len(s.empty) for s in self.state.values())
+
+    def count(self) -> int:
+        """ The number of empty structures in the current point set """
+        return sum(len(s.empty) for s in self.state.values())
+
+    def structures(self):
+        """ Yield the records of all empty structures of the current point set, in the same order as
+        find_empty_monochromatic_structures """
+        for color, s in self.state.items():
+            for quad, order, slot in zip(s.empty, s.order, s.slot):
+                kind_name, pts, region = build_structure(s.points, quad, order, slot)
+                yield {
+                    "color": color,
+                    "type": kind_name,
+                    "points": pts,
+                    "shape": region,
+                }
+
+
+class CountState(NamedTuple):
+    points: PointSet
+    same: np.ndarray  # (k, 2) coordinates of the points of this color
+    other: np.ndarray  # (m, 2) coordinates of the other-colored points, in the order of the colors
+    S: np.ndarray  # (k, k, k) signs of same-colored pairs against same-colored points
+    L: np.ndarray  # (k, k, m) signs of same-colored pairs against other-colored points
+    rank: np.ndarray
+    quads: np.ndarray  # (q, 4) all non-degenerate 4-tuples
+    order: np.ndarray  # (q, 4) their hull order
+    kind: np.ndarray  # (q,) CONVEX or NONCONVEX
+    count: np.ndarray  # (q, SLOTS) number of blockers of each structure, -1 if the structure does not exist
+
+
+def _blocker_counts(quads: np.ndarray, S: np.ndarray, L: np.ndarray, rank: np.ndarray, only: FilterList):
+    """ The non-degenerate 4-tuples among quads, their hull orders, kinds and blocker counts per slot """
+    kind, order = classify_quads(quads, S, rank)
+    count = np.full((len(quads), len(SLOTS)), -1, dtype=np.int32)
+    for slot, rows, mask in region_masks(kind, order, S, L, only):
+        count[rows, slot] = mask.sum(axis=1)
+    keep = kind != DEGENERATE
+    return quads[keep], order[keep], kind[keep], count[keep]
+
+
+def _containing(state: CountState, L_point: np.ndarray, only: FilterList) -> np.ndarray:
+    """ (q, SLOTS) array telling which structures of state contain the point with the signs L_point """
+    inside = np.zeros(state.count.shape, dtype=np.int32)
+    for slot, rows, mask in region_masks(state.kind, state.order, state.S, L_point[:, :, None], only):
+        inside[rows, slot] = mask[:, 0]
+    return inside
+
+
+class DeltaChecker:
+    """ The blocker counts of all structures of a point set, which can be updated by inserting and deleting single
+    points, each update returning the change in the number of empty structures.
+
+    As for the IncrementalChecker, the coordinates function is applied to each inserted point on its own,
+    and undo restores the state before the last insertion or deletion.
+    """
+
+    def __init__(self, parts: PartitionedPointSet, only: FilterList = None,
+                 coordinates: Coordinates = float_coordinates):
+        for key in only or []:
+            if key not in CONVEX_SHAPES and key not in NONCONVEX_SHAPES:
+                raise KeyError(f"invalid only value {key}")
+        self.only = only
+        self.coordinates = coordinates
+        self.history: List[Tuple[Dict[str, CountState], int]] = []
+        self.state: Dict[str, CountState] = {}
+        self.empty = 0
+
+        coords = coordinates(parts)
+        for color in parts.keys():
+            same = coords[color]
+            other = np.concatenate([coords[c] for c in parts.keys() if c != color] or [same[:0]])
+            signs = SignTable(same, other)
+            rank = bottom_left_rank(same)
+            counted = [_blocker_counts(quads, signs.S, signs.L, rank, only) for quads in quad_chunks(len(same))]
+            quads, order, kind, count = (np.concatenate(a) for a in zip(*counted)) if counted else \
+                self._no_structures()
+            self.state[color] = CountState(list(parts[color]), same, other, signs.S, signs.L, rank,
+                                           quads, order, kind, count)
+            self.empty += int(np.sum(count == 0))
+
+    @staticmethod
+    def _no_structures():
+        return np.empty((0, 4), dtype=np.intp), np.empty((0, 4), dtype=np.intp), np.empty(0, dtype=np.int8), \
+            np.empty((0, len(SLOTS)), dtype=np.int32)
+
+    @property
+    def parts(self) -> PartitionedPointSet:
+        return {c: list(s.points) for c, s in self.state.items()}
+
+    def _column(self, of: str, color: str, index: int) -> int:
+        """ The index of the point (color, index) within the other-colored points of of """
+        colors = list(self.state.keys())
+        return sum(len(self.state[c].points) for c in colors[:colors.index(color)] if c != of) + index
+
+    def insert(self, point: Point, color: str) -> int:
+        """ Insert a point of the given color and return the change in the number of empty structures """
+        p = self.coordinates({color: [point]})[color]
+        self.history.append((self.state, self.empty))
+        if color not in self.state:
+            other = np.concatenate([s.same for s in self.state.values()] or [p[:0]])
+            self.state = {**self.state, color: CountState(
+                [], p[:0], other, np.empty((0, 0, 0), dtype=np.int8), np.empty((0, 0, len(other)), dtype=np.int8),
+                np.empty(0, dtype=np.intp), *self._no_structures())}
+        state = dict(self.state)
+        delta = 0
+
+        for c, s in self.state.items():
+            if c == color:
+                continue
+            # the point only adds a column to L and may block structures of c
+            L_point = _point_signs(s.same, p)
+            inside = _containing(s, L_point, self.only)
+            delta -= int(np.sum((s.count == 0) & (inside > 0)))
+            column = self._column(c, color, len(self.state[color].points))
+            state[c] = s._replace(other=np.insert(s.other, column, p[0], axis=0),
+                                  L=np.insert(s.L, column, L_point, axis=2), count=s.count + inside)
+
+        s = self.state[color]
+        k = len(s.same)
+        same, S, L = _extended_signs(s.same, s.other, s.S, s.L, p)
+        rank = bottom_left_rank(same)
+        # only the new 4-tuples containing the point need to be counted
+        new = np.array([(*t, k) for t in itertools.combinations(range(k), 3)], dtype=np.intp).reshape(-1, 4)
+        quads, order, kind, count = _blocker_counts(new, S, L, rank, self.only)
+        delta += int(np.sum(count == 0))
+        state[color] = CountState([*s.points, point], same, s.other, S, L, rank,
+                                  np.concatenate([s.quads, quads]), np.concatenate([s.order, order]),
+                                  np.concatenate([s.kind, kind]), np.concatenate([s.count, count]))
+
+        self.state = state
+        self.empty += delta
+        return delta
+
+    def delete(self, color: str, index: int) -> int:
+        """ Delete the point parts[color][index] and return the change in the number of empty structures """
+        self.history.append((self.state, self.empty))
+        state = dict(self.state)
+        delta = 0
+
+        for c, s in self.state.items():
+            if c == color:
+                continue
+            # structures of c only blocked by the point become empty
+            column = self._column(c, color, index)
+            inside = _containing(s, s.L[:, :, column], self.only)
+            count = s.count - inside
+            delta += int(np.sum((count == 0) & (inside > 0)))
+            state[c] = s._replace(other=np.delete(s.other, column, axis=0), L=np.delete(s.L, column, axis=2),
+                                  count=count)
+
+        s = self.state[color]
+        keep = ~np.any(s.quads == index, axis=1)
+        delta -= int(np.sum(s.count[~keep] == 0))
+        quads, order = s.quads[keep], s.order[keep]
+        quads, order = quads - (quads > index), order - (order > index)
+        same = np.delete(s.same, index, axis=0)
+        S = np.delete(np.delete(np.delete(s.S, index, axis=0), index, axis=1), index, axis=2)
+        L = np.delete(np.delete(s.L, index, axis=0), index, axis=1)
+        state[color] = CountState(s.points[:index] + s.points[index + 1:], same, s.other, S, L,
+                                  bottom_left_rank(same), quads, order, s.kind[keep], s.count[keep])
+
+        self.state = state
+        self.empty += delta
+        return delta
+
+    def undo(self):
+        """ Undo the last insertion or deletion """
+        self.state, self.empty = self.history.pop()
+
+    def commit(self):
+        """ Forget the history, keeping the current state """
+        self.history.clear()
@@ -0,0 +1,126 @@
+"""A binary container for many colored point sets, which is read through memory maps.
+
+The file starts with MAGIC, the length of a JSON header and the header itself, which lists the names of all
+instances, the names of all colors and the dtype of the coordinates (int64 if all coordinates are integers, float64
+otherwise). Aligned to 64 bytes, it is followed by three arrays:
+the offsets of the points of each instance (int64, one more than instances), the coordinates of all points and the
+index of the color of each point (uint16). Reading an instance only touches its slice of these arrays, so instances
+can be streamed from a file with thousands of them.
+
+Containers are built from CSV files with `garment-pack`.
+"""
+import json
+from pathlib import Path
+from typing import Iterable, Iterator, Tuple
+
+import click
+import numpy as np
+
+from garment_nrs.util import RawColoredPointSet, load_points_from_csv
+
+__all__ = ["SUFFIX", "is_instance_file", "write_instances", "InstanceFile", "load_instances"]
+
+MAGIC = b"\x93GARMENT\x01"
+SUFFIX = ".gpts"
+ALIGN = 64
+
+
+def is_instance_file(path) -> bool:
+    """ Check whether the file at path is a container (rather than a CSV file), which "-" for stdin never is """
+    if str(path) == "-":
+        return False
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def write_instances(path, instances: Iterable[Tuple[str, RawColoredPointSet]]):
+    """ Write all (name, points) pairs to a container at path """
+    names, colors, offsets, coords, color_index = [], {}, [0], [], []
+    for name, points in instances:
+        names.append(name)
+        offsets.append(offsets[-1] + len(points))
+        for p, c in points:
+            coords.append(p)
+            color_index.append(colors.setdefault(c.strip(), len(colors)))
+    integral = all(float(v).is_integer() for p in coords for v in p)
+    arrays = {
+        "offsets": np.array(offsets, dtype="<i8"),
+        "coordinates": np.array(coords, dtype="<i8" if integral else "<f8").reshape(-1, 2),
+        "colors": np.array(color_index, dtype="<u2"),
+    }
+    specs, position = {}, 0
+    for key, array in arrays.items():
+        specs[key] = {"dtype": array.dtype.str, "shape": array.shape, "offset": position}
+        position += -(-array.nbytes // ALIGN) * ALIGN
+    header = json.dumps({"names": names, "colors": list(colors), "arrays": specs}).encode()
+    start = -(-(len(MAGIC) + 8 + len(header)) // ALIGN) * ALIGN
+
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(len(header).to_bytes(8, "little"))
+        f.write(header)
+        for key, array in arrays.items():
+            f.seek(start + specs[key]["offset"])
+            f.write(array.tobytes())
+        f.truncate(start + position)
+
+
+class InstanceFile:
+    """ The instances of a container, as sequence of (name, points) pairs """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is no point set container")
+            length = int.from_bytes(f.read(8), "little")
+            header = json.loads(f.read(length))
+        start = -(-(len(MAGIC) + 8 + length) // ALIGN) * ALIGN
+        self.names = header["names"]
+        self.colors = header["colors"]
+        self.arrays = {
+            key: np.memmap(path, dtype=spec["dtype"], mode="r", offset=start + spec["offset"],
+                           shape=tuple(spec["shape"])) if np.prod(spec["shape"]) else
+            np.empty(spec["shape"], dtype=spec["dtype"])
+            for key, spec in header["arrays"].items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __getitem__(self, index: int) -> Tuple[str, RawColoredPointSet]:
+        start, end = self.arrays["offsets"][index:index + 2].tolist()
+        coords = self.arrays["coordinates"][start:end].tolist()
+        colors = self.arrays["colors"][start:end].tolist()
+        return self.names[index], [(tuple(p), self.colors[c]) for p, c in zip(coords, colors)]
+
+    def __iter__(self) -> Iterator[Tuple[str, RawColoredPointSet]]:
+        return (self[i] for i in range(len(self)))
+
+
+def load_instances(path) -> Iterator[Tuple[str, RawColoredPointSet]]:
+    """ All instances in a container or the single instance in a CSV file (named by its stem, or read from stdin
+    for "-") """
+    if str(path) == "-":
+        with click.open_file("-") as f:
+            yield "-", load_points_from_csv(f)
+    elif is_instance_file(path):
+        yield from InstanceFile(path)
+    else:
+        yield Path(path).stem, load_points_from_csv(path)
+
+
+@click.command()
+@click.argument("out", type=click.Path(dir_okay=False, writable=True))
+@click.argument("files", type=click.Path(exists=True), nargs=-1, required=True)
+def main(out, files):
+    """ Pack all CSV files (and all CSV files in directories) into the container OUT """
+    paths = []
+    for file in map(Path, files):
+        paths.extend(sorted(file.rglob("*.csv")) if file.is_dir() else [file])
+    write_instances(out, ((path.stem, load_points_from_csv(path)) for path in paths))
+    click.echo(f"Packed {len(paths)} instances into {out}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -67,6 +67,19 @@ def make_segment(start=(0, 0), stop=(100, 0), **kwargs):
     return set_properties(p, kwargs)
 
 
+def make_path(segments, **kwargs):
+    # a single object with one subpath per segment, instead of one object per segment
+    shape = ipe.Shape()
+    for start, stop in segments:
+        curve = ipe.Curve()
+        curve.appendSegment(ipe.Vector(*start), ipe.Vector(*stop))
+        curve.__python_owns__ = False  # owned by the shape
+        shape.appendSubPath(curve)
+    p = ipe.Path(ipe.AllAttributes(), shape, True)
+    p.__python_owns__ = False
+    return set_properties(p, kwargs)
+
+
 def make_node(name="mark/fdisk(sfx)", pos=(0, 0), **kwargs):
     r = ipe.Reference(ipe.AllAttributes(), ipe.Attribute(True, name), ipe.Vector(*pos))
     r.__python_owns__ = False
@@ -114,11 +127,19 @@ ipe.Page.append = new_append
 
 def make_document():
     doc = ipe.Document()
-    doc.cascade().insert(0, get_style("/usr/share/ipe/7.2.30/styles/basic.isy"))
+    # the cascade owns (and deletes) its sheets, so each document gets a copy of the parsed one
+    style = ipe.StyleSheet(basic_style())
+    style.__python_owns__ = False
+    doc.cascade().insert(0, style)
     # doc.cascade().insert(0, get_style(ipe.Platform.folder(ipe.IpeFolder.FolderStyles, "basic.isy")))
     return doc
 
 
+@functools.lru_cache(maxsize=None)
+def basic_style():
+    return get_style("/usr/share/ipe/7.2.30/styles/basic.isy")
+
+
 def make_page():
     page = ipe.Page()
     page.addLayer()
@@ -1,3 +1,5 @@
+import hashlib
+import json
 from itertools import combinations, pairwise
 
 import click
@@ -5,15 +7,24 @@ import click
 from garment_nrs.ipe.lib import *
 from garment_nrs.util import *
 
+# bumped whenever the rendering changes, so that all outputs are rendered again
+RENDER_VERSION = 2
 
-@click.command()
-@click.argument("file", type=click.Path(readable=True, dir_okay=False, exists=True))
-@click.option("-o", "--out", type=click.Path(writable=True, dir_okay=False), default=None)
-@click.option("-s", "--size", type=int, default=100)
-@click.option("-d", "--offset", type=int, default=100)
-@click.option("-c", "--convex-hull", is_flag=True, default=False)
-@click.option("-t", "--opacity", type=click.FloatRange(0.0, 1.0), default=1.0)
-def main(file, out, size, offset, convex_hull, opacity):
+
+def outputs(out: Path):
+    """ The files written by save for the given path """
+    if out.suffix in (".ipe", ".pdf"):
+        return [out]
+    return [out.with_suffix(".ipe"), out.with_suffix(".pdf")]
+
+
+def render_hash(file, size, offset, convex_hull, opacity) -> str:
+    """ The hash of the input file and all options, stored next to the outputs to skip rendering them again """
+    options = json.dumps([RENDER_VERSION, size, offset, convex_hull, opacity]).encode()
+    return hashlib.sha256(options + b"\0" + Path(file).read_bytes()).hexdigest()
+
+
+def render(file, out, size, offset, convex_hull, opacity):
     size_x = size_y = size
     off_x = off_y = offset
 
@@ -47,19 +58,48 @@ def main(file, out, size, offset, convex_hull, opacity):
                 make_segment(a, b, stroke="gray", dashStyle="dotted")
                 for a, b in pairwise(hull) if lookup[a] != lookup[b]]))
 
+        # all segments of a color form a single path, as there are quadratically many of them
         for c, ps in parts.items():
-            page.append(make_group([
-                make_segment(a, b, stroke=c, strokeOpacity="default-stroke-opacity" if opacity < 1 else None)
-                for a, b in combinations(ps, 2)]))
+            page.append(make_path(
+                combinations(ps, 2), stroke=c, strokeOpacity="default-stroke-opacity" if opacity < 1 else None))
 
     for c, ps in parts.items():
         page.append(make_group([
             make_node(pos=p, fill=c, stroke="white") for p in ps
         ]))
 
-    if not out:
-        out = Path(file).with_suffix("")
-    save(doc, out)
+    return save(doc, out)
+
+
+@click.command()
+@click.argument("files", nargs=-1, required=True, type=click.Path(readable=True, exists=True))
+@click.option("-o", "--out", type=click.Path(writable=True, dir_okay=False), default=None,
+              help="The output file if a single file is rendered, otherwise each output is placed next to its input.")
+@click.option("-s", "--size", type=int, default=100)
+@click.option("-d", "--offset", type=int, default=100)
+@click.option("-c", "--convex-hull", is_flag=True, default=False)
+@click.option("-t", "--opacity", type=click.FloatRange(0.0, 1.0), default=1.0)
+@click.option("-f", "--force", is_flag=True, default=False,
+              help="Also render the files whose outputs are up to date.")
+def main(files, out, size, offset, convex_hull, opacity, force):
+    # all files are rendered in this process, so ipelib and the stylesheet are only loaded once
+    files = [f for p in map(Path, files) for f in (sorted(p.rglob("*.csv")) if p.is_dir() else [p])]
+    if out and len(files) > 1:
+        raise click.UsageError("--out can only be used when rendering a single file")
+
+    for file in files:
+        target = Path(out) if out else file.with_suffix("")
+        digest = render_hash(file, size, offset, convex_hull, opacity)
+        stamp = target.with_name(target.name + ".sha256")
+        if not force and stamp.is_file() and stamp.read_text().strip() == digest \
+                and all(o.is_file() for o in outputs(target)):
+            click.echo(f"Skipping {file}, which is up to date.")
+            continue
+        click.echo(f"Rendering {file}.")
+        if render(file, target, size, offset, convex_hull, opacity):
+            stamp.write_text(digest + "\n")
+        else:
+            click.echo(f"Could not save {target}.", err=True)
 
 
 if __name__ == "__main__":
@@ -3,13 +3,14 @@ from math import comb
 from typing import List, Tuple, Optional, Dict, Generator, TypeAlias
 
 from more_itertools import one
-from shapely import contains_xy, Polygon, Geometry
+import shapely
+from shapely import contains_xy, Polygon, Geometry, STRtree
 from shapely.coords import CoordinateSequence
 
 __all__ = [
     "is_convex_quad", "is_nonconvex_quad", "all_structures_from_quad", "contains_any",
-    "find_empty_monochromatic_structures", "CONVEX_SHAPES", "NONCONVEX_SHAPES",
-    "Point", "PointSet", "FilterList", "PartitionedPointSet"
+    "find_empty_monochromatic_structures", "has_empty_monochromatic_structure", "CONVEX_SHAPES", "NONCONVEX_SHAPES",
+    "Point", "PointSet", "FilterList", "PartitionedPointSet", "BACKENDS", "PointIndex", "index_points"
 ]
 
 Point: TypeAlias = Tuple[float, float]
@@ -74,6 +75,27 @@ def pants_nonconvex(hull: Polygon, pts: PointSet = None):
         ])
 
 
+# alternative engines yielding the same records, by the module implementing them;
+# "shapely" is the reference implementation in this module
+BACKENDS = {
+    "shapely": "garment_nrs.lib",
+    "numpy": "garment_nrs.vectorized",
+    "exact": "garment_nrs.exact",
+    "table": "garment_nrs.tables",
+    "walk": "garment_nrs.walk",
+    "cgal": "garment_nrs.cgal",
+}
+
+
+def get_backend(backend: str):
+    """ Import the module implementing the given backend """
+    import importlib
+
+    if backend not in BACKENDS:
+        raise KeyError(f"invalid backend {backend}")
+    return importlib.import_module(BACKENDS[backend])
+
+
 CONVEX_SHAPES = {
     "cravat": cravats_convex,
     "necklace": necklaces_convex,
@@ -85,14 +107,19 @@ NONCONVEX_SHAPES = {
 }
 
 
-def all_structures_from_quad(pts: PointSet, only: FilterList = None) -> Generator[Tuple[str, Geometry]]:
+def all_structures_from_quad(pts: PointSet, only: FilterList = None, backend: str = "shapely") \
+        -> Generator[Tuple[str, Geometry]]:
     """ Build all possible structures from a (convex or non-convex) set of 4 points.
 
     Yield tuples of (structure name, shapely polygon).
     If only is non-empty, only returns structures whose name is in the list.
+    The convex hull deciding which structures can be built is computed by the given backend.
     """
     assert len(pts) == 4
-    hull = Polygon(pts).convex_hull
+    if backend != "shapely":
+        hull = get_backend(backend).convex_hull(pts)
+    else:
+        hull = Polygon(pts).convex_hull
     shapes = CONVEX_SHAPES if is_convex_quad(hull) else NONCONVEX_SHAPES
     for shape, func in shapes.items():
         if only and shape not in only:
@@ -103,13 +130,46 @@ def all_structures_from_quad(pts: PointSet, only: FilterList = None) -> Generato
 
 ###########################################################
 
-def contains_any(region: Geometry, points: PointSet) -> bool:
+class PointIndex:
+    """ The points of some colors, each indexed by an STRtree, so that regions are only tested against nearby points """
+
+    def __init__(self, parts: List[Tuple[PointSet, STRtree]]):
+        self.parts = parts
+
+    def __len__(self) -> int:
+        return sum(len(ps) for ps, _ in self.parts)
+
+    def __iter__(self):
+        return itertools.chain.from_iterable(ps for ps, _ in self.parts)
+
+    def near(self, region: Geometry) -> PointSet:
+        """ The points within the envelope of region, in their original order """
+        return [ps[i] for ps, tree in self.parts for i in sorted(tree.query(region).tolist())]
+
+    def contained_in(self, region: Geometry) -> bool:
+        """ Check if region contains any of the points, only testing those within its envelope """
+        return any(len(tree.query(region, predicate="contains")) for _, tree in self.parts)
+
+
+def index_points(parts: PartitionedPointSet) -> Dict[str, STRtree]:
+    """ Build an STRtree over the points of each color, once for all colors """
+    return {c: STRtree([shapely.Point(p) for p in ps]) for c, ps in parts.items()}
+
+
+def contains_any(region: Geometry, points: PointSet | PointIndex) -> bool:
     """ Check if region contains any of points """
+    if isinstance(points, PointIndex):
+        return points.contained_in(region)
     return any(contains_xy(region, *p) for p in points)
 
 
-def get_all_other_colored_points(parts: PartitionedPointSet, not_color: str):
-    """ Return a list of all points that do not have the given color """
+def get_all_other_colored_points(parts: PartitionedPointSet, not_color: str, trees: Dict[str, STRtree] = None):
+    """ Return a list of all points that do not have the given color
+
+    If trees from index_points are given, return a PointIndex over the other colors instead, without merging them.
+    """
+    if trees is not None:
+        return PointIndex([(ps, trees[c]) for c, ps in parts.items() if c != not_color])
     other_colors = [ps for (c, ps) in parts.items() if c != not_color]
     if len(other_colors) == 1:  # no merging needed
         return other_colors[0]
@@ -117,19 +177,35 @@ def get_all_other_colored_points(parts: PartitionedPointSet, not_color: str):
         return list(itertools.chain(*other_colors))
 
 
-def find_empty_monochromatic_structures(parts: PartitionedPointSet, only: FilterList = None):
+def find_empty_monochromatic_structures(parts: PartitionedPointSet, only: FilterList = None, backend: str = "shapely",
+                                        jobs: Optional[int] = 1, cache=None, quiet: bool = False):
+    """ Yield all empty monochromatic structures, showing the progress of each color unless quiet is set """
     from tqdm import tqdm
 
     for key in only or []:
         if key not in CONVEX_SHAPES and key not in NONCONVEX_SHAPES:
             raise KeyError(f"invalid only value {key}")
-
+    if cache is not None:  # a ResultCache from garment_nrs.cache, only searching on a miss
+        yield from cache.find_empty_monochromatic_structures(parts, only, backend, jobs, quiet)
+        return
+    if backend != "shapely" and getattr(get_backend(backend), "THREADED", False):  # searching on its own threads
+        yield from get_backend(backend).find_empty_monochromatic_structures(parts, only, jobs)
+        return
+    if jobs != 1:  # split the 4-tuples among multiple processes, None or 0 for all cores
+        from garment_nrs import parallel
+        yield from parallel.find_empty_monochromatic_structures(parts, only, backend, jobs, quiet)
+        return
+    if backend != "shapely":
+        yield from get_backend(backend).find_empty_monochromatic_structures(parts, only, quiet=quiet)
+        return
+
+    trees = index_points(parts)
     for color in parts.keys():
         same_color = parts[color]
-        other_color = get_all_other_colored_points(parts, color)
+        other_color = get_all_other_colored_points(parts, color, trees)
 
         quads = itertools.combinations(same_color, 4)
-        quads = tqdm(quads, total=comb(len(same_color), 4), desc=f"Processing 4-tuples for {color}")
+        quads = tqdm(quads, total=comb(len(same_color), 4), desc=f"Processing 4-tuples for {color}", disable=quiet)
         for quad in quads:
             for kind, region in all_structures_from_quad(quad, only):
                 if not contains_any(region, other_color):
@@ -139,3 +215,24 @@ def find_empty_monochromatic_structures(parts: PartitionedPointSet, only: Filter
                         "points": quad,
                         "shape": region,
                     }
+
+
+def has_empty_monochromatic_structure(parts: PartitionedPointSet, only: FilterList = None, backend: str = "shapely",
+                                      jobs: Optional[int] = 1, cache=None) -> bool:
+    """ Check whether parts contains any empty monochromatic structure.
+
+    With multiple jobs, all processes stop as soon as any of them found a structure.
+    Otherwise, the 4-tuples are visited in the order of garment_nrs.witness, where small, local 4-tuples come first.
+    """
+    if cache is not None:
+        return cache.has_empty_monochromatic_structure(parts, only, backend, jobs)
+    if backend != "shapely" and getattr(get_backend(backend), "THREADED", False):
+        return get_backend(backend).has_empty_monochromatic_structure(parts, only, jobs)
+    if jobs != 1:
+        from garment_nrs import parallel
+        return parallel.has_empty_monochromatic_structure(parts, only, backend, jobs)
+    for key in only or []:
+        if key not in CONVEX_SHAPES and key not in NONCONVEX_SHAPES:
+            raise KeyError(f"invalid only value {key}")
+    from garment_nrs import witness
+    return witness.has_empty_monochromatic_structure(parts, only, backend)
@@ -1,59 +1,163 @@
+import contextlib
 import json
 import random
 import sys
 
 import click
-from tqdm import tqdm
 
-from garment_nrs.lib import CONVEX_SHAPES, NONCONVEX_SHAPES, find_empty_monochromatic_structures
+from garment_nrs.lib import BACKENDS, CONVEX_SHAPES, NONCONVEX_SHAPES, find_empty_monochromatic_structures
+from garment_nrs.plot import PLOT_MODES
 from garment_nrs.util import *
 
 
 @click.command()
-@click.argument("file", type=click.File("r"))
+@click.argument("file", type=click.Path(exists=True, dir_okay=False, allow_dash=True))
 @click.option("-o", "--only",
               type=click.Choice([*CONVEX_SHAPES.keys(), *NONCONVEX_SHAPES.keys()], False),
               multiple=True, help="The types of structures for which to check, can be specified multiple times.")
 @click.option("-a", "--add", is_flag=True, default=False, help="Add a random point to the instance before checking.")
 @click.option("-p", "--plot", type=click.Path(writable=True, dir_okay=False), default=None,
               help="Plot the figure and all non-empty monochromatic structures to the given file.")
-def main(file, only, add, plot):
-    points = load_points_from_csv(file)
-    parts = partition_points(points)
+@click.option("--plot-mode", type=click.Choice(PLOT_MODES), default="regions", show_default=True,
+              help="Draw the regions of the structures, whose vertices are all kept in memory until saving, or a "
+                   "heatmap of how many structures cover each point, which needs bounded memory for any number of "
+                   "structures.")
+@click.option("--plot-resolution", type=click.IntRange(min=1), default=512, show_default=True,
+              help="The number of pixels along the longer side of the heatmap.")
+@click.option("-b", "--backend", type=click.Choice(list(BACKENDS.keys())), default="shapely", show_default=True,
+              help="The engine used for deciding which structures are empty.")
+@click.option("-j", "--jobs", type=click.IntRange(min=0), default=1, show_default=True,
+              help="The number of processes searching the 4-tuples in parallel, 0 for all cores.")
+@click.option("--cache", type=click.Path(dir_okay=False), default=None, envvar="GARMENT_CACHE",
+              help="Take the results from (and store them in) the given cache database, keyed by colored order type.")
+@click.option("--cache-size", type=click.IntRange(min=1), default=256, show_default=True,
+              help="The size in MiB beyond which the least recently used cache entries are evicted.")
+@click.option("--stats", "stats_file", type=click.Path(writable=True, dir_okay=False), default=None,
+              help="Write the time spent in and the counters of each phase of the search as JSON to the given file.")
+@click.option("-f", "--format", "fmt", type=click.Choice(["json", "indices", "npz", "arrow"]), default="json",
+              show_default=True,
+              help="Print each structure as JSON object with its geometry, or only write the indices of its points and "
+                   "its type and variant as tab-separated text, NumPy .npz file or Arrow IPC file (see output.py). "
+                   "The npz format keeps all structures in memory until all instances are searched.")
+@click.option("--output", type=click.Path(writable=True, dir_okay=False), default=None,
+              help="The file to which the indices are written, required for the npz and arrow formats.")
+@click.option("-n", "--count-only", is_flag=True, default=False,
+              help="Only print the number of structures of each type per color as JSON, without building geometry.")
+def main(file, only, add, plot, plot_mode, plot_resolution, backend, jobs, cache, cache_size, stats_file, fmt, output,
+         count_only):
+    from garment_nrs.instances import is_instance_file, load_instances
 
-    if plot:
-        import matplotlib.pyplot as plt
-        fig, ax = plt.subplots()
+    container = is_instance_file(file)
+    if fmt != "json" or count_only:
+        if plot or jobs != 1 or cache or stats_file:
+            raise click.UsageError("--plot, --jobs, --cache and --stats can only be used for the json format")
+        if fmt in ("npz", "arrow") and not output and not count_only:
+            raise click.UsageError(f"--format {fmt} requires --output")
+        if backend == "cgal":
+            raise click.UsageError("--format and --count-only can't be used with the cgal backend")
+        instances = ((name if container else None, points) for name, points in load_instances(file))
+        return search_indices(instances, only, add, backend, None if count_only else fmt, output)
+
+    if cache:
+        from garment_nrs.cache import ResultCache
+        cache = ResultCache(cache, cache_size * 2 ** 20)
+    if plot and container:
+        raise click.UsageError("--plot can only be used for a single CSV file")
 
-        for c, ps in parts.items():
-            px, py = zip(*ps)
-            ax.scatter(px, py, color=c, zorder=4)
+    collecting = contextlib.nullcontext()
+    if stats_file:
+        from garment_nrs.stats import collect
+        collecting = collect()
 
+    found = 0
+    with collecting as counters:
+        for name, points in load_instances(file):
+            found += search(points, name if container else None, only, add, plot, backend, jobs, cache, counters,
+                            plot_mode, plot_resolution)
+    if stats_file:
+        with open(stats_file, "w") as f:
+            json.dump(counters.to_dict(), f, indent=2)
+
+    return found
+
+
+def prepare(points, name, add):
+    """ Partition an instance (named if it is part of a container) and add a random point if requested """
+    from tqdm import tqdm
+
+    parts = partition_points(points)
     stats = ", ".join(f"{len(ps)} {c}" for c, ps in parts.items())
-    tqdm.write(f"Set contains {len(points)} points ({stats}).")
+    tqdm.write(f"{f'Instance {name}' if name else 'Set'} contains {len(points)} points ({stats}).")
     if add:
         p = (random_point(points), random.choice(list(parts.keys())))
         points.append(p)
         parts[p[1]].append(p[0])
         tqdm.write(f"Adding point {p}.")
+    return parts
+
+
+def search_indices(instances, only, add, backend, fmt, output):
+    """ Write the indices of all structures of all instances in the given format (or only count them)
+    and return the number of found structures """
+    import numpy as np
+    from tqdm import tqdm
+
+    from garment_nrs.output import FORMATS, find_structure_indices
+    from garment_nrs.vectorized import SLOTS
+
+    try:
+        writer = FORMATS[fmt](output) if fmt else None
+    except ImportError as e:
+        raise click.ClickException(f"--format {fmt} requires {e.name}, see the arrow extra")
+    found = 0
+    try:
+        for index, (name, points) in enumerate(instances):
+            parts = prepare(points, name, add)
+            counts = {c: {} for c in parts.keys()}
+            for color, quads, slots in find_structure_indices(parts, only, backend):
+                if writer:
+                    with tqdm.external_write_mode():
+                        writer.write(None if name is None else index, color, quads, slots)
+                for slot, n in enumerate(np.bincount(slots, minlength=len(SLOTS)).tolist()):
+                    if n:
+                        counts[color][SLOTS[slot][0]] = counts[color].get(SLOTS[slot][0], 0) + n
+                found += len(slots)
+            tqdm.write(f"Found {sum(sum(c.values()) for c in counts.values())} empty monochromatic structures.")
+            if not writer:
+                json.dump(counts if name is None else {"instance": name, "counts": counts}, sys.stdout)
+                print()
+    finally:
+        if writer:
+            writer.close()
+    return found
+
+
+def search(points, name, only, add, plot, backend, jobs, cache, counters, plot_mode="regions", plot_resolution=512):
+    """ Search a single instance (named if it is part of a container) and return the number of found structures """
+    from tqdm import tqdm
+
+    parts = prepare(points, name, add)
+
+    if plot:
+        from garment_nrs.plot import StructurePlot
+        figure = StructurePlot(parts, plot_mode, plot_resolution)
 
     found = 0
-    for s in find_empty_monochromatic_structures(parts, only):
+    results = find_empty_monochromatic_structures(parts, only, backend, jobs, cache)
+    if counters:
+        results = counters.track(results)
+    for s in results:
         found += 1
         if plot:
-            plot_polygon(
-                ax, s["shape"],
-                color=s['color'])
+            figure.add(s)
 
         with tqdm.external_write_mode():
-            json.dump(s, sys.stdout, default=str)
+            json.dump({"instance": name, **s} if name else s, sys.stdout, default=str)
             print()
     tqdm.write(f"Found {found} empty monochromatic structures.")
 
     if plot:
-        ax.set_aspect('equal')
-        plt.savefig(plot)
-        plt.close(fig)
+        figure.save(plot)
 
     return found
 
@@ -0,0 +1,262 @@
+"""Exhaustively scanning all 2-colorings of all order types of a given size for counterexamples.
+
+The order type database (https://www.ist.tugraz.at/aichholzer/research/rp/triangulations/ordertypes/) stores one
+realization of every order type of n points in general position as n points with unsigned little-endian 8-bit (for
+the files ending in .b08) or 16-bit (.b16) x and y coordinates, one after the other. The files are read through a
+memory map, so only the order types currently scanned are loaded.
+
+Of the 2^n 2-colorings of each order type, only one per class of colorings mapped to each other by an automorphism of
+the order type (possibly reflecting it) or by swapping both colors is scanned. The automorphisms are found among the
+candidate labelings of the canonical form (see garment_nrs.cache), as those yielding the smallest orientations of all
+triples. Every coloring is then searched for the first empty structure of the given types.
+Such a structure stays empty in every coloring in which its 4 points and all points touching its region have the same
+color, so these points form a sub-configuration that rules out all such colorings without searching them.
+
+Finished ranges of order types are appended to a checkpoint file, so that a (multi-day) scan can be resumed.
+"""
+import json
+import os
+import re
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+import click
+import numpy as np
+
+from garment_nrs.lib import BACKENDS, CONVEX_SHAPES, NONCONVEX_SHAPES, FilterList, PartitionedPointSet
+
+__all__ = ["database_format", "read_order_types", "colorings", "scan_order_type", "scan_range", "ScanCheckpoint"]
+
+COLORS = ("red", "blue")
+
+
+def database_format(path, points: Optional[int] = None, bits: Optional[int] = None) -> Tuple[int, int]:
+    """ The number of points and the bits per coordinate of the database at path,
+    derived from its name (e.g. otypes08.b16) unless given """
+    name = Path(path).name
+    if points is None:
+        match = re.search(r"(\d+)\.", name)
+        if not match:
+            raise ValueError(f"can't derive the number of points from the file name {name}")
+        points = int(match.group(1))
+    if bits is None:
+        match = re.search(r"\.b(08|16)$", name)
+        if not match:
+            raise ValueError(f"can't derive the bits per coordinate from the file name {name}")
+        bits = int(match.group(1))
+    return points, bits
+
+
+def _open(path, points: int, bits: int) -> np.ndarray:
+    """ The (order types, points, 2) array of all coordinates in the database, as memory map """
+    if os.path.getsize(path) == 0:
+        return np.empty((0, points, 2), dtype=f"<u{bits // 8}")
+    data = np.memmap(path, dtype=f"<u{bits // 8}", mode="r")
+    if len(data) % (2 * points):
+        raise ValueError(f"the size of {path} is no multiple of {points} points with {bits}-bit coordinates")
+    return data.reshape(-1, points, 2)
+
+
+def read_order_types(path, points: int, bits: int, start: int = 0, stop: Optional[int] = None) \
+        -> Iterator[Tuple[int, np.ndarray]]:
+    """ Yield the index and the (points, 2) int64 coordinates of the order types start to stop of the database """
+    data = _open(path, points, bits)
+    for index in range(start, len(data) if stop is None else min(stop, len(data))):
+        yield index, np.asarray(data[index], dtype=np.int64)
+
+
+def colorings(coords: np.ndarray) -> np.ndarray:
+    """ One coloring of every class of 2-colorings of the points up to automorphisms and swapping the colors,
+    as bitmasks with bit i set iff point i has the second color """
+    from garment_nrs.cache import candidate_labelings
+    from garment_nrs.vectorized import orientation_signs
+
+    n = len(coords)
+    S = orientation_signs(coords[:, None, None, :], coords[None, :, None, :], coords[None, None, :, :])
+    labelings = list(candidate_labelings([tuple(p) for p in coords.tolist()], S))
+    smallest = min(signs for _, signs in labelings)
+
+    masks = np.arange(2 ** n, dtype=np.int64)
+    bits = (masks[:, None] >> np.arange(n)) & 1
+    weights = np.int64(1) << np.arange(n, dtype=np.int64)
+    keys = np.full(len(masks), 2 ** n, dtype=np.int64)
+    for perm, signs in labelings:
+        if signs == smallest:  # labeling the points in the same way as the canonical one
+            keys = np.minimum(keys, bits[:, perm] @ weights)
+            keys = np.minimum(keys, (1 - bits[:, perm]) @ weights)
+    return masks[np.unique(keys, return_index=True)[1]]
+
+
+def _parts(coords: np.ndarray, mask: int) -> PartitionedPointSet:
+    parts = {color: [] for color in COLORS}
+    for i, p in enumerate(coords.tolist()):
+        parts[COLORS[mask >> i & 1]].append(tuple(p))
+    return {c: ps for c, ps in parts.items() if ps}
+
+
+def _sub_configuration(coords: np.ndarray, structure: dict) -> int:
+    """ The bitmask of the points of the structure and of all points touching its region """
+    import shapely
+
+    index = {tuple(p): i for i, p in enumerate(coords.tolist())}
+    touching = shapely.intersects(structure["shape"], shapely.points(coords.astype(float)))
+    return sum(1 << i for i in {*np.flatnonzero(touching).tolist(), *(index[tuple(p)] for p in structure["points"])})
+
+
+def scan_order_type(coords: np.ndarray, only: FilterList = None, backend: str = "exact") -> Tuple[int, int, List[int]]:
+    """ The number of colorings of the points up to symmetry, how many of them were ruled out by a sub-configuration
+    and the bitmasks of those without empty structure """
+    from garment_nrs.lib import find_empty_monochromatic_structures
+
+    scanned = colorings(coords)
+    ruled_out: List[int] = []
+    pruned, found = 0, []
+    for mask in scanned.tolist():
+        if any(mask & sub in (0, sub) for sub in ruled_out):
+            pruned += 1
+            continue
+        structure = next(find_empty_monochromatic_structures(_parts(coords, mask), only, backend, quiet=True), None)
+        if structure is None:
+            found.append(mask)
+        else:
+            ruled_out.append(_sub_configuration(coords, structure))
+    return len(scanned), pruned, found
+
+
+def scan_range(path, points: int, bits: int, start: int, stop: int, only: FilterList, backend: str) -> dict:
+    """ Scan the order types start to stop of the database, returning the checkpoint entry of this range """
+    entry = {"start": start, "stop": stop, "colorings": 0, "pruned": 0, "found": []}
+    for index, coords in read_order_types(path, points, bits, start, stop):
+        scanned, pruned, found = scan_order_type(coords, only, backend)
+        entry["colorings"] += scanned
+        entry["pruned"] += pruned
+        entry["found"].extend([index, mask] for mask in found)
+    return entry
+
+
+class ScanCheckpoint:
+    """ The finished ranges of order types, appended as JSON lines to a file after a first line describing the scan,
+    which has to match when resuming """
+
+    def __init__(self, path, scan: dict):
+        self.path = path
+        self.entries = []
+        if path and Path(path).is_file() and Path(path).stat().st_size:
+            lines, line = [], "\n"
+            with open(path) as f:
+                for line in f:
+                    try:
+                        lines.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue  # possibly truncated by an interruption
+                if not line.endswith("\n"):
+                    self._append(None)  # terminate the truncated line
+            if not lines:
+                self._append(scan)
+            elif lines[0] != scan:
+                raise click.UsageError(f"the checkpoint {path} belongs to a different scan: {lines[0]}")
+            self.entries = lines[1:]
+        elif path:
+            self._append(scan)
+
+    def _append(self, entry):
+        with open(self.path, "a") as f:
+            f.write("" if entry is None else json.dumps(entry))
+            f.write("\n")
+
+    def record(self, entry: dict):
+        self.entries.append(entry)
+        if self.path:
+            self._append(entry)
+
+    def remaining(self, count: int, size: int) -> List[Tuple[int, int]]:
+        """ The ranges of at most size order types that are not yet finished """
+        done = np.zeros(count, dtype=bool)
+        for entry in self.entries:
+            done[entry["start"]:entry["stop"]] = True
+        ranges = []
+        for start in np.flatnonzero(~done).tolist():
+            if ranges and ranges[-1][1] == start and ranges[-1][1] - ranges[-1][0] < size:
+                ranges[-1][1] += 1
+            else:
+                ranges.append([start, start + 1])
+        return [(start, stop) for start, stop in ranges]
+
+
+def counterexample_path(out: Path, index: int, mask: int, n: int, only: FilterList) -> Path:
+    """ Name a counterexample in the same way as the files in data/, so that garment-check can verify it """
+    name = "_".join([f"n{n}", "c2", "no", "mc", *(only or [*CONVEX_SHAPES, *NONCONVEX_SHAPES])])
+    return out / f"otype{index}_coloring{mask}" / f"{name}.csv"
+
+
+@click.command()
+@click.argument("database", type=click.Path(exists=True, dir_okay=False))
+@click.option("-o", "--only",
+              type=click.Choice([*CONVEX_SHAPES.keys(), *NONCONVEX_SHAPES.keys()], False),
+              multiple=True, help="The types of structures that should not be empty, can be specified multiple times.")
+@click.option("-n", "--points", type=click.IntRange(min=1), default=None,
+              help="The number of points of each order type, derived from the file name (e.g. otypes08.b16) if not "
+                   "given.")
+@click.option("--bits", type=click.Choice(["8", "16"]), default=None,
+              help="The bits per coordinate, derived from the file suffix (.b08 or .b16) if not given.")
+@click.option("-b", "--backend", type=click.Choice(list(BACKENDS.keys())), default="exact", show_default=True,
+              help="The engine used for deciding which structures are empty.")
+@click.option("-w", "--workers", type=click.IntRange(min=0), default=1, show_default=True,
+              help="The number of processes scanning ranges of order types in parallel, 0 for all cores.")
+@click.option("--chunk", type=click.IntRange(min=1), default=1000, show_default=True,
+              help="The number of order types scanned (and checkpointed) together.")
+@click.option("-c", "--checkpoint", type=click.Path(dir_okay=False), default=None,
+              help="Record finished ranges of order types in the given file and skip those already recorded there.")
+@click.option("--out", type=click.Path(file_okay=False, writable=True), default="scan", show_default=True,
+              help="The directory to which found counterexamples are written.")
+def main(database, only, points, bits, backend, workers, chunk, checkpoint, out):
+    from tqdm import tqdm
+
+    from garment_nrs.util import write_points_to_csv
+
+    only = list(only) or None
+    try:
+        points, bits = database_format(database, points, bits and int(bits))
+        count = len(_open(database, points, bits))
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    scan = {"database": os.path.abspath(database), "points": points, "bits": bits,
+            "only": sorted(only or [*CONVEX_SHAPES, *NONCONVEX_SHAPES])}
+    checkpoint = ScanCheckpoint(checkpoint, scan)
+    ranges = checkpoint.remaining(count, chunk)
+    tqdm.write(f"Scanning {sum(stop - start for start, stop in ranges)} of {count} order types of {points} points.")
+
+    def finished(entry, progress):
+        checkpoint.record(entry)
+        progress.update(entry["stop"] - entry["start"])
+        for index, mask in entry["found"]:
+            coords = next(read_order_types(database, points, bits, index, index + 1))[1]
+            path = counterexample_path(Path(out), index, mask, points, only)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "w", newline="") as f:
+                write_points_to_csv(_parts(coords, mask), f)
+            tqdm.write(f"Order type {index} with coloring {mask:0{points}b} contains no empty structure: {path}")
+
+    with tqdm(total=count, initial=count - sum(stop - start for start, stop in ranges), desc="Order types") \
+            as progress:
+        tasks = [(database, points, bits, start, stop, only, backend) for start, stop in ranges]
+        if workers == 1:
+            for task in tasks:
+                finished(scan_range(*task), progress)
+        else:
+            from concurrent.futures import ProcessPoolExecutor, as_completed
+
+            with ProcessPoolExecutor(workers or None) as pool:
+                for future in as_completed([pool.submit(scan_range, *task) for task in tasks]):
+                    finished(future.result(), progress)
+
+    entries = checkpoint.entries
+    found = sum(len(e["found"]) for e in entries)
+    tqdm.write(f"Scanned {count} order types with {sum(e['colorings'] for e in entries)} colorings up to symmetry, "
+               f"{sum(e['pruned'] for e in entries)} of which were ruled out by a sub-configuration: "
+               f"{found} contain no empty {only or 'structure'}.")
+    return found
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Compact output of found structures as indices, without building their geometry.
+
+A structure is identified by its color, the indices of its 4 points within the points of that color (in the order
+of the input) and its slot, the index of its (type, variant) pair in SLOTS, e.g. 1 to 4 for the four necklaces of a
+convex 4-tuple. The backends based on garment_nrs.vectorized decide all structures of a chunk of 4-tuples at once
+and directly yield these indices, while the reference shapely backend still needs to build each region.
+
+Writers for the formats accepted by `garment --format` receive the structures in blocks of columns.
+"""
+import itertools
+import sys
+from collections import Counter
+from typing import Iterator, Tuple
+
+import numpy as np
+
+from garment_nrs.lib import FilterList, PartitionedPointSet, get_backend
+from garment_nrs.vectorized import SLOTS
+
+__all__ = ["find_structure_indices", "FORMATS"]
+
+
+def _reference_indices(parts: PartitionedPointSet, only: FilterList = None, quiet: bool = False):
+    """ Yield (color, 4-tuples, slots) for all empty structures of each 4-tuple found by the reference search """
+    from math import comb
+
+    from tqdm import tqdm
+
+    from garment_nrs.lib import all_structures_from_quad, contains_any, get_all_other_colored_points, index_points
+
+    trees = index_points(parts)
+    for color in parts.keys():
+        same_color = parts[color]
+        other_color = get_all_other_colored_points(parts, color, trees)
+
+        quads = itertools.combinations(range(len(same_color)), 4)
+        quads = tqdm(quads, total=comb(len(same_color), 4), desc=f"Processing 4-tuples for {color}", disable=quiet)
+        for quad in quads:
+            variants = Counter()
+            slots = []
+            for kind, region in all_structures_from_quad(tuple(same_color[i] for i in quad), only):
+                if not contains_any(region, other_color):
+                    slots.append(SLOTS.index((kind, variants[kind])))
+                variants[kind] += 1
+            if slots:
+                yield color, np.array([quad] * len(slots), dtype=np.intp), np.array(slots, dtype=np.intp)
+
+
+def find_structure_indices(parts: PartitionedPointSet, only: FilterList = None, backend: str = "shapely",
+                           quiet: bool = False) -> Iterator[Tuple[str, np.ndarray, np.ndarray]]:
+    """ Yield (color, 4-tuples as (m, 4) indices into parts[color], slots) for all empty structures, in blocks """
+    from garment_nrs.lib import CONVEX_SHAPES, NONCONVEX_SHAPES
+
+    for key in only or []:
+        if key not in CONVEX_SHAPES and key not in NONCONVEX_SHAPES:
+            raise KeyError(f"invalid only value {key}")
+    if backend == "shapely":
+        yield from _reference_indices(parts, only, quiet)
+        return
+    from garment_nrs.vectorized import find_structure_indices as find
+
+    module = get_backend(backend)
+    if not hasattr(module, "TABLE"):
+        raise ValueError(f"backend {backend} can't report structures as indices")
+    yield from find(parts, only, module.COORDINATES, module.TABLE, quiet)
+
+
+class TextWriter:
+    """ One line per structure: [instance], color, the 4 indices and the slot, separated by tabs """
+
+    def __init__(self, path=None):
+        self.file = open(path, "w") if path else sys.stdout
+
+    def write(self, instance, color, quads, slots):
+        prefix = f"{instance}\t" if instance is not None else ""
+        self.file.writelines(f"{prefix}{color}\t{a}\t{b}\t{c}\t{d}\t{s}\n"
+                             for (a, b, c, d), s in zip(quads.tolist(), slots.tolist()))
+
+    def close(self):
+        if self.file is not sys.stdout:
+            self.file.close()
+
+
+class NumpyWriter:
+    """ An .npz file with the columns instance, color (indices into colors), quads (m, 4) and slot (into slots).
+
+    As the arrays of an .npz file can't be appended to, all columns are kept in memory until closing.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.colors = {}
+        self.columns = {"instance": [], "color": [], "quads": [], "slot": []}
+
+    def write(self, instance, color, quads, slots):
+        self.columns["instance"].append(np.full(len(slots), -1 if instance is None else instance, dtype=np.int32))
+        self.columns["color"].append(np.full(len(slots), self.colors.setdefault(color, len(self.colors)),
+                                             dtype=np.uint8))
+        self.columns["quads"].append(np.asarray(quads, dtype=np.int32).reshape(-1, 4))
+        self.columns["slot"].append(np.asarray(slots, dtype=np.uint8))
+
+    def close(self):
+        columns = {k: np.concatenate(v) if v else np.empty((0, 4) if k == "quads" else 0, dtype=np.int32)
+                   for k, v in self.columns.items()}
+        np.savez_compressed(self.path, **columns, colors=np.array(list(self.colors), dtype=str),
+                            slots=np.array([f"{name}{variant}" for name, variant in SLOTS], dtype=str))
+
+
+class ArrowWriter:
+    """ An Arrow IPC file with the columns instance, color, a, b, c, d, type and variant, one batch per block.
+
+    The colors are only known while writing, and an IPC file can't replace the dictionary of a column between batches,
+    so the color is a plain string column.
+    """
+
+    def __init__(self, path):
+        import pyarrow as pa
+
+        self.pa = pa
+        self.schema = pa.schema([
+            ("instance", pa.int32()), ("color", pa.string()),
+            ("a", pa.int32()), ("b", pa.int32()), ("c", pa.int32()), ("d", pa.int32()),
+            ("type", pa.dictionary(pa.int8(), pa.string())), ("variant", pa.uint8()),
+        ])
+        self.writer = pa.ipc.new_file(path, self.schema)
+        self.types = pa.array([name for name, _ in SLOTS])
+        self.variants = np.array([variant for _, variant in SLOTS], dtype=np.uint8)
+
+    def write(self, instance, color, quads, slots):
+        pa = self.pa
+        n = len(slots)
+        self.writer.write_batch(pa.record_batch([
+            pa.array(np.full(n, -1 if instance is None else instance, dtype=np.int32)),
+            pa.array([color] * n, type=pa.string()),
+            *(pa.array(np.asarray(quads[:, i], dtype=np.int32)) for i in range(4)),
+            pa.DictionaryArray.from_arrays(pa.array(np.asarray(slots, dtype=np.int8)), self.types),
+            pa.array(self.variants[slots]),
+        ], schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+# writers by --format, apart from the default json records
+FORMATS = {
+    "indices": TextWriter,
+    "npz": NumpyWriter,
+    "arrow": ArrowWriter,
+}
@@ -0,0 +1,143 @@
+"""Searching the 4-tuples of all colors on multiple processes.
+
+The 4-tuples of each color are split into shards by their first (smallest) index, each shard being searched by one
+worker of a process pool with the given backend.
+The workers keep the per-color tables of the vectorized backends, so that these are only built once per process,
+as well as the candidates of the walk backend, which are computed for all shards of a color at once.
+Shards are handed out in the order in which the serial search visits them (which, per color, starts with the largest
+ones) and their records are merged in this order, so that they are reported exactly as when searching serially.
+When the consumer stops iterating (e.g. `any(...)` found a structure), the pool and thereby all workers are stopped.
+"""
+import functools
+import itertools
+import os
+from math import comb
+from typing import List, Optional, Tuple, TypeAlias
+
+from garment_nrs.lib import (CONVEX_SHAPES, NONCONVEX_SHAPES, FilterList, PartitionedPointSet,
+                             all_structures_from_quad, contains_any, get_all_other_colored_points, get_backend,
+                             index_points)
+
+__all__ = ["shards", "find_empty_monochromatic_structures", "has_empty_monochromatic_structure"]
+
+Shard: TypeAlias = Tuple[str, int]
+
+# state of each worker process, set by _init_worker
+_parts: PartitionedPointSet = None
+_only: FilterList = None
+_backend: str = None
+
+
+def shards(parts: PartitionedPointSet) -> List[Shard]:
+    """ All (color, first index) pairs, in the order in which the reference implementation visits them """
+    return [(color, first) for color, ps in parts.items() for first in range(max(len(ps) - 3, 0))]
+
+
+def _init_worker(parts: PartitionedPointSet, only: FilterList, backend: str):
+    global _parts, _only, _backend
+    _parts, _only, _backend = parts, only, backend
+
+
+@functools.cache
+def _coordinates():
+    return get_backend(_backend).COORDINATES(_parts)
+
+
+@functools.cache
+def _color_table(color: str):
+    from garment_nrs import vectorized
+
+    return vectorized.color_table(_coordinates(), color, get_backend(_backend).TABLE)
+
+
+@functools.cache
+def _candidate_quads(color: str):
+    """ The candidates of tables computing them for all shards at once (see garment_nrs.walk), so only once """
+    signs, _ = _color_table(color)
+    return signs.candidate_quads(_only)
+
+
+@functools.cache
+def _trees():
+    return index_points(_parts)
+
+
+@functools.cache
+def _other_colored_points(color: str):
+    return get_all_other_colored_points(_parts, color, _trees())
+
+
+def _search_shard(shard: Shard):
+    """ Yield the records of all empty structures whose 4-tuple starts with the given point """
+    color, first = shard
+    same_color = _parts[color]
+    if _backend == "shapely":
+        other_color = _other_colored_points(color)
+        for rest in itertools.combinations(same_color[first + 1:], 3):
+            quad = (same_color[first], *rest)
+            for kind, region in all_structures_from_quad(quad, _only):
+                if not contains_any(region, other_color):
+                    yield {  # found an empty structure
+                        "color": color,
+                        "type": kind,
+                        "points": quad,
+                        "shape": region,
+                    }
+    else:
+        from garment_nrs import vectorized
+
+        signs, rank = _color_table(color)
+        if hasattr(signs, "candidate_quads"):
+            from garment_nrs.walk import first_chunks
+            _, chunks = first_chunks(_candidate_quads(color), first)
+        else:
+            _, chunks = signs.candidates(_only, first)
+        for quads in chunks:
+            yield from vectorized.chunk_structures(same_color, color, signs, rank, quads, _only)
+
+
+def _all_in_shard(shard: Shard):
+    return shard, list(_search_shard(shard))
+
+
+def _any_in_shard(shard: Shard):
+    return shard, list(itertools.islice(_search_shard(shard), 1))
+
+
+def _pool(parts: PartitionedPointSet, only: FilterList, backend: str, jobs: Optional[int]):
+    import multiprocessing
+
+    for key in only or []:
+        if key not in CONVEX_SHAPES and key not in NONCONVEX_SHAPES:
+            raise KeyError(f"invalid only value {key}")
+    get_backend(backend)
+    return multiprocessing.Pool(jobs or os.cpu_count(), _init_worker, (dict(parts), only, backend))
+
+
+def find_empty_monochromatic_structures(parts: PartitionedPointSet, only: FilterList = None,
+                                        backend: str = "shapely", jobs: Optional[int] = None, quiet: bool = False):
+    """ Search all shards on jobs processes (all cores if None), yielding the records in serial order """
+    from tqdm import tqdm
+
+    with _pool(parts, only, backend, jobs) as pool:
+        current, progress = None, None
+        try:
+            for (color, first), records in pool.imap(_all_in_shard, shards(parts)):
+                if color != current:
+                    if progress is not None:
+                        progress.close()
+                    current = color
+                    progress = tqdm(total=comb(len(parts[color]), 4), desc=f"Processing 4-tuples for {color}",
+                                    disable=quiet)
+                yield from records
+                progress.update(comb(len(parts[color]) - first - 1, 3))
+        finally:
+            if progress is not None:
+                progress.close()
+
+
+def has_empty_monochromatic_structure(parts: PartitionedPointSet, only: FilterList = None,
+                                      backend: str = "shapely", jobs: Optional[int] = None) -> bool:
+    """ Check whether any empty structure exists, stopping all workers as soon as one of them found one """
+    with _pool(parts, only, backend, jobs) as pool:
+        return any(records for shard, records in pool.imap_unordered(_any_in_shard, shards(parts)))
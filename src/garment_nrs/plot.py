@@ -0,0 +1,117 @@
+"""Plotting a point set together with (possibly very many) found structures.
+
+Instead of two matplotlib artists per structure, the StructurePlot only keeps the exterior vertices of the regions and
+draws them as one rasterized PolyCollection per color, so that the size of the saved figure does not grow with the
+number of structures. The vertices are still kept until saving (as matplotlib also keeps them in the collections), so
+memory grows linearly with the number of structures in this mode.
+Only the heatmap of the number of structures covering each pixel has bounded memory, as it is accumulated in batches of
+regions by scanline rasterization: every edge of a (consistently oriented) region adds its direction to the pixels left
+of where it crosses each pixel row, so that the prefix sums along the rows yield the winding number of each pixel
+center, which is 1 inside of a region and 0 outside of it (or in a hole).
+"""
+from typing import Dict, List
+
+import numpy as np
+
+from garment_nrs.lib import PartitionedPointSet
+
+__all__ = ["PLOT_MODES", "StructurePlot"]
+
+PLOT_MODES = ["regions", "heatmap"]
+
+# the number of regions that are rasterized together for the heatmap
+BATCH_SIZE = 4096
+
+
+class StructurePlot:
+    """ A figure of parts, to which the found structures are added one after the other.
+
+    In the regions mode, the vertices of all regions are kept until saving, while the heatmap only keeps the pixel
+    counts and a batch of at most BATCH_SIZE regions.
+    """
+
+    def __init__(self, parts: PartitionedPointSet, mode: str = "regions", resolution: int = 512):
+        import matplotlib.pyplot as plt
+
+        if mode not in PLOT_MODES:
+            raise KeyError(f"invalid plot mode {mode}")
+        self.parts = parts
+        self.mode = mode
+        self.fig, self.ax = plt.subplots()
+        self.regions: Dict[str, List[np.ndarray]] = {c: [] for c in parts.keys()}
+        self.batch = []
+
+        coords = np.array([p for ps in parts.values() for p in ps], dtype=float).reshape(-1, 2)
+        lo, hi = (coords.min(axis=0), coords.max(axis=0)) if len(coords) else (np.zeros(2), np.ones(2))
+        extent = np.maximum(hi - lo, 1e-9)
+        self.shape = np.maximum(1, np.round(resolution * extent / extent.max()).astype(int))  # columns, rows
+        self.origin, self.pixel = lo, extent / self.shape
+        self.coverage = np.zeros((self.shape[1], self.shape[0] + 1), dtype=np.int64)  # one more for the prefix sums
+
+    def add(self, structure: dict):
+        """ Add a found structure (as yielded by find_empty_monochromatic_structures) """
+        if self.mode == "heatmap":
+            self.batch.append(structure["shape"])
+            if len(self.batch) >= BATCH_SIZE:
+                self._rasterize()
+            return
+        import shapely
+
+        for part in shapely.get_parts(structure["shape"]):
+            if not part.is_empty:
+                self.regions.setdefault(structure["color"], []).append(
+                    shapely.get_coordinates(part.exterior).astype(np.float32))
+
+    def _rasterize(self):
+        import shapely
+
+        rings = shapely.get_rings(shapely.orient_polygons(shapely.get_parts(np.array(self.batch, dtype=object))))
+        self.batch = []
+        coords, ring = shapely.get_coordinates(rings, return_index=True)
+        same = ring[1:] == ring[:-1]  # consecutive vertices of the same ring form an edge
+        (x0, y0), (x1, y1) = coords[:-1][same].T, coords[1:][same].T
+
+        # the rows whose pixel centers lie in [min(y0, y1), max(y0, y1)) of each edge
+        row = (np.stack([y0, y1]) - self.origin[1]) / self.pixel[1] - 0.5
+        first = np.ceil(row.min(axis=0)).astype(np.int64).clip(0, self.shape[1])
+        stop = np.ceil(row.max(axis=0)).astype(np.int64).clip(0, self.shape[1])
+        counts = stop - first
+        edge = np.repeat(np.arange(len(first)), counts)
+        rows = np.repeat(first - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+
+        y = self.origin[1] + (rows + 0.5) * self.pixel[1]
+        x = x0[edge] + (y - y0[edge]) * (x1[edge] - x0[edge]) / (y1[edge] - y0[edge])
+        column = np.ceil((x - self.origin[0]) / self.pixel[0] - 0.5).astype(np.int64).clip(0, self.shape[0])
+        direction = np.where(y1[edge] > y0[edge], 1, -1)
+        np.add.at(self.coverage, (rows, np.zeros_like(rows)), direction)
+        np.add.at(self.coverage, (rows, column), -direction)
+
+    def save(self, path):
+        """ Draw all added structures and the points, and save the figure to path """
+        import matplotlib.pyplot as plt
+        from matplotlib.collections import PolyCollection
+        from matplotlib.colors import to_rgba
+
+        if self.mode == "heatmap":
+            if self.batch:
+                self._rasterize()
+            counts = np.cumsum(self.coverage, axis=1)[:, :-1]
+            (x0, y0), (x1, y1) = self.origin, self.origin + self.pixel * self.shape
+            image = self.ax.imshow(np.ma.masked_equal(counts, 0), origin="lower", extent=(x0, x1, y0, y1),
+                                   cmap="viridis", interpolation="nearest", zorder=1)
+            self.fig.colorbar(image, ax=self.ax, label="empty structures")
+        else:
+            for c, regions in self.regions.items():
+                if regions:
+                    self.ax.add_collection(PolyCollection(
+                        regions, facecolors=to_rgba(c, 0.3), edgecolors=to_rgba(c, 0.7), linewidths=3,
+                        capstyle="round", rasterized=True, zorder=1))
+
+        for c, ps in self.parts.items():
+            if ps:
+                px, py = zip(*ps)
+                self.ax.scatter(px, py, color="white" if self.mode == "heatmap" else c, edgecolors=c, zorder=4)
+        self.ax.autoscale_view()
+        self.ax.set_aspect('equal')
+        self.fig.savefig(path)
+        plt.close(self.fig)
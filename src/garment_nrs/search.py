@@ -0,0 +1,147 @@
+"""Local search for new counterexamples.
+
+Starting from an instance (or a random point set), each chain runs simulated annealing over moving single points
+and changing their color, minimizing the number of empty structures.
+Every move is a deletion followed by an insertion, which are both evaluated through the delta of the blocker counts
+kept by the DeltaChecker, instead of searching the whole point set again.
+Whenever no empty structure is left (as confirmed by the exact backend), the point set is written as a new
+counterexample, after which a random point is inserted to look for an even larger one.
+"""
+import math
+import random
+from pathlib import Path
+
+import click
+from tqdm import tqdm
+
+from garment_nrs.lib import (CONVEX_SHAPES, NONCONVEX_SHAPES, FilterList, PartitionedPointSet,
+                             has_empty_monochromatic_structure)
+from garment_nrs.util import *
+
+
+def random_instance(n: int, rnd: random.Random, size: int = 1000) -> PartitionedPointSet:
+    """ n points with distinct integer coordinates in [0, size)^2, alternately colored red and blue """
+    coords = rnd.sample(range(size * size), n)
+    return partition_points([((c % size, c // size), ("red", "blue")[i % 2]) for i, c in enumerate(coords)])
+
+
+def counterexample_path(out: Path, chain: int, parts: PartitionedPointSet, only: FilterList) -> Path:
+    """ Name a counterexample in the same way as the files in data/, so that garment-check can verify it """
+    n = sum(len(ps) for ps in parts.values())
+    name = "_".join([f"n{n}", f"c{len(parts)}", "no", "mc", *(only or [*CONVEX_SHAPES, *NONCONVEX_SHAPES])])
+    return out / f"chain{chain}" / f"{name}.csv"
+
+
+def anneal(parts: PartitionedPointSet, only: FilterList, steps: int, temperature: float, cooling: float,
+           recolor: float, grow: bool, out: Path, chain: int, seed: int):
+    """ Run one chain of simulated annealing and return the chain index, the size of the largest counterexample
+    found (if any) and the number of empty structures at the end """
+    from garment_nrs.incremental import DeltaChecker
+
+    rnd = random.Random(seed)
+    checker = DeltaChecker({c: list(ps) for c, ps in parts.items()}, only)
+    largest = None
+    for _ in tqdm(range(steps), desc=f"Chain {chain}", position=chain, leave=False):
+        parts = checker.parts
+        raw = [(p, c) for c, ps in parts.items() for p in ps]
+        if checker.empty == 0:
+            if not has_empty_monochromatic_structure(parts, only, "exact"):
+                path = counterexample_path(out, chain, parts, only)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                with open(path, "w", newline="") as f:
+                    write_points_to_csv(parts, f)
+                largest = len(raw)
+                tqdm.write(f"Chain {chain} found a counterexample with {len(raw)} points: {path}")
+                if not grow:
+                    break
+                # continue searching with one more point, drawn from rnd so that the chain can be reproduced
+                taken = {p for p, c in raw}
+                point = random_point(raw, rnd)
+                while point in taken:
+                    point = random_point(raw, rnd)
+                checker.insert(point, rnd.choice(list(parts.keys())))
+                checker.commit()
+                continue
+
+        # move a random point to a nearby position, or change its color
+        taken = {p for p, c in raw}
+        (x, y), color = rnd.choice(raw)
+        index = parts[color].index((x, y))
+        if rnd.random() < recolor:
+            point, new_color = (x, y), rnd.choice([c for c in parts.keys() if c != color] or [color])
+        else:
+            min_x, max_x, min_y, max_y = bounding_box(raw)
+            scale = max(max_x - min_x, max_y - min_y, 1) / 10
+            point, new_color = (x + round(rnd.gauss(0, scale)), y + round(rnd.gauss(0, scale))), color
+            if point in taken:
+                continue
+
+        before = checker.empty
+        checker.delete(color, index)
+        checker.insert(point, new_color)
+        delta = checker.empty - before
+        if delta <= 0 or rnd.random() < math.exp(-delta / temperature):
+            checker.commit()
+        else:
+            checker.undo()
+            checker.undo()
+        temperature = max(temperature * cooling, 1e-9)
+
+    return chain, largest, checker.empty
+
+
+@click.command()
+@click.argument("file", type=click.File("r"), required=False)
+@click.option("-o", "--only",
+              type=click.Choice([*CONVEX_SHAPES.keys(), *NONCONVEX_SHAPES.keys()], False),
+              multiple=True, help="The types of structures that should not be empty, can be specified multiple times.")
+@click.option("-n", "--points", type=click.IntRange(min=4), default=20, show_default=True,
+              help="The number of points of the random start instance, if no file is given.")
+@click.option("-s", "--steps", type=click.IntRange(min=0), default=10000, show_default=True,
+              help="The number of moves tried by each chain.")
+@click.option("-c", "--chains", type=click.IntRange(min=1), default=1, show_default=True,
+              help="The number of independent chains.")
+@click.option("-j", "--jobs", type=click.IntRange(min=0), default=1, show_default=True,
+              help="The number of processes running the chains in parallel, 0 for all cores.")
+@click.option("-t", "--temperature", type=click.FloatRange(min=0, min_open=True), default=2.0, show_default=True,
+              help="The initial temperature, in numbers of empty structures.")
+@click.option("--cooling", type=click.FloatRange(0, 1), default=0.9995, show_default=True,
+              help="The factor by which the temperature is multiplied after each move.")
+@click.option("--recolor", type=click.FloatRange(0, 1), default=0.2, show_default=True,
+              help="The probability that a move changes the color of a point instead of moving it.")
+@click.option("--grow/--no-grow", default=True, show_default=True,
+              help="Whether to add a random point and continue after finding a counterexample.")
+@click.option("--out", type=click.Path(file_okay=False, writable=True), default="search", show_default=True,
+              help="The directory to which found counterexamples are written.")
+@click.option("--seed", type=int, default=None, help="The random seed of the first chain.")
+def main(file, only, points, steps, chains, jobs, temperature, cooling, recolor, grow, out, seed):
+    only = list(only) or None
+    seed = random.randrange(2 ** 32) if seed is None else seed
+    if file:
+        parts = partition_points(load_points_from_csv(file))
+    else:
+        parts = random_instance(points, random.Random(seed))
+    stats = ", ".join(f"{len(ps)} {c}" for c, ps in parts.items())
+    tqdm.write(f"Starting {chains} chains from {sum(len(ps) for ps in parts.values())} points ({stats}).")
+
+    tasks = [(parts, only, steps, temperature, cooling, recolor, grow, Path(out), chain, seed + chain)
+             for chain in range(chains)]
+    if jobs == 1:
+        results = [anneal(*task) for task in tasks]
+    else:
+        import multiprocessing
+        with multiprocessing.Pool(jobs or None) as pool:
+            results = pool.starmap(anneal, tasks)
+
+    found = 0
+    for chain, largest, empty in results:
+        if largest:
+            found += 1
+            tqdm.write(f"Chain {chain} found counterexamples with up to {largest} points.")
+        else:
+            tqdm.write(f"Chain {chain} found no counterexample, ending with {empty} empty structures.")
+    return found
+
+
+if __name__ == "__main__":
+    main()
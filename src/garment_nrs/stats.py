@@ -0,0 +1,160 @@
+"""Timers and counters for the phases of find_empty_monochromatic_structures.
+
+While collecting (within `with collect() as stats:`), the functions used by the reference search in
+garment_nrs.lib are replaced by instrumented copies, which record per color and per structure type:
+the time for building convex hulls and regions, for the point-in-region tests of contains_any and for
+enumerating 4-tuples through the tqdm progress bar, as well as the numbers of 4-tuples, regions built,
+containment tests performed, points skipped as they lie outside the envelope of the region and tests skipped
+because an earlier point already blocked the region.
+Outside of collect(), nothing is replaced, so the search runs without any overhead.
+
+The other backends decide all structures of a color at once, so for them only the found structures and the time
+spent in the search are recorded through Stats.track().
+"""
+import contextlib
+import time
+from collections import Counter
+from typing import Dict, Optional
+
+__all__ = ["Stats", "collect"]
+
+
+class Stats:
+    """ Seconds and counts, by color and optionally by structure type """
+
+    def __init__(self):
+        self.data: Dict = {}
+        self.color: Optional[str] = None
+        self.type: Optional[str] = None
+
+    def _node(self, kind: str, color: Optional[str], type: Optional[str]) -> Counter:
+        node = self.data.setdefault("colors", {}).setdefault(color or "all", {})
+        if type:
+            node = node.setdefault("types", {}).setdefault(type, {})
+        return node.setdefault(kind, Counter())
+
+    def time(self, phase: str, seconds: float, type: Optional[str] = None, color: Optional[str] = None):
+        self._node("seconds", color or self.color, type)[phase] += seconds
+
+    def count(self, counter: str, n: int = 1, type: Optional[str] = None, color: Optional[str] = None):
+        self._node("counts", color or self.color, type)[counter] += n
+
+    def track(self, records):
+        """ Pass through the records of a search, counting them and the time spent in the search """
+        records = iter(records)
+        total = self.data.setdefault("seconds", Counter())
+        while True:
+            start = time.perf_counter()
+            record = next(records, None)
+            total["search"] += time.perf_counter() - start
+            if record is None:
+                return
+            self.count("found", type=record["type"], color=record["color"])
+            yield record
+
+    def merge(self, data: Dict):
+        """ Add the seconds and counts of another Stats.to_dict() """
+
+        def add(into: Dict, other: Dict):
+            for key, value in other.items():
+                if isinstance(value, dict):
+                    add(into.setdefault(key, Counter() if key in ("seconds", "counts") else {}), value)
+                else:
+                    into[key] += value
+
+        add(self.data, data)
+
+    def to_dict(self) -> Dict:
+        return self.data
+
+
+@contextlib.contextmanager
+def collect(stats: Optional[Stats] = None):
+    """ Instrument the reference search in garment_nrs.lib for the duration of the context """
+    import tqdm
+    from shapely import Polygon, contains_xy
+
+    from garment_nrs import lib
+
+    stats = stats or Stats()
+    perf_counter = time.perf_counter
+
+    def get_all_other_colored_points(parts, not_color, trees=None):
+        stats.color = not_color
+        start = perf_counter()
+        try:
+            return original["get_all_other_colored_points"](parts, not_color, trees)
+        finally:
+            stats.time("other points", perf_counter() - start)
+
+    def all_structures_from_quad(pts, only=None, backend="shapely"):
+        if backend != "shapely":
+            yield from original["all_structures_from_quad"](pts, only, backend)
+            return
+        start = perf_counter()
+        hull = Polygon(pts).convex_hull
+        stats.time("hull", perf_counter() - start)
+        stats.count("quads")
+        shapes = lib.CONVEX_SHAPES if lib.is_convex_quad(hull) else lib.NONCONVEX_SHAPES
+        for shape, func in shapes.items():
+            if only and shape not in only:
+                continue
+            regions = func(hull, pts)
+            while True:
+                start = perf_counter()
+                region = next(regions, None)
+                stats.time("regions", perf_counter() - start, shape)
+                if region is None:
+                    break
+                stats.count("regions", type=shape)
+                stats.type = shape
+                yield shape, region
+
+    def contains_any(region, points):
+        start = perf_counter()
+        if isinstance(points, lib.PointIndex):
+            near = points.near(region)
+            stats.count("outside envelope", len(points) - len(near), stats.type)
+            points = near
+        tests = 0
+        blocked = False
+        for p in points:
+            tests += 1
+            if contains_xy(region, *p):
+                blocked = True
+                break
+        stats.time("contains", perf_counter() - start, stats.type)
+        stats.count("containment tests", tests, stats.type)
+        if blocked:
+            stats.count("short-circuited", type=stats.type)
+            stats.count("skipped tests", len(points) - tests, stats.type)
+        return blocked
+
+    class timed_tqdm(original_tqdm := tqdm.tqdm):
+        def __iter__(self):
+            quads = super().__iter__()
+            while True:
+                start = perf_counter()
+                try:
+                    quad = next(quads)
+                except StopIteration:
+                    return
+                finally:
+                    stats.time("iterate", perf_counter() - start)
+                yield quad
+
+    replaced = {
+        "get_all_other_colored_points": get_all_other_colored_points,
+        "all_structures_from_quad": all_structures_from_quad,
+        "contains_any": contains_any,
+    }
+    original = {name: getattr(lib, name) for name in replaced}
+    try:
+        for name, func in replaced.items():
+            setattr(lib, name, func)
+        tqdm.tqdm = timed_tqdm
+        yield stats
+    finally:
+        for name, func in original.items():
+            setattr(lib, name, func)
+        tqdm.tqdm = original_tqdm
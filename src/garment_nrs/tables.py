@@ -0,0 +1,158 @@
+"""Precomputed per-color tables for deciding every structure with a constant number of lookups.
+
+For each color, the number of other-colored points within every monochromatic triangle is computed in O(n^3)
+from "points below segment" counts: after sorting all points lexicographically (which amounts to an infinitesimal
+rotation, so no segment is vertical), a triangle a < b < c contains the points below its upper chain minus those on
+or below its lower chain, where each chain is made up of the segments ab, bc and ac.
+Together with the number of points on the relative interior of each segment, this decides cravats, necklaces,
+skirts and pants.
+
+The two lobes of a bowtie are bounded by the crossing point of the diagonals, so they are no triangles on points
+of the set. Each lobe is the intersection of the cones at its two quad vertices. For every pair (u, v) and third
+point w, the other-colored point in the cone at u between v and w that comes first when sweeping around v
+(starting at u) is stored, which decides the lobe by comparing it with the sweep position of the other diagonal.
+This witness table is built in O(n^3 log n) from the angular order of all points around each point of the color.
+"""
+import numpy as np
+
+from garment_nrs import vectorized
+from garment_nrs.exact import integer_coordinates
+from garment_nrs.lib import FilterList, PartitionedPointSet, PointSet
+from garment_nrs.vectorized import CONVEX, NONCONVEX, SignTable
+
+__all__ = ["TriangleTable", "convex_hull", "find_empty_monochromatic_structures"]
+
+
+def lexicographic_rank(coords: np.ndarray) -> np.ndarray:
+    """ Rank of every point when sorting by (x, y) """
+    rank = np.empty(len(coords), dtype=np.intp)
+    rank[sorted(range(len(coords)), key=lambda i: (coords[i, 0], coords[i, 1]))] = np.arange(len(coords))
+    return rank
+
+
+def angular_ranks(apex, points: np.ndarray):
+    """ Dense rank of the direction from apex to each of points in counter-clockwise order, starting at the positive
+    x-axis, and the number of distinct directions; the apex itself (if contained in points) gets rank -1 """
+    d = points - apex
+    dx, dy = d[:, 0], d[:, 1]
+    valid = (dx != 0) | (dy != 0)
+    half = (dy < 0) | ((dy == 0) & (dx < 0))
+    ccw = np.sign(dx[:, None] * dy[None, :] - dy[:, None] * dx[None, :]) > 0  # [y, x]: x is ccw of y
+    before = (half[:, None] < half[None, :]) | ((half[:, None] == half[None, :]) & ccw)
+    before &= valid[:, None]
+    directions, rank = np.unique(before.sum(axis=0)[valid], return_inverse=True)
+    ranks = np.full(len(points), -1, dtype=np.intp)
+    ranks[valid] = rank.ravel()
+    return ranks, len(directions)
+
+
+class TriangleTable(SignTable):
+    """ Other-colored point counts for all triangles and segments on points of one color,
+    plus the cone witnesses deciding the lobes of bowties """
+
+    def __init__(self, same: np.ndarray, other: np.ndarray):
+        super().__init__(same, other)
+        k, m = len(same), len(other)
+
+        # points below / on each segment, between its endpoints in lexicographic order
+        rank = lexicographic_rank(np.concatenate([same, other]))
+        rs, ro = rank[:k], rank[k:]
+        between = (rs[:, None, None] < ro[None, None, :]) & (ro[None, None, :] < rs[None, :, None])
+        self.below = np.sum(between & (self.L < 0), axis=2)
+        self.on = np.sum(between & (self.L == 0), axis=2)
+        self.on = self.on + self.on.T
+
+        # triangle counts via the upper and lower chains of the lexicographically sorted vertices
+        grid = np.stack(np.meshgrid(np.arange(k), np.arange(k), np.arange(k), indexing="ij"), axis=-1)
+        a, b, c = np.take_along_axis(grid, np.argsort(rs[grid], axis=-1), axis=-1).transpose(3, 0, 1, 2)
+        B, O = self.below, self.on
+        side = self.S[a, c, b]
+        self.count = np.where(side > 0, B[a, b] + B[b, c] - B[a, c] - O[a, c],
+                              np.where(side < 0, B[a, c] - B[a, b] - B[b, c] - O[a, b] - O[b, c], 0))
+
+        # angular order around each point of the color
+        ang_s = np.empty((k, k), dtype=np.intp)
+        ang_o = np.empty((k, m), dtype=np.intp)
+        dirs = np.empty(k, dtype=np.intp)
+        for v in range(k):
+            ranks, dirs[v] = angular_ranks(same[v], np.concatenate([same, other]))
+            ang_s[v], ang_o[v] = ranks[:k], ranks[k:]
+
+        # cone witnesses, separately for both sides of each directed segment (u, v)
+        dirs = np.maximum(dirs, 1)
+        big = int(dirs.max(initial=1)) + 1
+        self.witness = np.full((k, k, k), big, dtype=np.intp)
+        self.sweep = np.zeros((k, k, k), dtype=np.intp)
+        rows = np.arange(k * k).reshape(k, k, 1) * (big + 1)
+        for sigma in (1, -1):
+            # rotation away from v around u (towards side sigma), and away from u around v
+            sweep_u_o = (sigma * (ang_o[:, None, :] - ang_s[:, :, None])) % dirs[:, None, None]
+            sweep_u_s = (sigma * (ang_s[:, None, :] - ang_s[:, :, None])) % dirs[:, None, None]
+            sweep_v_o = (sigma * (ang_s.T[:, :, None] - ang_o[None, :, :])) % dirs[None, :, None]
+            sweep_v_s = (sigma * (ang_s.T[:, :, None] - ang_s[None, :, :])) % dirs[None, :, None]
+
+            candidate = self.L == sigma
+            su = np.where(candidate, sweep_u_o, big)
+            sv = np.where(candidate, sweep_v_o, big)
+            order = np.argsort(su, axis=2, kind="stable")
+            su = np.take_along_axis(su, order, axis=2)
+            prefix_min = np.minimum.accumulate(np.take_along_axis(sv, order, axis=2), axis=2)
+            prefix_min = np.concatenate([np.full((k, k, 1), big), prefix_min], axis=2)
+            within = np.searchsorted((su + rows).ravel(), (sweep_u_s + rows).ravel()).reshape(k, k, k)
+            within -= np.arange(k * k).reshape(k, k, 1) * m
+
+            on_side = self.S == sigma
+            self.witness[on_side] = np.take_along_axis(prefix_min, within, axis=2)[on_side]
+            self.sweep[on_side] = sweep_v_s[on_side]
+
+    def lobe_blocked(self, u, v, w, z) -> np.ndarray:
+        """ Whether the intersection of the cone at u between v and w with the cone at v between u and z
+        contains an other-colored point """
+        return self.witness[u, v, w] < self.sweep[u, v, z]
+
+    def blocked(self, kind: np.ndarray, order: np.ndarray, only: FilterList = None) -> np.ndarray:
+        def want(name):
+            return not only or name in only
+
+        blocked = np.ones((len(kind), len(vectorized.SLOTS)), dtype=bool)
+        C, O = self.count, self.on
+
+        rows = np.flatnonzero(kind == CONVEX)
+        c = order[rows].T
+        tris = [C[c[i % 4], c[(i + 1) % 4], c[(i + 2) % 4]] for i in range(4)]
+        if want("cravat"):
+            blocked[rows, 0] = tris[0] + tris[2] + O[c[0], c[2]] > 0
+        if want("necklace"):
+            for i in range(4):
+                blocked[rows, 1 + i] = tris[i] + tris[(i + 1) % 4] > 0
+        if want("bowtie"):
+            for i in range(2):
+                blocked[rows, 5 + i] = self.lobe_blocked(c[i], c[i + 1], c[i + 2], c[i - 1]) \
+                                       | self.lobe_blocked(c[i + 2], c[(i + 3) % 4], c[i], c[i + 1])
+
+        rows = np.flatnonzero(kind == NONCONVEX)
+        h0, h1, h2, q = order[rows].T
+        if want("skirt"):
+            blocked[rows, 7] = C[h0, h1, h2] > 0
+        if want("pant"):
+            h = [h0, h1, h2]
+            for i in range(3):
+                a, b, c = h[i], h[(i + 1) % 3], h[(i + 2) % 3]
+                # the segment from q to c is only interior if q does not lie on the hull
+                interior = (self.S[q, b, c] != 0) & (self.S[q, c, a] != 0)
+                blocked[rows, 8 + i] = C[q, b, c] + C[q, c, a] + np.where(interior, O[q, c], 0) > 0
+
+        return blocked
+
+
+# the coordinates and table used by this backend, see garment_nrs.vectorized
+COORDINATES = integer_coordinates
+TABLE = TriangleTable
+
+
+def convex_hull(pts: PointSet):
+    return vectorized.convex_hull(pts, integer_coordinates)
+
+
+def find_empty_monochromatic_structures(parts: PartitionedPointSet, only: FilterList = None, quiet: bool = False):
+    return vectorized.find_empty_monochromatic_structures(parts, only, COORDINATES, TABLE, quiet)
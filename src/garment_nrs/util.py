@@ -1,3 +1,4 @@
+import os
 from collections import defaultdict
 from typing import List, Tuple, TypeAlias
 
@@ -9,14 +10,30 @@ RawColoredPointSet: TypeAlias = List[Tuple[Point, str]]
 
 __all__ = [
     "partition_points", "load_points_from_csv", "write_points_to_csv", "plot_polygon", "minimize", "bounding_box",
-    "RawColoredPointSet", "random_point"
+    "RawColoredPointSet", "random_point", "reduce_counterexample"
 ]
 
 
+def _parse_column(values: List[str]) -> List[float]:
+    """ Parse all values as int if possible and as float otherwise, as a whole column has a common type """
+    try:
+        return [int(v) for v in values]
+    except ValueError:
+        return [float(v) for v in values]
+
+
 def load_points_from_csv(path) -> RawColoredPointSet:
-    import pandas as pd
+    """ Read x, y, color rows from a CSV file (given as path or open file) without header """
+    import csv
 
-    return [((row[0], row[1]), row[2]) for (idx, row) in pd.read_csv(path, header=None).iterrows()]
+    if isinstance(path, (str, os.PathLike)):
+        with open(path, newline="") as f:
+            return load_points_from_csv(f)
+    rows = [row for row in csv.reader(path) if row]
+    if not rows:
+        return []
+    xs, ys, colors = zip(*((row[0], row[1], row[2]) for row in rows))
+    return list(zip(zip(_parse_column(xs), _parse_column(ys)), colors))
 
 
 def partition_points(points: RawColoredPointSet) -> PartitionedPointSet:
@@ -49,15 +66,24 @@ def plot_polygon(ax: 'matplotlib.Axes', polygon: Polygon, points: PointSet = Non
 
 
 def minimize(parts: PartitionedPointSet, only: FilterList):
-    from tqdm import tqdm
+    """ Find the first point whose removal leaves no empty structure and return its color, index and the reduced set """
+    from garment_nrs.blockers import BlockerTable
 
-    for c, ps in parts.items():
-        for i in tqdm(range(len(ps)), desc=f"Minimizing {c} points"):
-            inst = dict([*parts.items(), (c, ps[:i] + ps[i + 1:])])
-            mcss = any(find_empty_monochromatic_structures(inst, only))
-            if not mcss:
-                return c, i, inst
-    return None, None, None
+    removable = BlockerTable(parts, only).removable()
+    if not removable:
+        return None, None, None
+    c, i = removable[0]
+    return c, i, dict([*parts.items(), (c, parts[c][:i] + parts[c][i + 1:])])
+
+
+def reduce_counterexample(parts: PartitionedPointSet, only: FilterList, exhaustive: bool = False) \
+        -> PartitionedPointSet:
+    """ Remove points one after the other as long as no empty structure is created, either greedily or exhaustively
+    searching for the smallest reachable counterexample, based on a single enumeration of all structures """
+    from garment_nrs.blockers import BlockerTable
+
+    table = BlockerTable(parts, only)
+    return table.reduced(table.exhaustive() if exhaustive else table.greedy())
 
 
 def bounding_box(points: RawColoredPointSet) -> tuple[float, float, float, float]:
@@ -68,12 +94,15 @@ def bounding_box(points: RawColoredPointSet) -> tuple[float, float, float, float
     return min_x, max_x, min_y, max_y
 
 
-def random_point(points: RawColoredPointSet) -> Point:
+def random_point(points: RawColoredPointSet, rnd=None) -> Point:
+    """ A random point with integer coordinates around the bounding box of points,
+    drawn from the given random.Random (or the random module) """
     import random
+    rnd = rnd or random
     min_x, max_x, min_y, max_y = bounding_box(points)
     delta_x = max_x - min_x
     delta_y = max_y - min_y
     return (
-        random.randrange(int(min_x - delta_x / len(points)), int(max_x + delta_x / len(points))),
-        random.randrange(int(min_y - delta_y / len(points)), int(max_y + delta_y / len(points)))
+        rnd.randrange(int(min_x - delta_x / len(points)), int(max_x + delta_x / len(points))),
+        rnd.randrange(int(min_y - delta_y / len(points)), int(max_y + delta_y / len(points)))
     )
@@ -0,0 +1,277 @@
+"""Batched NumPy engine for finding empty monochromatic structures.
+
+Every structure can be described through orientation signs alone: cravats and skirts are open convex hulls,
+necklaces are unions of two (open) triangles on the quad's vertices, bowties are unions of two intersections of such
+triangles, and pants are the open hull minus a closed triangle.
+For each color, the signs of all same-colored point pairs against all other-colored points are computed once,
+and then all 4-tuples of a chunk are classified and tested together as boolean arrays.
+
+Shapely regions are only built for the structures that are actually reported, using the generators from
+:mod:`garment_nrs.lib` on a hull with the same vertex order as the one shapely computes,
+so that the records are the same as those of the reference implementation.
+"""
+import itertools
+from math import comb
+from typing import Callable, Dict, Optional, TypeAlias
+
+import numpy as np
+from shapely import Polygon
+
+from garment_nrs.lib import CONVEX_SHAPES, NONCONVEX_SHAPES, FilterList, PartitionedPointSet, PointSet
+
+__all__ = [
+    "orientation_signs", "float_coordinates", "classify_quads", "region_masks", "SignTable", "convex_hull",
+    "color_table", "chunk_structures", "chunk_indices", "find_structure_indices", "find_empty_monochromatic_structures",
+    "SLOTS"
+]
+
+Coordinates: TypeAlias = Callable[[PartitionedPointSet], Dict[str, np.ndarray]]
+
+# (structure name, variant) for every column of the blocked-matrix;
+# the order is the order in which all_structures_from_quad yields the regions of a quad
+SLOTS = [
+    *(("cravat", i) for i in range(1)),
+    *(("necklace", i) for i in range(4)),
+    *(("bowtie", i) for i in range(2)),
+    *(("skirt", i) for i in range(1)),
+    *(("pant", i) for i in range(3)),
+]
+CONVEX_SLOTS = range(0, 7)
+NONCONVEX_SLOTS = range(7, 11)
+
+CONVEX, NONCONVEX, DEGENERATE = 1, 0, -1
+
+CHUNK_SIZE = 1 << 14
+
+
+def orientation_signs(p: np.ndarray, q: np.ndarray, r: np.ndarray) -> np.ndarray:
+    """ Signs of the orientation of the (broadcast) point triples p, q, r; +1 is counter-clockwise """
+    cross = (q[..., 0] - p[..., 0]) * (r[..., 1] - p[..., 1]) - (q[..., 1] - p[..., 1]) * (r[..., 0] - p[..., 0])
+    return np.sign(cross).astype(np.int8)
+
+
+class SignTable:
+    """ Orientation signs of all same-colored pairs against all same-colored points (S, shape (k, k, k))
+    and against all other-colored points (L, shape (k, k, m)) of one color """
+
+    def __init__(self, same: np.ndarray, other: np.ndarray):
+        i, j = same[:, None, None, :], same[None, :, None, :]
+        self.S = orientation_signs(i, j, same[None, None, :, :])
+        self.L = orientation_signs(i, j, other[None, None, :, :])
+
+    def candidates(self, only: FilterList = None, first: Optional[int] = None):
+        """ The number of 4-tuples (of indices into same) that need to be tested, and an iterator over their chunks
+        in lexicographic order; if first is given, only those 4-tuples starting with that index """
+        k = len(self.S)
+        if first is not None:
+            return comb(k - first - 1, 3), quad_chunks(k, first=first)
+        return comb(k, 4), quad_chunks(k)
+
+    def blocked(self, kind: np.ndarray, order: np.ndarray, only: FilterList = None) -> np.ndarray:
+        """ Boolean (quads, SLOTS) array, which is False exactly for the structures that exist and are empty """
+        blocked = np.ones((len(kind), len(SLOTS)), dtype=bool)
+        for slot, rows, mask in region_masks(kind, order, self.S, self.L, only):
+            blocked[rows, slot] = mask.any(axis=1)
+        return blocked
+
+
+def bottom_left_rank(coords: np.ndarray) -> np.ndarray:
+    """ Rank of every point when sorting by (y, x), which is where shapely's convex hull ring starts """
+    rank = np.empty(len(coords), dtype=np.intp)
+    rank[sorted(range(len(coords)), key=lambda i: (coords[i, 1], coords[i, 0]))] = np.arange(len(coords))
+    return rank
+
+
+def float_coordinates(parts: PartitionedPointSet) -> Dict[str, np.ndarray]:
+    """ Coordinates of all points of each color as (n, 2) float arrays """
+    return {c: np.asarray(ps, dtype=np.float64).reshape(-1, 2) for c, ps in parts.items()}
+
+
+def quad_chunks(k: int, size: int = CHUNK_SIZE, first: Optional[int] = None):
+    """ All 4-tuples of range(k) in lexicographic order, as arrays of at most size rows;
+    if first is given, only those starting with that index """
+    if first is None:
+        quads = itertools.combinations(range(k), 4)
+    else:
+        quads = ((first, *rest) for rest in itertools.combinations(range(first + 1, k), 3))
+    while len(chunk := np.fromiter(itertools.chain.from_iterable(itertools.islice(quads, size)), dtype=np.intp)):
+        yield chunk.reshape(-1, 4)
+
+
+def _in_closed_triangle(S: np.ndarray, u, v, w, x) -> np.ndarray:
+    sigma = S[u, v, w]
+    return (sigma != 0) & (S[u, v, x] * sigma >= 0) & (S[v, w, x] * sigma >= 0) & (S[w, u, x] * sigma >= 0)
+
+
+def _roll_rows(order: np.ndarray, start: np.ndarray) -> np.ndarray:
+    n = order.shape[1]
+    return np.take_along_axis(order, (start[:, None] + np.arange(n)[None, :]) % n, axis=1)
+
+
+def classify_quads(quads: np.ndarray, S: np.ndarray, rank: np.ndarray):
+    """ Classify each 4-tuple as CONVEX, NONCONVEX or DEGENERATE (all points collinear).
+
+    Also returns the hull order of each 4-tuple:
+    for convex ones, the four points in clockwise order starting at the lowest (then leftmost) point,
+    for non-convex ones, the three hull points in the same manner followed by the interior point.
+    """
+    a, b, c, d = quads.T
+    kind = np.full(len(quads), DEGENERATE, dtype=np.int8)
+    order = quads.copy()
+
+    # non-convex: one point lies within the (closed) triangle of the other three
+    for x, u, v, w in [(a, b, c, d), (b, a, c, d), (c, a, b, d), (d, a, b, c)]:
+        inside = _in_closed_triangle(S, u, v, w, x) & (kind == DEGENERATE)
+        kind[inside] = NONCONVEX
+        order[inside] = np.stack([u, v, w, x], axis=1)[inside]
+    nonconvex = kind == NONCONVEX
+    tri = order[:, :3]
+    cw = S[tri[:, 0], tri[:, 1], tri[:, 2]] < 0
+    tri = np.where(cw[:, None], tri, tri[:, ::-1])
+    tri = _roll_rows(tri, np.argmin(rank[tri], axis=1))
+    order[nonconvex, :3] = tri[nonconvex]
+
+    # convex: all triples are proper triangles and no point lies within the others
+    proper = (S[a, b, c] != 0) & (S[a, b, d] != 0) & (S[a, c, d] != 0) & (S[b, c, d] != 0)
+    convex = proper & ~nonconvex
+    kind[convex] = CONVEX
+    # the cyclic order is given by the pair of crossing diagonals
+    ac_bd = (S[a, c, b] != S[a, c, d]) & (S[b, d, a] != S[b, d, c])
+    ab_cd = (S[a, b, c] != S[a, b, d]) & (S[c, d, a] != S[c, d, b])
+    cycle = np.where(ac_bd[:, None], quads[:, [0, 1, 2, 3]],
+                     np.where(ab_cd[:, None], quads[:, [0, 2, 1, 3]], quads[:, [0, 1, 3, 2]]))
+    cw = S[cycle[:, 0], cycle[:, 1], cycle[:, 2]] < 0
+    cycle = np.where(cw[:, None], cycle, cycle[:, ::-1])
+    cycle = _roll_rows(cycle, np.argmin(rank[cycle], axis=1))
+    order[convex] = cycle[convex]
+
+    return kind, order
+
+
+def _open_triangle(S: np.ndarray, L: np.ndarray, u, v, w) -> np.ndarray:
+    sigma = S[u, v, w][:, None]
+    return (L[u, v] == sigma) & (L[v, w] == sigma) & (L[w, u] == sigma)
+
+
+def _closed_triangle(S: np.ndarray, L: np.ndarray, u, v, w) -> np.ndarray:
+    sigma = S[u, v, w][:, None]
+    inside = (L[u, v] * sigma >= 0) & (L[v, w] * sigma >= 0) & (L[w, u] * sigma >= 0)
+    return inside & (sigma != 0)
+
+
+def region_masks(kind: np.ndarray, order: np.ndarray, S: np.ndarray, L: np.ndarray, only: FilterList = None):
+    """ Yield (slot index, row indices, boolean array) triples telling for the quads at the given rows
+    which of the points that L was computed against lie within the region of the structure SLOTS[slot] """
+
+    def want(name):
+        return not only or name in only
+
+    rows = np.flatnonzero(kind == CONVEX)
+    if len(rows) and any(want(s) for s in CONVEX_SHAPES):
+        c = order[rows].T
+        tris = [_open_triangle(S, L, c[i % 4], c[(i + 1) % 4], c[(i + 2) % 4]) for i in range(4)]
+        if want("cravat"):
+            sigma = S[c[0], c[1], c[2]][:, None]
+            yield 0, rows, np.logical_and.reduce([L[c[i], c[(i + 1) % 4]] == sigma for i in range(4)])
+        if want("necklace"):
+            for i in range(4):
+                yield 1 + i, rows, tris[i] | tris[(i + 1) % 4]
+        if want("bowtie"):
+            for i in range(2):
+                yield 5 + i, rows, (tris[i - 1] & tris[i]) | (tris[i + 1] & tris[(i + 2) % 4])
+
+    rows = np.flatnonzero(kind == NONCONVEX)
+    if len(rows) and any(want(s) for s in NONCONVEX_SHAPES):
+        h0, h1, h2, q = order[rows].T
+        hull = _open_triangle(S, L, h0, h1, h2)
+        if want("skirt"):
+            yield 7, rows, hull
+        if want("pant"):
+            h = [h0, h1, h2]
+            for i in range(3):
+                yield 8 + i, rows, hull & ~_closed_triangle(S, L, h[i], q, h[(i + 1) % 3])
+
+
+def build_structure(same: PointSet, quad, hull_order, slot: int):
+    """ Build the shapely region of SLOTS[slot] for the given quad (indices into same) """
+    name, variant = SLOTS[slot]
+    pts = tuple(same[i] for i in quad)
+    if name in CONVEX_SHAPES:
+        hull, func = Polygon([same[i] for i in hull_order]), CONVEX_SHAPES[name]
+    else:
+        hull, func = Polygon([same[i] for i in hull_order[:3]]), NONCONVEX_SHAPES[name]
+    region = next(itertools.islice(func(hull, pts), variant, None))
+    return name, pts, region
+
+
+def convex_hull(pts: PointSet, coordinates: Coordinates = float_coordinates) -> Polygon:
+    """ The convex hull of a 4-tuple as shapely would compute it, but based on the signs from coordinates """
+    coords = coordinates({None: pts})[None]
+    kind, order = classify_quads(np.arange(4)[None, :], SignTable(coords, coords[:0]).S, bottom_left_rank(coords))
+    if kind[0] == DEGENERATE:
+        return Polygon(pts).convex_hull
+    return Polygon([pts[i] for i in (order[0] if kind[0] == CONVEX else order[0, :3])])
+
+
+# the coordinates and table used by this backend, also used for searching parts of the 4-tuples in parallel
+COORDINATES: Coordinates = float_coordinates
+TABLE = SignTable
+
+
+def color_table(coords: Dict[str, np.ndarray], color: str, table=SignTable):
+    """ The table of the given color against all other colors, and the bottom-left rank of its points """
+    same = coords[color]
+    other = np.concatenate([coords[c] for c in coords.keys() if c != color] or [same[:0]])
+    return table(same, other), bottom_left_rank(same)
+
+
+def chunk_structures(same_color: PointSet, color: str, signs: SignTable, rank: np.ndarray, quads: np.ndarray,
+                     only: FilterList = None):
+    """ Yield the records of all empty structures on the given chunk of 4-tuples, in the order of the reference """
+    kind, order = classify_quads(quads, signs.S, rank)
+    blocked = signs.blocked(kind, order, only)
+    for row, slot in zip(*np.nonzero(~blocked)):
+        kind_name, pts, region = build_structure(same_color, quads[row], order[row], slot)
+        yield {  # found an empty structure
+            "color": color,
+            "type": kind_name,
+            "points": pts,
+            "shape": region,
+        }
+
+
+def chunk_indices(signs: SignTable, rank: np.ndarray, quads: np.ndarray, only: FilterList = None):
+    """ The 4-tuples (as rows of indices) and SLOTS of all empty structures on the given chunk, without geometry """
+    kind, order = classify_quads(quads, signs.S, rank)
+    rows, slots = np.nonzero(~signs.blocked(kind, order, only))
+    return quads[rows], slots
+
+
+def find_structure_indices(parts: PartitionedPointSet, only: FilterList = None,
+                           coordinates: Coordinates = float_coordinates, table=SignTable, quiet: bool = False):
+    """ Yield (color, 4-tuples, slots) for the empty structures of each chunk, in the order of the reference """
+    from tqdm import tqdm
+
+    coords = coordinates(parts)
+    for color in parts.keys():
+        signs, rank = color_table(coords, color, table)
+        total, chunks = signs.candidates(only)
+        with tqdm(total=total, desc=f"Processing 4-tuples for {color}", disable=quiet) as progress:
+            for quads in chunks:
+                yield color, *chunk_indices(signs, rank, quads, only)
+                progress.update(len(quads))
+
+
+def find_empty_monochromatic_structures(parts: PartitionedPointSet, only: FilterList = None,
+                                        coordinates: Coordinates = float_coordinates, table=SignTable,
+                                        quiet: bool = False):
+    from tqdm import tqdm
+
+    coords = coordinates(parts)
+    for color in parts.keys():
+        signs, rank = color_table(coords, color, table)
+        total, chunks = signs.candidates(only)
+        with tqdm(total=total, desc=f"Processing 4-tuples for {color}", disable=quiet) as progress:
+            for quads in chunks:
+                yield from chunk_structures(parts[color], color, signs, rank, quads, only)
+                progress.update(len(quads))
@@ -0,0 +1,102 @@
+"""Output-sensitive enumeration of the 4-tuples that can form empty structures.
+
+Instead of testing all 4-tuples of a color, only those are walked that are made up of the empty parts of a
+structure: every cravat, necklace, skirt and pant contains two triangles on its vertices that share an edge and are
+empty of other-colored points, so only pairs of empty triangles sharing an edge (found in the triangle table) are
+candidates for these. The lobes of bowties are no such triangles, here the candidates are those 4-tuples whose first
+lobe is empty according to the cone witnesses, which are walked in order of their sweep position.
+The candidates are then decided by the lookups of the triangle table, in lexicographic order, so the records are the
+same as those of the other backends, while the cost scales with the number of empty triangles (and lobes).
+"""
+from typing import Optional
+
+import numpy as np
+
+from garment_nrs import vectorized
+from garment_nrs.exact import integer_coordinates
+from garment_nrs.lib import FilterList, PartitionedPointSet, PointSet
+from garment_nrs.tables import TriangleTable
+from garment_nrs.vectorized import CHUNK_SIZE
+
+__all__ = ["WalkTable", "first_chunks", "convex_hull", "find_empty_monochromatic_structures"]
+
+
+class WalkTable(TriangleTable):
+    """ Triangle table that only yields the 4-tuples made up of empty triangles or lobes as candidates """
+
+    def empty_triangle_pairs(self) -> np.ndarray:
+        """ All 4-tuples formed by two triangles that are empty of other-colored points and share an edge """
+        k = len(self.S)
+        # degenerate triangles count as empty, as pants may consist of a single triangle if a point lies on the hull
+        empty = self.count == 0
+        diagonal = np.arange(k)
+        empty[diagonal, diagonal, :] = empty[diagonal, :, diagonal] = empty[:, diagonal, diagonal] = False
+        quads = [np.empty((0, 4), dtype=np.intp)]
+        for x in range(k):
+            for y in range(x + 1, k):
+                apex = np.flatnonzero(empty[x, y])
+                if len(apex) < 2:
+                    continue
+                i, j = np.triu_indices(len(apex), 1)
+                quads.append(np.stack(np.broadcast_arrays(x, y, apex[i], apex[j]), axis=1))
+        return np.concatenate(quads)
+
+    def empty_lobes(self) -> np.ndarray:
+        """ All 4-tuples u, v, w, z where the lobe between the cone at u from v to w and the cone at v from u to z
+        is empty of other-colored points """
+        k = len(self.S)
+        big = int(self.sweep.max(initial=0)) + 1
+        rows = np.arange(k * k).reshape(k, k, 1) * (big + 1)
+        quads = [np.empty((0, 4), dtype=np.intp)]
+        for sigma in (1, -1):
+            on_side = self.S == sigma
+            sweep = np.where(on_side, self.sweep, big)
+            order = np.argsort(sweep, axis=2, kind="stable")
+            sweep = np.take_along_axis(sweep, order, axis=2)
+            # the z whose sweep position is at most the witness of w form a prefix of order
+            limit = np.where(on_side, np.minimum(self.witness, big - 1), -1)
+            count = np.searchsorted((sweep + rows).ravel(), (limit + rows).ravel(), side="right").reshape(k, k, k)
+            count = np.where(on_side, count - np.arange(k * k).reshape(k, k, 1) * k, 0)
+
+            uvw = np.repeat(np.arange(k ** 3), count.ravel())
+            offset = np.arange(len(uvw)) - np.repeat(np.cumsum(count.ravel()) - count.ravel(), count.ravel())
+            u, v, w = np.unravel_index(uvw, (k, k, k))
+            z = order[u, v, offset]
+            quads.append(np.stack([u, v, w, z], axis=1)[z != w])
+        return np.concatenate(quads)
+
+    def candidate_quads(self, only: FilterList = None) -> np.ndarray:
+        """ All candidate 4-tuples (with sorted indices) in lexicographic order, which are always computed for all
+        first indices at once """
+        def want(name):
+            return not only or name in only
+
+        quads = [np.empty((0, 4), dtype=np.intp)]
+        if any(want(s) for s in ["cravat", "necklace", "skirt", "pant"]):
+            quads.append(self.empty_triangle_pairs())
+        if want("bowtie"):
+            quads.append(self.empty_lobes())
+        return np.unique(np.sort(np.concatenate(quads), axis=1), axis=0)
+
+    def candidates(self, only: FilterList = None, first: Optional[int] = None):
+        return first_chunks(self.candidate_quads(only), first)
+
+
+def first_chunks(quads: np.ndarray, first: Optional[int] = None):
+    """ The number of the lexicographically sorted 4-tuples (starting with first, if given)
+    and an iterator over their chunks """
+    start, stop = (0, len(quads)) if first is None else np.searchsorted(quads[:, 0], [first, first + 1]).tolist()
+    return stop - start, (quads[i:min(i + CHUNK_SIZE, stop)] for i in range(start, stop, CHUNK_SIZE))
+
+
+# the coordinates and table used by this backend, see garment_nrs.vectorized
+COORDINATES = integer_coordinates
+TABLE = WalkTable
+
+
+def convex_hull(pts: PointSet):
+    return vectorized.convex_hull(pts, integer_coordinates)
+
+
+def find_empty_monochromatic_structures(parts: PartitionedPointSet, only: FilterList = None, quiet: bool = False):
+    return vectorized.find_empty_monochromatic_structures(parts, only, COORDINATES, TABLE, quiet)
@@ -0,0 +1,132 @@
+"""Existence queries visiting the 4-tuples in an order in which empty structures are usually found early.
+
+Whether a point set contains any empty structure only needs a single witness, which for point sets that are no
+counterexample usually is a small 4-tuple of nearby points. So instead of the lexicographic order of the search, the
+4-tuples of each color are visited in two phases:
+first the local ones, made up of two triangles of the Delaunay triangulation of the color sharing an edge or of a point
+together with three of its Delaunay neighbors, for all colors; then all remaining 4-tuples (or, for the table backends,
+all remaining candidates) by increasing size, i.e. the sum of their pairwise distances.
+Every 4-tuple is visited exactly once, so if no witness exists, all of them are still checked.
+Up to MAX_SORTED 4-tuples per color are sorted at once, larger sets are sorted chunk by chunk.
+"""
+import itertools
+from math import comb
+from typing import Callable, Dict, Iterator, Tuple
+
+import numpy as np
+
+from garment_nrs import vectorized
+from garment_nrs.lib import FilterList, PartitionedPointSet, PointSet, get_backend
+
+__all__ = ["local_quads", "witness_order", "has_empty_monochromatic_structure"]
+
+MAX_SORTED = 1 << 20
+
+
+def local_quads(coords: np.ndarray) -> np.ndarray:
+    """ The 4-tuples (as sorted rows of indices into coords) of adjacent Delaunay triangles
+    and of each point with three of its Delaunay neighbors """
+    import shapely
+
+    k = len(coords)
+    triangles = shapely.get_parts(shapely.delaunay_triangles(shapely.multipoints(coords)))
+    index = {tuple(p): i for i, p in enumerate(coords.tolist())}
+    rings = shapely.get_coordinates(shapely.get_exterior_ring(triangles)).reshape(-1, 4, 2)[:, :3]
+    tris = [[index.get(tuple(p)) for p in ring] for ring in rings.tolist()]
+
+    quads = set()
+    by_edge: Dict[Tuple[int, int], list] = {}
+    neighbors = [set() for _ in range(k)]
+    for a, b, c in (t for t in tris if None not in t):
+        for u, v in ((a, b), (b, c), (a, c)):
+            by_edge.setdefault((min(u, v), max(u, v)), []).append((a, b, c))
+            neighbors[u].add(v)
+            neighbors[v].add(u)
+    for adjacent in by_edge.values():
+        if len(adjacent) == 2:
+            quads.add(tuple(sorted(set(adjacent[0]) | set(adjacent[1]))))
+    for v, ns in enumerate(neighbors):
+        for rest in itertools.combinations(ns, 3):
+            quads.add(tuple(sorted((v, *rest))))
+    return np.array(sorted(q for q in quads if len(q) == 4), dtype=np.intp).reshape(-1, 4)
+
+
+def _sizes(coords: np.ndarray, quads: np.ndarray) -> np.ndarray:
+    """ The sum of the 6 pairwise distances of the points of each 4-tuple """
+    pts = coords[quads]
+    return sum(np.hypot(*(pts[:, i] - pts[:, j]).T) for i, j in itertools.combinations(range(4), 2))
+
+
+def _codes(quads: np.ndarray, k: int) -> np.ndarray:
+    return ((quads[:, 0] * k + quads[:, 1]) * k + quads[:, 2]) * k + quads[:, 3]
+
+
+def witness_order(coords: np.ndarray, total: int, chunks: Iterator[np.ndarray], size: int = vectorized.CHUNK_SIZE) \
+        -> Tuple[np.ndarray, Iterator[np.ndarray]]:
+    """ Split the total 4-tuples given by chunks into the local ones and (lazily) the chunks of all others,
+    by increasing size """
+    k = len(coords)
+    local = local_quads(coords)
+    local_codes = _codes(local, k)
+
+    def others(chunks):
+        for quads in chunks:
+            quads = quads[~np.isin(_codes(quads, k), local_codes)]
+            yield quads[np.argsort(_sizes(coords, quads), kind="stable")]
+
+    def rest():
+        if total > MAX_SORTED:  # too many to sort at once
+            for quads in others(chunks):
+                yield from (quads[i:i + size] for i in range(0, len(quads), size))
+            return
+        quads = next(others([np.concatenate([np.empty((0, 4), dtype=np.intp), *chunks])]))
+        yield from (quads[i:i + size] for i in range(0, len(quads), size))
+
+    return local, rest()
+
+
+def has_empty_monochromatic_structure(parts: PartitionedPointSet, only: FilterList = None,
+                                      backend: str = "shapely") -> bool:
+    """ Check whether parts contains any empty monochromatic structure, visiting the local 4-tuples of all colors
+    first and then the remaining ones of each color by increasing size """
+    from garment_nrs import lib
+
+    coords = vectorized.float_coordinates(parts)
+    searches: Dict[str, Tuple[Callable[[np.ndarray], bool], np.ndarray, Iterator[np.ndarray]]] = {}
+    if backend == "shapely":
+        trees = lib.index_points(parts)
+    else:
+        module = get_backend(backend)
+        backend_coords = module.COORDINATES(parts)
+
+    for color, same_color in parts.items():
+        if backend == "shapely":
+            total, chunks = comb(len(same_color), 4), vectorized.quad_chunks(len(same_color))
+            found = _shapely_test(same_color, lib.get_all_other_colored_points(parts, color, trees), only)
+        else:
+            signs, rank = vectorized.color_table(backend_coords, color, module.TABLE)
+            total, chunks = signs.candidates(only)
+            found = _table_test(signs, rank, only)
+        searches[color] = (found, *witness_order(coords[color], total, chunks))
+
+    if any(found(local) for found, local, _ in searches.values() if len(local)):
+        return True
+    return any(found(quads) for found, _, rest in searches.values() for quads in rest)
+
+
+def _shapely_test(same_color: PointSet, other_color, only: FilterList) -> Callable[[np.ndarray], bool]:
+    from garment_nrs import lib
+
+    def found(quads: np.ndarray) -> bool:
+        return any(not lib.contains_any(region, other_color)
+                   for quad in quads.tolist()
+                   for _, region in lib.all_structures_from_quad(tuple(same_color[i] for i in quad), only))
+
+    return found
+
+
+def _table_test(signs, rank: np.ndarray, only: FilterList) -> Callable[[np.ndarray], bool]:
+    def found(quads: np.ndarray) -> bool:
+        return len(vectorized.chunk_indices(signs, rank, quads, only)[1]) > 0
+
+    return found
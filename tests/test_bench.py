@@ -0,0 +1,15 @@
+import random
+
+import pytest
+import shapely
+
+from garment_nrs.bench import double_chain
+
+
+@pytest.mark.parametrize("n", [8, 20, 21, 50])
+def test_double_chain_has_4_hull_vertices(n):
+    points = double_chain(n, random.Random(0))
+    assert len(set(points)) == n
+    hull = shapely.MultiPoint(points).convex_hull
+    assert len(hull.exterior.coords) - 1 == 4
+
@@ -0,0 +1,47 @@
+from pathlib import Path
+
+import pytest
+
+from garment_nrs import extensions
+from garment_nrs.lib import has_empty_monochromatic_structure
+from garment_nrs.util import load_points_from_csv, partition_points
+
+DATA = Path(__file__).parents[1] / "data"
+
+
+@pytest.fixture
+def key_calls(monkeypatch):
+    calls = []
+    key = extensions._Extensions.key
+
+    def counting(self, *args):
+        calls.append(args)
+        return key(self, *args)
+
+    monkeypatch.setattr(extensions._Extensions, "key", counting)
+    return calls
+
+
+def test_maximal_instance_computes_few_canonical_forms(key_calls):
+    parts = partition_points(load_points_from_csv(DATA / "n14_c2_no_mc_necklace.csv"))
+    witness, candidates, checked = extensions.find_extension(parts, ["necklace"])
+    assert witness is None
+    assert checked < candidates
+    assert len(key_calls) < candidates // 10
+
+
+def test_stops_at_first_witness(key_calls):
+    parts = {"red": [(0, 0), (10, 1), (4, 9)], "blue": [(5, 3), (2, 6), (8, 7)]}
+    witness, candidates, checked = extensions.find_extension(parts, ["bowtie", "pant"])
+    assert witness is not None
+    assert checked < candidates
+    assert len(key_calls) <= 2 * checked
+
+    point, color = witness
+    parts[color] = [*parts[color], point]
+    assert not has_empty_monochromatic_structure(parts, ["bowtie", "pant"], "exact")
+
+
+def test_parallel_finds_witness():
+    parts = {"red": [(0, 0), (10, 1), (4, 9)], "blue": [(5, 3), (2, 6), (8, 7)]}
+    assert extensions.find_extension(parts, ["bowtie", "pant"], jobs=2)[0] is not None
@@ -0,0 +1,23 @@
+from pathlib import Path
+
+from click.testing import CliRunner
+
+from garment_nrs.main import main
+
+DATA = Path(__file__).parents[1] / "data"
+
+
+def test_reads_csv_from_stdin():
+    csv = (DATA / "n10_c2_no_mc_bowtie_pant.csv").read_text()
+    result = CliRunner().invoke(main, ["-", "--only", "bowtie", "--only", "pant"], input=csv)
+    assert result.exit_code == 0, result.output
+    assert "Set contains 10 points (5 red, 5 blue)." in result.output
+    assert "Found 0 empty monochromatic structures." in result.output
+
+
+def test_reads_indices_from_stdin():
+    csv = "0,0,red\n4,0,red\n4,4,red\n0,4,red\n"
+    result = CliRunner().invoke(main, ["-", "--format", "indices"], input=csv)
+    assert result.exit_code == 0, result.output
+    assert result.output.count("red\t0\t1\t2\t3\t") == 7
+    assert "Found 7 empty monochromatic structures." in result.output
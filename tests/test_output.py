@@ -0,0 +1,46 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from garment_nrs.output import FORMATS, find_structure_indices
+from garment_nrs.vectorized import SLOTS
+
+# two colors that both have empty structures, so that the writers receive blocks of both
+PARTS = {"red": [(0, 0), (40, 0), (40, 40), (0, 40), (20, 5)], "blue": [(10, 10), (30, 12), (28, 30), (12, 28)]}
+
+
+def _expected():
+    return sorted((color, *quad, slot) for color, quads, slots in find_structure_indices(PARTS, None, "exact")
+                  for quad, slot in zip(quads.tolist(), slots.tolist()))
+
+
+def _write(fmt, path):
+    writer = FORMATS[fmt](path)
+    for color, quads, slots in find_structure_indices(PARTS, None, "exact"):
+        writer.write(None, color, quads, slots)
+    writer.close()
+
+
+def test_expected_has_both_colors():
+    assert {row[0] for row in _expected()} == {"red", "blue"}
+
+
+def test_arrow_round_trip(tmp_path: Path):
+    pa = pytest.importorskip("pyarrow")
+    _write("arrow", tmp_path / "o.arrow")
+    table = pa.ipc.open_file(tmp_path / "o.arrow").read_all().to_pydict()
+    slots = [SLOTS.index((t, v)) for t, v in zip(table["type"], table["variant"])]
+    rows = zip(table["color"], table["a"], table["b"], table["c"], table["d"], slots)
+    assert sorted(rows) == _expected()
+    assert set(table["instance"]) == {-1}
+
+
+def test_npz_round_trip(tmp_path: Path):
+    _write("npz", tmp_path / "o.npz")
+    data = np.load(tmp_path / "o.npz")
+    assert data["slots"].tolist() == [f"{name}{variant}" for name, variant in SLOTS]
+    colors = data["colors"].tolist()
+    rows = [(colors[c], *q, slot)
+            for c, q, slot in zip(data["color"].tolist(), data["quads"].tolist(), data["slot"].tolist())]
+    assert sorted(rows) == _expected()